@@ -0,0 +1,168 @@
+from scripts import evaluation, gather_data, html_tables, model, preprocess
+from scripts.awards import AWARDS
+from sklearn.preprocessing import minmax_scale
+import pandas as pd
+import argparse
+import gzip
+import os
+import pickle
+import statistics
+import time
+import tracemalloc
+import warnings
+
+
+# Original per-season loop implementation of rescale_continuous, for comparison
+def rescale_continuous_loop(df: pd.DataFrame) -> pd.DataFrame:
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", category=RuntimeWarning)
+
+        for season in df["season"].unique():
+            season_cols = df.loc[df["season"] == season, preprocess.SCALED_COLUMNS].copy()
+            df.loc[df["season"] == season, preprocess.SCALED_COLUMNS] = minmax_scale(season_cols)
+
+    return df
+
+
+# Bundled data processed up to (not including) rescale_continuous
+def unscaled_data(source: str) -> pd.DataFrame:
+    return preprocess.build_feature_base(source, incremental=False)
+
+
+# Repeat the data with shifted season labels to simulate a longer history
+def replicate_seasons(df: pd.DataFrame, factor: int) -> pd.DataFrame:
+    copies = []
+
+    for i in range(factor):
+        copy = df.copy()
+        copy["season"] = copy["season"] + i * 100000000
+        copies.append(copy)
+
+    return pd.concat(copies, ignore_index=True)
+
+
+def time_call(func, df: pd.DataFrame, repeat: int) -> float:
+    best = float("inf")
+
+    for _ in range(repeat):
+        data = df.copy()
+        start = time.perf_counter()
+        func(data)
+        best = min(best, time.perf_counter() - start)
+
+    return best
+
+
+def bench_rescale(source: str, factors: list, repeat: int) -> None:
+    base = unscaled_data(source)
+
+    print(f"{'seasons':>8} {'rows':>8} {'loop (s)':>10} {'grouped (s)':>12} {'speedup':>8}")
+
+    for factor in factors:
+        df = replicate_seasons(base, factor)
+        loop_time = time_call(rescale_continuous_loop, df, repeat)
+        grouped_time = time_call(preprocess.rescale_continuous, df, repeat)
+        print(f"{df['season'].nunique():>8} {len(df):>8} {loop_time:>10.4f} {grouped_time:>12.4f} {loop_time / grouped_time:>7.1f}x")
+
+
+def bench_parse(fixtures: str, repeat: int) -> None:
+    pages = []
+    for name, parse in (("NHL_2021_skaters.html.gz", gather_data.parse_skater_data),
+                        ("NHL_2021_standings.html.gz", gather_data.parse_standings_data)):
+        with open(os.path.join(fixtures, name), "rb") as f:
+            pages.append((name, parse, gzip.decompress(f.read()).decode("utf-8")))
+
+    print(f"{'page':>28} {'KB':>6} " + " ".join(f"{backend + ' (s)':>10}" for backend in html_tables.BACKENDS))
+
+    for name, parse, page in pages:
+        timings = []
+        for backend in html_tables.BACKENDS:
+            best = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                parse(page, "2021", backend=backend)
+                best = min(best, time.perf_counter() - start)
+            timings.append(best)
+        print(f"{name:>28} {len(page) // 1024:>6} " + " ".join(f"{t:>10.4f}" for t in timings))
+
+
+# Fit time, predict latency, memory and held-out accuracy of each estimator backend; the last `holdout` seasons with
+# voting results are held out of training and scored
+def bench_models(source: str, award: str, backends: list, holdout: int, repeat: int) -> None:
+    target = AWARDS[award].target
+    data = preprocess.merge_process(source, award=award)
+    voted_seasons = sorted(data.loc[data[target].notnull(), "season"].unique())
+    test_seasons = voted_seasons[-holdout:]
+
+    train_data = data[data["season"].isin(voted_seasons[:-holdout])]
+    test_data = data[data["season"].isin(test_seasons)]
+    single_row = test_data.head(1)
+
+    print(f"{award}: {len(train_data)} training rows, held-out seasons {test_seasons[0]}-{test_seasons[-1]} "
+          f"({len(test_data)} rows)")
+    print(f"{'backend':>14} {'fit (s)':>8} {'peak MB':>8} {'model MB':>9} {'1 row (ms)':>11} {'batch (ms)':>11} "
+          f"{'top1':>5} {'top3':>5} {'rank corr':>10} {'MAE':>8}")
+
+    for backend in backends:
+        fit_time = float("inf")
+        for _ in range(repeat):
+            fitted = model.AwardModel(target, backend=backend)
+            start = time.perf_counter()
+            fitted.fit(train_data)
+            fit_time = min(fit_time, time.perf_counter() - start)
+
+        # memory is measured on a separate fit, since tracing allocations slows fitting down
+        tracemalloc.start()
+        model.AwardModel(target, backend=backend).fit(train_data)
+        peak_mb = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+        tracemalloc.stop()
+        model_mb = len(pickle.dumps(fitted.estimator)) / 1024 ** 2
+
+        single_times = []
+        for _ in range(50):
+            start = time.perf_counter()
+            fitted.predict_scores(single_row)
+            single_times.append(time.perf_counter() - start)
+
+        batch_time = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fitted.predict_scores(test_data)
+            batch_time = min(batch_time, time.perf_counter() - start)
+
+        metrics = evaluation.evaluate_seasons(fitted, test_data, test_seasons).mean(numeric_only=True)
+
+        print(f"{backend:>14} {fit_time:>8.2f} {peak_mb:>8.1f} {model_mb:>9.2f} "
+              f"{statistics.median(single_times) * 1000:>11.2f} {batch_time * 1000:>11.2f} {metrics['top1']:>5.2f} "
+              f"{metrics['top3']:>5.2f} {metrics['rank_corr']:>10.3f} {metrics['mae']:>8.4f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Preprocessing/model benchmarks on the bundled data")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    rescale_parser = subparsers.add_parser("rescale", help="per-season min-max scaling: original loop vs grouped pass")
+    rescale_parser.add_argument("--factors", type=int, nargs="+", default=[1, 10])
+    rescale_parser.add_argument("--repeat", type=int, default=3)
+
+    parse_parser = subparsers.add_parser("parse", help="hockey-reference table extraction per HTML parser backend")
+    parse_parser.add_argument("--fixtures", default="fixtures")
+    parse_parser.add_argument("--repeat", type=int, default=3)
+
+    models_parser = subparsers.add_parser("models", help="estimator backends: fit/predict latency, memory, accuracy")
+    models_parser.add_argument("--award", default="norris", choices=sorted(AWARDS))
+    models_parser.add_argument("--backends", nargs="+", default=sorted(model.ESTIMATOR_BACKENDS),
+                               choices=sorted(model.ESTIMATOR_BACKENDS))
+    models_parser.add_argument("--holdout", type=int, default=3)
+    models_parser.add_argument("--repeat", type=int, default=1)
+
+    parser.add_argument("--data", default="../data")
+
+    args = parser.parse_args()
+
+    if args.benchmark == "rescale":
+        bench_rescale(args.data, args.factors, args.repeat)
+    elif args.benchmark == "parse":
+        bench_parse(args.fixtures, args.repeat)
+    elif args.benchmark == "models":
+        bench_models(args.data, args.award, args.backends, args.holdout, args.repeat)
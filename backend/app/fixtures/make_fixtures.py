@@ -0,0 +1,118 @@
+import gzip
+import html
+import os
+
+import pandas as pd
+
+# Rebuilds the hockey-reference page fixtures (NHL_2021_skaters.html.gz, NHL_2021_standings.html.gz) from the bundled
+# current-season CSVs, reproducing the site's markup: page chrome around the table, data-stat cells, linked player and
+# team names, playoff "*" markers, repeated "thead" header rows and a commented-out secondary table.
+# Run from backend/app: python fixtures/make_fixtures.py
+
+FIXTURE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(FIXTURE_DIR, "..", "..", "data")
+
+SKATER_STATS = ["ranker", "player", "age", "team_id", "pos", "games_played", "goals", "assists", "points",
+                "plus_minus", "pen_min", "ps", "goals_ev", "goals_pp", "goals_sh", "goals_gw", "assists_ev",
+                "assists_pp", "assists_sh", "shots", "shot_pct", "time_on_ice", "time_on_ice_avg", "blocks", "hits",
+                "faceoff_wins", "faceoff_losses", "faceoff_percentage"]
+SKATER_HEADERS = ["Rk", "Player", "Age", "Tm", "Pos", "GP", "G", "A", "PTS", "+/-", "PIM", "PS", "EV", "PP", "SH",
+                  "GW", "EV", "PP", "SH", "S", "S%", "TOI", "ATOI", "BLK", "HIT", "FOW", "FOL", "FO%"]
+
+STANDINGS_STATS = ["team_name", "games", "wins", "losses", "losses_ot", "points", "points_pct", "goals", "opp_goals",
+                   "srs", "sos", "points_pct_old", "wins_reg", "record_reg", "points_pct_reg"]
+STANDINGS_HEADERS = ["", "GP", "W", "L", "OL", "PTS", "PTS%", "GF", "GA", "SRS", "SOS", "RPt%", "RW", "RgRec",
+                     "RgPt%"]
+
+
+def page_chrome(title: str, content: str) -> str:
+    nav = "".join(f'<li><a href="/leagues/NHL_{year}.html">{year - 1}-{str(year)[2:]} NHL Season</a></li>'
+                  for year in range(1918, 2022))
+    scripts = "".join(f'<script>window.sr_config_{i} = {{"section": "leagues", "ad_slot": {i}}};</script>'
+                      for i in range(40))
+
+    return (f'<!DOCTYPE html><html data-version="klecko-" lang="en"><head><meta charset="utf-8">'
+            f'<title>{title} | Hockey-Reference.com</title>{scripts}</head><body class="hr">'
+            f'<div id="wrap"><div id="header"><nav><ul>{nav}</ul></nav></div><div id="content" role="main">'
+            f'<h1>{title}</h1>{content}</div><div id="footer"><ul>{nav}</ul></div></div></body></html>')
+
+
+def header_row(headers: list, stats: list, row_class: str = None) -> str:
+    class_attr = f' class="{row_class}"' if row_class else ""
+    cells = "".join(f'<th aria-label="{html.escape(h)}" data-stat="{s}" scope="col" class=" poptip center">'
+                    f'{html.escape(h)}</th>' for h, s in zip(headers, stats))
+
+    return f"<tr{class_attr}>{cells}</tr>"
+
+
+def skater_cell(stat: str, value: str) -> str:
+    text = html.escape(value)
+
+    if stat == "player":
+        slug = "".join(c for c in value.lower() if c.isalpha())[:7] + "01"
+        return (f'<td class="left " data-append-csv="{slug}" data-stat="player" csk="{text}">'
+                f'<a href="/players/{slug[0]}/{slug}.html">{text}</a></td>')
+    if stat == "team_id" and value != "TOT":
+        return f'<td class="left " data-stat="team_id"><a href="/teams/{text}/2021.html">{text}</a></td>'
+
+    return f'<td class="right " data-stat="{stat}">{text}</td>'
+
+
+def skaters_page(skaters: pd.DataFrame) -> str:
+    rows = []
+
+    for i, record in enumerate(skaters.itertuples(index=False)):
+        if i and i % 20 == 0:
+            rows.append(header_row(SKATER_HEADERS, SKATER_STATS, "thead"))
+        values = ["" if pd.isna(v) else str(v) for v in record]
+        rows.append(f'<tr><th scope="row" class="right " data-stat="ranker" csk="{i + 1}">{values[0]}</th>'
+                    + "".join(skater_cell(s, v) for s, v in zip(SKATER_STATS[1:], values[1:])) + "</tr>")
+
+    table = (f'<div class="table_container" id="div_stats"><table class="sortable stats_table now_sortable" '
+             f'id="stats" data-cols-to-freeze=",2"><caption>Player Stats Table</caption><thead>'
+             f'<tr class="over_header"><th colspan="11"></th><th colspan="5">Goals</th><th colspan="3">Assists</th>'
+             f'<th colspan="9"></th></tr>{header_row(SKATER_HEADERS, SKATER_STATS)}</thead>'
+             f'<tbody>{"".join(rows)}</tbody></table></div>')
+    advanced = (f'<div id="all_stats_adv"><!--<table class="stats_table" id="stats_adv"><tbody>'
+                f'{"".join(rows[:40])}</tbody></table>--></div>')
+
+    return page_chrome("2020-21 NHL Skater Statistics", table + advanced)
+
+
+def standings_page(standings: pd.DataFrame) -> str:
+    rows = []
+
+    for i, record in enumerate(standings.itertuples(index=False)):
+        values = ["" if pd.isna(v) else str(v) for v in record]
+        team = html.escape(values[0])
+        abbrev = "".join(word[0] for word in values[0].split())[:3].upper()
+        playoffs = "*" if i < 16 else ""
+        rows.append(f'<tr class="full_table"><th scope="row" class="left " data-stat="team_name" csk="{i + 1}">'
+                    f'<a href="/teams/{abbrev}/2021.html">{team}</a>{playoffs}</th>'
+                    + "".join(f'<td class="right " data-stat="{s}">{html.escape(v)}</td>'
+                              for s, v in zip(STANDINGS_STATS[1:], values[1:])) + "</tr>")
+    rows.append('<tr class="league_average_table"><th scope="row" class="left " data-stat="team_name">'
+                'League Average</th>' + "".join(f'<td class="right " data-stat="{s}"></td>'
+                                                for s in STANDINGS_STATS[1:]) + "</tr>")
+
+    table = (f'<div class="table_container" id="div_standings"><table class="sortable stats_table" id="standings" '
+             f'data-cols-to-freeze=",1"><caption>League Standings Table</caption>'
+             f'<thead>{header_row(STANDINGS_HEADERS, STANDINGS_STATS)}</thead><tbody>{"".join(rows)}</tbody>'
+             f'</table></div>')
+
+    return page_chrome("2020-21 NHL Standings", table)
+
+
+def write_fixture(name: str, page: str) -> None:
+    with open(os.path.join(FIXTURE_DIR, name), "wb") as f, gzip.GzipFile(fileobj=f, mode="wb", mtime=0) as gz:
+        gz.write(page.encode("utf-8"))
+
+
+if __name__ == "__main__":
+    skaters = pd.read_csv(os.path.join(DATA_DIR, "skater_stats_current.csv"), dtype=str, keep_default_na=False)
+    standings = pd.read_csv(os.path.join(DATA_DIR, "season_standings_current.csv"), dtype=str, keep_default_na=False)
+
+    write_fixture("NHL_2021_skaters.html.gz", skaters_page(skaters.drop(columns="season")))
+    write_fixture("NHL_2021_standings.html.gz", standings_page(standings.drop(columns="season")))
+
+    print("Fixtures written.")
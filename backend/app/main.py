@@ -1,12 +1,23 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, Response, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 import uvicorn
-from scripts.preprocess import merge_process, get_seasons, split_data
-from scripts.model import NorrisModel
-from scripts.gather_data import get_current_data, get_nhl_players, get_past_winners
+from scripts.preprocess import award_datasets, get_seasons, historical_fingerprint
+from scripts.awards import available_awards
+from scripts.gather_data import fetch_refresh_inputs, write_current_data
+from scripts.serving import ServingState, RefreshStatus, build_state, publish_metrics
+from scripts.artifacts import load_latest_artifact, save_artifact
+from scripts.snapshot import negotiate_encoding
+from scripts.leader import FOLLOW_INTERVAL, RefreshLeader
+from scripts.scheduler import TRIGGER_POLL, RefreshScheduler, changed_inputs, refresh_authorized
+from scripts.history import PredictionHistory, record_state
+from scripts import metrics
+from concurrent.futures import ThreadPoolExecutor
+from pydantic import BaseModel
 import datetime
 import asyncio
-from typing import Optional
+import time
+from typing import Dict, List, Optional
 
 app = FastAPI()
 data_src = '../data'
@@ -21,72 +32,175 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Refreshes run on a single worker thread so scraping/preprocessing/fitting never block the event loop
+refresh_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="refresh")
+refresh_status = RefreshStatus()
+scheduler = RefreshScheduler()
 
-# Functionality to execute upon server spin-up
-def setup():
-    print("Activating server and updating current season data...")
+# Prediction history store (HISTORY_DB), opened by bootstrap so importing the app touches no files
+history: Optional[PredictionHistory] = None
+
+# Of the server's worker processes, only the one holding the refresh lock scrapes, trains and publishes artifacts
+leader = RefreshLeader()
+
+# The state being served, published by bootstrap and each refresh (or set directly by tests)
+state: Optional[ServingState] = None
+
+
+# Functionality to execute upon server spin-up and on each refresh: builds a complete, new serving state, or returns
+# None when no input has changed since the current state was built (unless forced).  Models are reused while their
+# training data is unchanged, so a daily refresh only preprocesses and scores the current season.  `revalidate`
+# fetches every input from the network rather than reusing recently cached pages.
+def setup(force: bool = False, retrain: bool = False, revalidate: bool = False) -> Optional[ServingState]:
+    print("Activating server and updating current season data, NHL API roster info and past winners...")
     current_year = str(int(get_seasons(data_src)[-1][-4:]) + 1)
-    get_current_data(current_year)
+    awards = available_awards(data_src)
+    inputs = fetch_refresh_inputs(current_year, awards, revalidate or force or retrain)
+
+    fingerprints = inputs.fingerprints()
+    fingerprints["historical"] = historical_fingerprint(data_src)
+    changed = changed_inputs(state.input_fingerprints if state is not None else None, fingerprints)
+
+    if not changed and not force and not retrain:
+        print("No input has changed since the last refresh; keeping the current models and predictions.")
+        return None
+
+    print(f"Changed inputs: {', '.join(changed) or 'none (forced refresh)'}")
+    write_current_data(inputs.standings, inputs.skaters)
+
+    print("Processing data and scoring the current season...")
+    new_state = build_state(award_datasets(data_src, awards), inputs.roster, inputs.past_winners,
+                            state.models if state is not None else None, retrain)
+    new_state.input_fingerprints = fingerprints
+
+    print("Predictions updated.  Ready for prediction requests.")
+    return new_state
+
+
+# Refresh loop run by the refresh leader: refreshes at each scheduled time (REFRESH_SCHEDULE plus jitter), retries
+# sooner after failed refreshes, and runs manual refreshes requested through any worker
+async def update_data():
+    while True:
+        delay = scheduler.next_delay()
+        print(f"Next scheduled data update in {delay:.0f} seconds.")
+
+        deadline = time.monotonic() + delay
+        request = None
+        while request is None and time.monotonic() < deadline:
+            await asyncio.sleep(min(TRIGGER_POLL, max(deadline - time.monotonic(), 0)))
+            request = scheduler.take_request()
+
+        print("Manual data update requested." if request is not None else "Time to update data now.")
+        await refresh_in_background(revalidate=True, **(request or {}))
+
+
+def start_leading(refresh_now: bool) -> None:
+    if refresh_now:
+        asyncio.create_task(refresh_in_background())
 
-    print("Gathering updated roster info from NHL API...")
-    roster_data = get_nhl_players()
+    asyncio.create_task(update_data())
+
+
+# Load the newest artifact if it is newer than the one being served (runs on the refresh worker thread)
+def adopt_latest_artifact() -> None:
+    global state
+
+    new_state = load_latest_artifact(newer_than=state.version if state is not None else None)
 
-    print("Processing data and training model...")
-    train_data, curr_data = split_data(merge_process(data_src))
-    estimator = NorrisModel()
-    estimator.fit(train_data)
+    if new_state is not None:
+        state = new_state
+        publish_metrics(new_state)
+        print(f"Loaded newer artifact {new_state.version}.")
 
-    print("Updating date/time for data/model refresh...")
-    current_dt = datetime.datetime.now()
-    current_dt = current_dt.strftime("%a, %b %d %I:%M%p PT")
 
-    print("Model fit.  Ready for prediction requests.")
-    return estimator, curr_data, roster_data, current_dt
+# Every worker serves the newest artifact (followers get the leader's, any worker picks up one built offline), and a
+# follower takes over refreshing if the leader process goes away
+async def watch_artifacts():
+    loop = asyncio.get_running_loop()
 
+    while True:
+        if not leader.is_leader and leader.try_acquire():
+            print("Refresh leader gone, this worker takes over refreshes.")
+            start_leading(refresh_now=state is None)
 
-# Takes prediction results dict, adds player headshot URL, player NHL.com page URL, team logo URL
-def compile_output(results: dict) -> dict:
-    # Iterate through prediction results dict and add team logo URL, headshot URL
-    for rank in results:
-        team_abbrev = results[rank]["team"]
+        try:
+            await loop.run_in_executor(refresh_executor, adopt_latest_artifact)
+        except Exception as e:
+            print(f"Could not load the latest artifact: {e}")
 
-        # access NHL roster data, find player's ID and team-dashed string, form headshot, logo URLs, & NHL.com URL and add to dict
-        team_roster = nhl_data[team_abbrev]
-        for player_id in team_roster:
-            if team_roster[player_id]["name"] == results[rank]["name"]:
-                headshot_url = f"https://cms.nhl.bamgrid.com/images/headshots/current/168x168/{player_id}.jpg"
-                results[rank]["headshot_url"] = headshot_url
+        await asyncio.sleep(FOLLOW_INTERVAL)
 
-                logo_url = f"https://cdn.usteamcolors.com/images/nhl/{team_roster[player_id]['team_dashed']}.svg"
-                results[rank]["team_logo_url"] = logo_url
 
-                # create URL for player's NHL.com page
-                name_dashed = team_roster[player_id]["name"].lower().replace(" ", "-")
-                results[rank]["nhl_page"] = f"https://www.nhl.com/player/{name_dashed}-{player_id}"
+# Take the refresh lock if no other worker holds it, then warm start from the newest persisted artifact when there is
+# one; otherwise the leader does a full refresh before serving, and followers serve once the leader has published.
+# Returns whether an artifact was loaded.
+def bootstrap() -> bool:
+    global state, history
 
-                # add full team name to output
-                results[rank]["team_full"] = team_roster[player_id]["team_full"]
+    history = PredictionHistory()
+    leader.try_acquire()
+    state = load_latest_artifact()
 
-    return results
+    if state is not None:
+        publish_metrics(state)
+        print(f"Loaded artifact {state.version}.  Ready for prediction requests.")
+        return True
+
+    if leader.is_leader:
+        refresh_status.start()
+        process_data()
+        refresh_status.finish(version=state.version)
+    else:
+        print("Waiting for the refresh leader to publish an artifact...")
+
+    return False
 
 
 @app.on_event('startup')
 async def app_startup():
+    # with several workers, each one shares its metrics through METRICS_MULTIPROC_DIR
+    metrics.start_flushing()
 
-    # Repeating async task to refresh data/model after midnight each day
-    async def update_data():
-        while True:
-            dt = datetime.datetime.now()
-            current_hr, current_min = dt.hour, dt.minute
-            seconds_until_midnight = (1440 - (current_hr * 60 + current_min)) * 60
+    # on the refresh worker thread, so a cold start's first refresh doesn't hold up the event loop
+    warm_started = await asyncio.get_running_loop().run_in_executor(refresh_executor, bootstrap)
 
-            print(f"Waiting {seconds_until_midnight} seconds until midnight to update data.")
-            await asyncio.sleep(seconds_until_midnight)
+    if leader.is_leader:
+        # a warm start serves the persisted artifact right away and brings it up to date in the background
+        start_leading(refresh_now=warm_started)
 
-            print("Time to update data now.")
-            process_data()
+    asyncio.create_task(watch_artifacts())
 
-    asyncio.create_task(update_data())
+
+# The state being served; 503 until a worker has published one
+def current_state() -> ServingState:
+    current = state
+
+    if current is None:
+        raise HTTPException(status_code=503, detail="Predictions are not available yet")
+
+    return current
+
+
+# Record the latency and outcome of every request, labelled by route template (not raw path) to keep labels bounded
+@app.middleware('http')
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        path = route.path if route is not None else "unmatched"
+        metrics.REQUEST_DURATION.observe(time.perf_counter() - start, path=path)
+        metrics.REQUESTS.inc(path=path, method=request.method, status=status)
+
+
+@app.get('/metrics')
+async def get_metrics() -> Response:
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
 
 
 @app.get('/')
@@ -94,33 +208,153 @@ async def hello():
     return {"message": f"Welcome to the home of NHL award predictions!"}
 
 
-def process_data() -> None:
-    global model
-    global current_data
-    global nhl_data
-    global last_updated
+# Build a new serving state and publish it with one reference assignment (runs on the refresh worker thread); when no
+# input has changed the current state is kept and returned
+def process_data(force: bool = False, retrain: bool = False, revalidate: bool = False) -> ServingState:
+    global state
 
     print("Updating data...")
 
-    model, current_data, nhl_data, last_updated = setup()
+    new_state = setup(force, retrain, revalidate)
+    if new_state is None:
+        metrics.REFRESH_UNCHANGED.inc()
+        return state
+
+    state = new_state
+    publish_metrics(new_state)
 
     print("Data and model updated/refreshed.")
 
+    try:
+        print(f"Artifact saved to {save_artifact(new_state)}")
+    except Exception as e:
+        print(f"Could not save artifact: {e}")
+
+    try:
+        if history is not None:
+            record_state(history, new_state)
+    except Exception as e:
+        print(f"Could not record prediction history: {e}")
+
+    return new_state
+
+
+# Run process_data off the event loop; requests keep being served from the current state meanwhile
+async def refresh_in_background(force: bool = False, retrain: bool = False, revalidate: bool = False) -> None:
+    if not refresh_status.start():
+        print("Refresh already in progress, skipping.")
+        return
+
+    loop = asyncio.get_running_loop()
+
+    try:
+        new_state = await loop.run_in_executor(refresh_executor, process_data, force, retrain, revalidate)
+    except Exception as e:
+        refresh_status.finish(error=e)
+        scheduler.record_failure()
+        print(f"Data refresh failed, continuing to serve previous data (retrying in at most "
+              f"{scheduler.backoff_delay():.0f} seconds): {e}")
+    else:
+        refresh_status.finish(version=new_state.version)
+        scheduler.record_success()
+
+
+@app.get('/health')
+async def health() -> Response:
+    current = state
+
+    if current is None:
+        return JSONResponse({"status": "starting", "version": None, "leader": leader.is_leader,
+                             "refresh": refresh_status.as_dict()}, status_code=503)
+
+    return JSONResponse({"status": "ok", "version": current.version, "last_updated": current.last_updated,
+                         "leader": leader.is_leader, "refresh": refresh_status.as_dict()})
+
 
 @app.get('/predict')
-async def get_predictions(award: Optional[str] = 'norris') -> dict:  # players = number of players to provide in results
+async def get_predictions(request: Request, award: Optional[str] = 'norris', limit: Optional[int] = Query(None, ge=1),
+                          offset: int = Query(0, ge=0), fields: Optional[str] = None) -> Response:
+    snapshot = current_state().snapshots.get(award)
+
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail=f"No predictions available for award '{award}'")
+
+    try:
+        view = snapshot.view(offset, limit, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    coding = negotiate_encoding(request.headers.get("accept-encoding"), len(view.body))
+    headers = snapshot.response_headers(view, coding)
+
+    if snapshot.matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    return Response(content=view.content(coding), media_type="application/json", headers=headers)
+
+
+# Ask the refresh leader for a refresh outside the schedule (`force` rebuilds even if no input has changed, `retrain`
+# also refits the models); needs the REFRESH_TOKEN as a bearer token.  The leader picks the request up within seconds.
+@app.post('/refresh', status_code=202)
+async def request_refresh(request: Request, force: bool = False, retrain: bool = False) -> Response:
+    if not refresh_authorized(request.headers.get("authorization")):
+        raise HTTPException(status_code=401, detail="A valid refresh token is required",
+                            headers={"WWW-Authenticate": "Bearer"})
+
+    scheduler.request_refresh(force, retrain)
+
+    return JSONResponse({"requested": True, "force": force or retrain, "retrain": retrain,
+                         "refresh": refresh_status.as_dict()}, status_code=202)
+
+
+# A player's trajectory over a season (player given), or the top `limit` players at each refresh; a plain def, so
+# FastAPI runs the SQLite queries in its threadpool instead of on the event loop
+@app.get('/history')
+def get_history(award: Optional[str] = 'norris', player: Optional[str] = None, season: Optional[int] = None,
+                limit: int = Query(10, ge=1, le=100)) -> Response:
+    if history is None:
+        raise HTTPException(status_code=503, detail="Prediction history is not available yet")
+
+    if player:
+        trajectory = history.player_trajectory(award, player, season)
+    else:
+        trajectory = history.top_trajectories(award, season, limit)
+
+    if not trajectory:
+        raise HTTPException(status_code=404, detail=f"No prediction history for award '{award}'")
+
+    return JSONResponse({"award": award, "player": player, "history": trajectory})
+
+
+# A hypothetical stat line: a current player's line (optionally at a games-played pace) with raw stats overridden,
+# or a full line of raw stats for anyone else
+class WhatIfLine(BaseModel):
+    name: Optional[str] = None
+    team: Optional[str] = None
+    pace: Optional[float] = None
+    stats: Dict[str, float] = {}
+
+
+class WhatIfRequest(BaseModel):
+    lines: List[WhatIfLine]
 
-    top_results = model.predict(current_data)
-    results = {i + 1: top_results[i] for i in range(len(top_results))}
 
-    results = compile_output(results)
+# A plain def like /history: scoring a batch is pandas/sklearn work, which FastAPI runs in its threadpool so /predict
+# keeps being served meanwhile
+@app.post('/whatif')
+def score_what_if(body: WhatIfRequest, award: Optional[str] = 'norris') -> Response:
+    scorer = current_state().whatif_scorer(award)
 
-    past_winners = get_past_winners(award)
+    if scorer is None:
+        raise HTTPException(status_code=404, detail=f"No model available for award '{award}'")
 
-    return {"results": results, "updated": last_updated, "importances": model.feature_importances, "past_winners": past_winners}
+    try:
+        results = scorer.score([line.model_dump() for line in body.lines])
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
+    return JSONResponse({"season": scorer.season, "results": results})
 
-model, current_data, nhl_data, last_updated = setup()
 
 if __name__ == "__main__":
-    uvicorn.run(app, port=8500)
\ No newline at end of file
+    uvicorn.run(app, port=8500)
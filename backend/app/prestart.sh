@@ -0,0 +1,7 @@
+#! /usr/bin/env bash
+
+# Run by the uvicorn-gunicorn image before the workers start: metrics shared between workers start from scratch
+if [ -n "$METRICS_MULTIPROC_DIR" ]; then
+    rm -rf "$METRICS_MULTIPROC_DIR"
+    mkdir -p "$METRICS_MULTIPROC_DIR"
+fi
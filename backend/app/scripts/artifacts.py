@@ -0,0 +1,184 @@
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import tempfile
+from typing import Dict, List, Optional
+
+import joblib
+import pandas as pd
+import sklearn
+
+from scripts.awards import AWARDS, available_awards
+from scripts.preprocess import award_datasets
+from scripts.roster import RosterIndex
+from scripts.serving import ServingState, build_state
+from scripts.snapshot import build_snapshots
+
+ARTIFACT_DIR = os.environ.get("ARTIFACT_DIR", "../artifacts")
+KEEP_ARTIFACTS = 5
+
+# Bump when the files an artifact holds change shape, so artifacts written by older code are skipped
+ARTIFACT_FORMAT = 5
+
+
+# Library versions an artifact was pickled with; artifacts from other versions are not loaded
+def _library_versions() -> Dict[str, str]:
+    return {"pandas": pd.__version__, "scikit-learn": sklearn.__version__}
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+# Write a serving state to <directory>/<version>/; the directory only appears once every file is complete
+def save_artifact(state: ServingState, directory: str = ARTIFACT_DIR) -> str:
+    os.makedirs(directory, exist_ok=True)
+    final_path = os.path.join(directory, state.version)
+
+    if os.path.isdir(final_path):
+        return final_path
+
+    tmp_path = tempfile.mkdtemp(dir=directory, prefix=".tmp-")
+
+    try:
+        # numpy arrays (data frame blocks, model parameters) are stored uncompressed so they can be memory-mapped
+        joblib.dump(state.models, os.path.join(tmp_path, "models.joblib"))
+        joblib.dump(state.current_data, os.path.join(tmp_path, "current_data.joblib"))
+
+        with open(os.path.join(tmp_path, "roster.pkl"), "wb") as f:
+            pickle.dump(state.nhl_data, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        payloads = {award: snapshot.payload for award, snapshot in state.snapshots.items()}
+        with open(os.path.join(tmp_path, "payloads.json"), "w") as f:
+            json.dump(payloads, f)
+
+        manifest = {
+            "format": ARTIFACT_FORMAT,
+            "version": state.version,
+            "last_updated": state.last_updated,
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "libraries": _library_versions(),
+            "inputs": state.input_fingerprints,
+            "checksums": {name: _sha256(os.path.join(tmp_path, name)) for name in os.listdir(tmp_path)}
+        }
+        with open(os.path.join(tmp_path, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        os.rename(tmp_path, final_path)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+    prune_artifacts(directory)
+
+    return final_path
+
+
+# Load and verify one artifact directory, rebuilding its response snapshots
+def load_artifact(path: str) -> ServingState:
+    with open(os.path.join(path, "manifest.json")) as f:
+        manifest = json.load(f)
+
+    if manifest.get("format") != ARTIFACT_FORMAT:
+        raise ValueError(f"artifact format {manifest.get('format')}, expected {ARTIFACT_FORMAT}")
+
+    if manifest["libraries"] != _library_versions():
+        raise ValueError(f"built with {manifest['libraries']}, running {_library_versions()}")
+
+    for name, checksum in manifest["checksums"].items():
+        if _sha256(os.path.join(path, name)) != checksum:
+            raise ValueError(f"checksum mismatch for {name}")
+
+    # arrays are memory-mapped read-only, so every worker serving the same artifact shares one copy in the page cache
+    models = joblib.load(os.path.join(path, "models.joblib"), mmap_mode="r")
+    current_data = joblib.load(os.path.join(path, "current_data.joblib"), mmap_mode="r")
+
+    with open(os.path.join(path, "roster.pkl"), "rb") as f:
+        roster = pickle.load(f)
+
+    with open(os.path.join(path, "payloads.json")) as f:
+        payloads = json.load(f)
+
+    version = manifest["version"]
+    state = ServingState(models, current_data, roster, manifest["last_updated"], build_snapshots(payloads, version),
+                         version)
+    state.input_fingerprints = manifest.get("inputs", {})
+
+    return state
+
+
+# Versions of complete artifacts in a directory, newest first
+def list_artifacts(directory: str = ARTIFACT_DIR) -> List[str]:
+    if not os.path.isdir(directory):
+        return []
+
+    versions = [name for name in os.listdir(directory)
+                if not name.startswith(".") and os.path.isfile(os.path.join(directory, name, "manifest.json"))]
+
+    return sorted(versions, reverse=True)
+
+
+# Load the newest artifact that passes verification (only if it is newer than `newer_than`), or None
+def load_latest_artifact(directory: str = ARTIFACT_DIR, newer_than: Optional[str] = None) -> Optional[ServingState]:
+    for version in list_artifacts(directory):
+        if newer_than is not None and version <= newer_than:
+            return None
+
+        try:
+            return load_artifact(os.path.join(directory, version))
+        except Exception as e:
+            print(f"Skipping artifact {version}: {e}")
+
+    return None
+
+
+def prune_artifacts(directory: str = ARTIFACT_DIR, keep: int = KEEP_ARTIFACTS) -> None:
+    for version in list_artifacts(directory)[keep:]:
+        shutil.rmtree(os.path.join(directory, version), ignore_errors=True)
+
+
+# Past winners of an award from its voting data, newest first, in the same shape as get_past_winners
+def past_winners_from_csv(source: str, award: str = "norris") -> list:
+    voting = pd.read_csv(os.path.join(source, f"{AWARDS[award].voting_dataset}.csv"),
+                         usecols=["season", "Player", "Tm", "Place"])
+    winners = voting[voting["Place"] == 1].sort_values("season", ascending=False)
+
+    return [[f"{str(season)[:4]}-{str(season)[-2:]}", player.replace("*", ""), team]
+            for season, player, team in winners[["season", "Player", "Tm"]].values]
+
+
+# Build a serving state purely from the CSVs in source (no scraping); roster links are filled in by the next refresh
+def build_offline_state(source: str) -> ServingState:
+    awards = available_awards(source)
+    past_winners = {award: past_winners_from_csv(source, award) for award in awards}
+
+    return build_state(award_datasets(source, awards), RosterIndex([]), past_winners)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or inspect serving artifacts")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="build an artifact offline from the bundled CSVs")
+    build_parser.add_argument("--data", default="../data")
+    build_parser.add_argument("--out", default=ARTIFACT_DIR)
+
+    list_parser = subparsers.add_parser("list", help="list stored artifacts, newest first")
+    list_parser.add_argument("--out", default=ARTIFACT_DIR)
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        print(f"Artifact written to {save_artifact(build_offline_state(args.data), args.out)}")
+    else:
+        for artifact_version in list_artifacts(args.out):
+            print(artifact_version)
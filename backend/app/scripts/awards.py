@@ -0,0 +1,58 @@
+import os
+from typing import Callable, List
+
+import numpy as np
+import pandas as pd
+
+FORWARD_POSITIONS = ["C", "LW", "RW", "F", "W"]
+
+
+def is_defenseman(df: pd.DataFrame) -> np.ndarray:
+    return (df["position"] == "D").to_numpy()
+
+
+def is_forward(df: pd.DataFrame) -> np.ndarray:
+    return df["position"].isin(FORWARD_POSITIONS).to_numpy()
+
+
+def is_skater(df: pd.DataFrame) -> np.ndarray:
+    return np.ones(len(df), dtype=bool)
+
+
+# Calder eligibility, approximated from the skater data: 26 or younger with at most 25 games played in earlier seasons
+# (seasons before the first one in the data count as no games, which only affects seasons before training starts)
+def is_rookie(df: pd.DataFrame) -> np.ndarray:
+    games = df[["name", "season", "games_played"]]
+    season_games = games.groupby(["name", "season"], sort=True)["games_played"].sum()
+    prior_games = season_games.groupby(level="name").cumsum() - season_games
+
+    keys = pd.MultiIndex.from_frame(games[["name", "season"]])
+
+    return (df["age"] <= 26).to_numpy() & (prior_games.reindex(keys).to_numpy() <= 25)
+
+
+# An award the engine can model: which skaters are eligible, where its voting results live and what is predicted
+class Award:
+    def __init__(self, name: str, title: str, eligible: Callable[[pd.DataFrame], np.ndarray]) -> None:
+        self.name = name
+        self.title = title
+        self.eligible = eligible
+
+        # voting results are stored as <name>_voting.csv and modeled as each player's share of the season's points
+        self.voting_dataset = f"{name}_voting"
+        self.target = f"{name}_point_pct"
+
+
+AWARDS = {award.name: award for award in [
+    Award("norris", "James Norris Memorial Trophy", is_defenseman),
+    Award("hart", "Hart Memorial Trophy", is_skater),
+    Award("calder", "Calder Memorial Trophy", is_rookie),
+    Award("selke", "Frank J. Selke Trophy", is_forward),
+    Award("byng", "Lady Byng Memorial Trophy", is_skater)
+]}
+
+
+# Registered awards with voting data in source, in registry order
+def available_awards(source: str) -> List[str]:
+    return [name for name, award in AWARDS.items()
+            if os.path.isfile(os.path.join(source, f"{award.voting_dataset}.csv"))]
@@ -0,0 +1,127 @@
+import argparse
+import functools
+import os
+import tempfile
+import time
+from typing import Callable, Dict, List, Tuple
+
+import pandas as pd
+
+from scripts import gather_data, preprocess
+from scripts.awards import AWARDS
+from scripts.fetch import engine
+
+# Seasons with no NHL play, by end year (2004-05 lockout)
+CANCELLED_SEASONS = {"2005"}
+
+# Per-season pages: (page URL for a season end year, {dataset folder: parser for that page}); one voting page holds
+# every award's results, so it is fetched once per season
+VOTING_PARSERS = {award.voting_dataset: functools.partial(gather_data.parse_voting_data, award=award.name)
+                  for award in AWARDS.values()}
+
+SEASON_PAGES = {
+    "skaters": (gather_data.skaters_url, {"skater_stats": gather_data.parse_skater_data}),
+    "standings": (gather_data.standings_url, {"season_standings": gather_data.parse_standings_data}),
+    "voting": (gather_data.voting_url, VOTING_PARSERS)
+}
+
+
+def season_label(year: str) -> str:
+    return str(int(year) - 1) + year
+
+
+def season_path(dest: str, dataset: str, year: str) -> str:
+    return os.path.join(dest, dataset, f"{dataset}_{season_label(year)}.csv")
+
+
+def fetch_text(url: str) -> str:
+    body, encoding = engine.fetch(url)
+
+    return body.decode(encoding or "utf-8", errors="replace")
+
+
+# (season end year, dataset) pairs in the range whose per-season CSV isn't on disk yet, so an interrupted
+# backfill resumes where it stopped
+def missing_files(dest: str, first_year: int, last_year: int) -> List[Tuple[str, str]]:
+    return [(str(year), dataset) for year in range(first_year, last_year + 1) if str(year) not in CANCELLED_SEASONS
+            for _, parsers in SEASON_PAGES.values() for dataset in parsers
+            if not os.path.isfile(season_path(dest, dataset, str(year)))]
+
+
+# Write a CSV atomically, so a file that exists is always complete
+def _write_csv(df: pd.DataFrame, path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    os.close(fd)
+
+    try:
+        df.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+# Fetch one season's page and write each missing dataset parsed from it; returns failures by dataset
+def _backfill_page(dest: str, year: str, page: str, datasets: List[str],
+                   fetch: Callable[[str], str]) -> Dict[str, Exception]:
+    url, parsers = SEASON_PAGES[page]
+    failures = {}
+
+    try:
+        html = fetch(url(year))
+    except Exception as e:
+        print(f"  {page} page for {season_label(year)} failed: {e}")
+        return {dataset: e for dataset in datasets}
+
+    for dataset in datasets:
+        try:
+            _write_csv(parsers[dataset](html, year), season_path(dest, dataset, year))
+            print(f"  {dataset} {season_label(year)} written")
+        except Exception as e:
+            print(f"  {dataset} {season_label(year)} failed: {e}")
+            failures[dataset] = e
+
+    return failures
+
+
+# Fetch and write every missing per-season CSV in [first_year, last_year] concurrently (the fetch engine's per-host
+# limits keep requests to hockey-reference rate limited), then rebuild the aggregated CSVs; returns failed files
+def backfill(first_year: int, last_year: int, dest: str = "../data", aggregate: bool = True,
+             fetch: Callable[[str], str] = fetch_text) -> Dict[Tuple[str, str], Exception]:
+    todo = missing_files(dest, first_year, last_year)
+    print(f"Backfilling {len(todo)} season file(s) for {first_year - 1}-{last_year}...")
+
+    # group missing datasets by the page they come from, so each page is fetched at most once
+    dataset_pages = {dataset: page for page, (_, parsers) in SEASON_PAGES.items() for dataset in parsers}
+    page_jobs = {}
+    for year, dataset in todo:
+        page_jobs.setdefault((year, dataset_pages[dataset]), []).append(dataset)
+
+    start = time.perf_counter()
+    results = engine.run_all({key: (lambda key=key: _backfill_page(dest, *key, page_jobs[key], fetch))
+                              for key in page_jobs})
+    failures = {(year, dataset): error for (year, _), page_failures in results.items()
+                for dataset, error in page_failures.items()}
+
+    print(f"Backfill finished in {time.perf_counter() - start:.1f}s, {len(todo) - len(failures)} written, "
+          f"{len(failures)} failed (rerun to retry them).")
+
+    if aggregate:
+        preprocess._merge_csv(dest)
+        print("Aggregated season CSVs rebuilt.")
+
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch historical seasons into per-season CSVs and aggregate them")
+    parser.add_argument("first_year", type=int, help="end year of the first season, e.g. 1980 for 1979-80")
+    parser.add_argument("last_year", type=int, help="end year of the last season")
+    parser.add_argument("--data", default="../data")
+    parser.add_argument("--no-aggregate", action="store_true", help="only write the per-season CSVs")
+
+    args = parser.parse_args()
+
+    if backfill(args.first_year, args.last_year, args.data, aggregate=not args.no_aggregate):
+        raise SystemExit(1)
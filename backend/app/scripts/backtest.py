@@ -0,0 +1,122 @@
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from scripts.awards import AWARDS
+from scripts.evaluation import season_metrics
+from scripts.model import DEFAULT_BACKEND, AwardModel, model_key, season_digests
+from scripts.preprocess import merge_process
+
+BACKTEST_CACHE_DIR = os.environ.get("BACKTEST_CACHE_DIR", "../cache/backtest")
+
+
+# Cache key of one fold: the model config, the held-out season's rows and every training season's rows
+def fold_key(season: int, digests: Dict[int, str], model: str) -> str:
+    digest = hashlib.sha256(model.encode("utf-8"))
+    digest.update(f"holdout:{season}:{digests[season]}".encode("utf-8"))
+
+    for train_season in sorted(digests):
+        if train_season != season:
+            digest.update(f"{train_season}:{digests[train_season]}".encode("utf-8"))
+
+    return digest.hexdigest()[:32]
+
+
+def _load_cached(cache_dir: str, key: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(cache_dir, f"{key}.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_cached(cache_dir: str, key: str, result: dict) -> None:
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+
+    with os.fdopen(fd, "w") as f:
+        json.dump(result, f)
+    os.replace(tmp_path, os.path.join(cache_dir, f"{key}.json"))
+
+
+# Worker process state: the processed frame is sent once per worker rather than once per fold
+_worker_data: Optional[pd.DataFrame] = None
+
+
+def _init_worker(data: pd.DataFrame) -> None:
+    global _worker_data
+    _worker_data = data
+
+
+# Refit with one season held out and score that season
+def run_fold(data: pd.DataFrame, season: int, target: str, backend: str) -> dict:
+    model = AwardModel(target, backend=backend)
+    model.fit(data[data["season"] != season], importances=False)
+
+    held_out = data[data["season"] == season]
+    metrics = season_metrics(held_out[target].to_numpy(), model.predict_scores(held_out))
+
+    return dict(season=season, **metrics)
+
+
+def _run_worker_fold(season: int, target: str, backend: str) -> dict:
+    return run_fold(_worker_data, season, target, backend)
+
+
+# Leave-one-season-out backtest over every season with voting results (or the given seasons); folds already computed
+# for the same data and model config are read from the cache, the rest run in parallel worker processes
+def backtest(data: pd.DataFrame, target: str, backend: str = None, seasons: List[int] = None,
+             cache_dir: str = BACKTEST_CACHE_DIR, max_workers: int = None) -> pd.DataFrame:
+    backend = backend or DEFAULT_BACKEND
+
+    # only seasons with voting results take part (the current season has no target yet)
+    data = data[data[target].notnull()]
+    digests = season_digests(data)
+    model = model_key(target, backend)
+
+    keys = {season: fold_key(season, digests, model) for season in (seasons or sorted(digests))}
+    results = {season: _load_cached(cache_dir, key) for season, key in keys.items()}
+    todo = [season for season, result in results.items() if result is None]
+
+    print(f"Backtesting {len(keys)} season(s) with {backend}: {len(keys) - len(todo)} cached, {len(todo)} to fit...")
+
+    if todo:
+        workers = min(len(todo), max_workers or os.cpu_count() or 1)
+
+        if workers == 1:
+            fresh = {season: run_fold(data, season, target, backend) for season in todo}
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(data,)) as pool:
+                futures = {season: pool.submit(_run_worker_fold, season, target, backend) for season in todo}
+                fresh = {season: future.result() for season, future in futures.items()}
+
+        for season, result in fresh.items():
+            _save_cached(cache_dir, keys[season], result)
+            results[season] = result
+
+    return pd.DataFrame([results[season] for season in keys])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Leave-one-season-out backtest of an award model")
+    parser.add_argument("--award", default="norris", choices=sorted(AWARDS))
+    parser.add_argument("--backend", default=DEFAULT_BACKEND)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--data", default="../data")
+    parser.add_argument("--cache", default=BACKTEST_CACHE_DIR)
+
+    args = parser.parse_args()
+
+    award_data = merge_process(args.data, award=args.award)
+    report = backtest(award_data, AWARDS[args.award].target, args.backend, cache_dir=args.cache,
+                      max_workers=args.workers)
+
+    print(report.to_string(index=False, float_format=lambda value: f"{value:.3f}"))
+    print(f"top-1 hit rate {report['top1'].mean():.3f}, top-3 hit rate {report['top3'].mean():.3f}, "
+          f"mean rank correlation {report['rank_corr'].mean():.3f}")
@@ -0,0 +1,146 @@
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+# Declared schema for each dataset in backend/data (applies to both the aggregated and *_current.csv files):
+#   usecols: columns the pipeline actually uses (everything else is never parsed)
+#   dtypes: compact parse dtypes; integer-valued columns with gaps use float32, which represents them exactly
+#   categories: low-cardinality text columns converted to categoricals after reading
+#   row_filter: (column, allowed values) predicate applied to each chunk while reading
+# Skater stats are read for every position, since awards filter their own eligible players; every award's
+# <award>_voting.csv shares the "award_voting" schema
+SCHEMAS = {
+    "skater_stats": {
+        "usecols": ["Rk", "Player", "Age", "Tm", "Pos", "GP", "G", "A", "PTS", "PLUSMINUS", "PIM", "PS", "EV", "PP",
+                    "SH", "GW", "EV.1", "PP.1", "SH.1", "S", "S%", "TOI", "BLK", "HIT", "season"],
+        "dtypes": {"Rk": "int16", "Player": "object", "Age": "int8", "Tm": "object", "Pos": "object", "GP": "int16",
+                   "G": "int16", "A": "int16", "PTS": "int16", "PLUSMINUS": "int16", "PIM": "int16", "PS": "float64",
+                   "EV": "int16", "PP": "int16", "SH": "int16", "GW": "int16", "EV.1": "int16", "PP.1": "int16",
+                   "SH.1": "int16", "S": "int16", "S%": "float64", "TOI": "float32", "BLK": "float32",
+                   "HIT": "float32", "season": "int64"},
+        "categories": ["Player", "Tm", "Pos"],
+        "row_filter": None
+    },
+    "season_standings": {
+        "usecols": ["Team", "GP", "PTS", "season"],
+        "dtypes": {"Team": "object", "GP": "int16", "PTS": "int16", "season": "int64"},
+        "categories": [],
+        "row_filter": None
+    },
+    "award_voting": {
+        "usecols": ["Player", "Votes", "season"],
+        "dtypes": {"Player": "object", "Votes": "int16", "season": "int64"},
+        "categories": ["Player"],
+        "row_filter": None
+    }
+}
+
+MANIFEST_FILE = "manifest.json"
+CHUNK_SIZE = 4096
+
+
+# Dataset name for a CSV file name, e.g. "skater_stats_current.csv" -> "skater_stats"
+def dataset_name(filename: str) -> str:
+    name = filename.split('.')[0]
+
+    return name[:-len("_current")] if name.endswith("_current") else name
+
+
+# Schema name for a dataset name, or None if the dataset has no declared schema
+def schema_name(name: str) -> Optional[str]:
+    if name.endswith("_voting"):
+        return "award_voting"
+
+    return name if name in SCHEMAS else None
+
+
+# Read a CSV according to its dataset schema: pruned columns, compact dtypes, row predicate applied per chunk
+def read_dataset(path: str, apply_filter: bool = True) -> pd.DataFrame:
+    schema = SCHEMAS[schema_name(dataset_name(os.path.basename(path)))]
+    row_filter = schema["row_filter"] if apply_filter else None
+
+    chunks = []
+
+    for chunk in pd.read_csv(path, usecols=schema["usecols"], dtype=schema["dtypes"], chunksize=CHUNK_SIZE):
+        if row_filter is not None:
+            column, allowed = row_filter
+            chunk = chunk[chunk[column].isin(allowed)]
+        chunks.append(chunk)
+
+    # categoricals are built once after concatenation so every chunk shares the same categories
+    df = pd.concat(chunks, ignore_index=True)
+
+    for column in schema["categories"]:
+        df[column] = df[column].astype("category")
+
+    return df
+
+
+# Concatenate frames of one dataset, keeping its categorical columns categorical
+def concat_dataset(name: str, frames: List[pd.DataFrame]) -> pd.DataFrame:
+    df = pd.concat(frames)
+
+    for column in SCHEMAS.get(schema_name(name), {}).get("categories", []):
+        if column in df.columns:
+            df[column] = df[column].astype("category")
+
+    return df
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def load_manifest(source: str) -> Dict[str, dict]:
+    try:
+        with open(os.path.join(source, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(source: str, manifest: Dict[str, dict]) -> None:
+    path = os.path.join(source, MANIFEST_FILE)
+    tmp_path = path + ".tmp"
+
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+# Manifest entry (content hash, row count, seasons) for a data file, rebuilt from the season column only when the file changed
+def describe_file(source: str, filename: str) -> Optional[dict]:
+    path = os.path.join(source, filename)
+
+    if not os.path.isfile(path):
+        return None
+
+    manifest = load_manifest(source)
+    sha256 = _file_sha256(path)
+    entry = manifest.get(filename)
+
+    if entry is None or entry["sha256"] != sha256:
+        seasons = pd.read_csv(path, usecols=["season"])["season"]
+        entry = {"sha256": sha256, "rows": int(len(seasons)), "seasons": [str(s) for s in seasons.unique()]}
+        manifest[filename] = entry
+        try:
+            _save_manifest(source, manifest)
+        except OSError as e:
+            print(f"Could not update data manifest: {e}")
+
+    return entry
+
+
+# Seasons contained in a data file, in file order, read from the manifest
+def file_seasons(source: str, filename: str) -> Optional[List[str]]:
+    entry = describe_file(source, filename)
+
+    return entry["seasons"] if entry is not None else None
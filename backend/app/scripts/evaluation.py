@@ -0,0 +1,42 @@
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+from scripts.model import AwardModel
+
+
+# Ranking quality of predicted vote shares against actual ones for one season's eligible players:
+#   top1: the predicted winner won; top3: the winner is among the top 3 predicted;
+#   rank_corr: Spearman correlation of predicted and actual shares among players who received votes
+def season_metrics(actual: np.ndarray, predicted: np.ndarray) -> dict:
+    actual = np.asarray(actual, dtype=np.float64)
+    predicted = np.asarray(predicted, dtype=np.float64)
+
+    winner = np.argmax(actual)
+    predicted_order = np.argsort(-predicted, kind="stable")
+
+    voted = actual > 0
+    if voted.sum() > 1:
+        rank_corr = pd.Series(actual[voted]).corr(pd.Series(predicted[voted]), method="spearman")
+    else:
+        rank_corr = np.nan
+
+    return {
+        "top1": bool(predicted_order[0] == winner),
+        "top3": bool(winner in predicted_order[:3]),
+        "rank_corr": float(rank_corr),
+        "mae": float(np.mean(np.abs(actual - predicted)))
+    }
+
+
+# Per-season metrics of a fitted model on seasons it was not trained on
+def evaluate_seasons(model: AwardModel, data: pd.DataFrame, seasons: List[int]) -> pd.DataFrame:
+    rows = []
+
+    for season in seasons:
+        season_data = data[data["season"] == season]
+        metrics = season_metrics(season_data[model.target].to_numpy(), model.predict_scores(season_data))
+        rows.append(dict(season=season, **metrics))
+
+    return pd.DataFrame(rows)
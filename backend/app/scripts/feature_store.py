@@ -0,0 +1,64 @@
+import hashlib
+import os
+from typing import Optional
+
+import pandas as pd
+
+FEATURE_STORE_DIR = os.environ.get("FEATURE_STORE_DIR", "../cache/features")
+
+# Historical (non-current) CSVs whose contents determine the processed historical frame (the feature base before any
+# award's voting results are joined)
+HISTORICAL_FILES = ["season_standings.csv", "skater_stats.csv"]
+
+# Bump whenever per-season preprocessing changes, so frames cached by older code are rebuilt
+PIPELINE_VERSION = "2"
+
+
+# Content hash of the historical source CSVs plus the pipeline version and mode; lean preprocessing stores narrower
+# dtypes, so frames built with and without it are kept apart
+def source_fingerprint(source: str, lean: bool = False) -> str:
+    digest = hashlib.sha256(f"{PIPELINE_VERSION}:lean={lean}".encode("utf-8"))
+
+    for filename in HISTORICAL_FILES:
+        digest.update(filename.encode("utf-8"))
+        with open(os.path.join(source, filename), "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+
+    return digest.hexdigest()[:32]
+
+
+def _store_path(fingerprint: str, directory: Optional[str]) -> str:
+    return os.path.join(directory or FEATURE_STORE_DIR, f"historical-{fingerprint}.parquet")
+
+
+# Load the processed historical frame for a fingerprint, or None if it hasn't been built (or can't be read)
+def load_historical(fingerprint: str, directory: Optional[str] = None) -> Optional[pd.DataFrame]:
+    path = _store_path(fingerprint, directory)
+
+    if not os.path.isfile(path):
+        return None
+
+    try:
+        return pd.read_parquet(path)
+    except Exception as e:
+        print(f"Could not read feature store file {path}, rebuilding: {e}")
+        return None
+
+
+# Persist a processed historical frame, replacing frames stored for older fingerprints
+def save_historical(fingerprint: str, df: pd.DataFrame, directory: Optional[str] = None) -> None:
+    directory = directory or FEATURE_STORE_DIR
+    os.makedirs(directory, exist_ok=True)
+    path = _store_path(fingerprint, directory)
+    tmp_path = path + ".tmp"
+
+    # attrs can hold fitted objects (e.g. the season scaler) that parquet metadata can't serialize
+    stored = df.copy(deep=False)
+    stored.attrs = {}
+    stored.to_parquet(tmp_path)
+    os.replace(tmp_path, path)
+
+    for name in os.listdir(directory):
+        if name.startswith("historical-") and name.endswith(".parquet") and name != os.path.basename(path):
+            os.remove(os.path.join(directory, name))
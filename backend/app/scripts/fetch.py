@@ -0,0 +1,102 @@
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Per-host politeness: (max concurrent requests, minimum seconds between request starts)
+HOST_LIMITS = {
+    "www.hockey-reference.com": (2, 1.0),
+    "default": (4, 0.0)
+}
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+# Per-host concurrency cap plus a minimum spacing between request starts
+class HostLimiter:
+    def __init__(self, max_concurrent: int, min_interval: float) -> None:
+        self.slots = threading.BoundedSemaphore(max_concurrent)
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+
+    def wait_turn(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self.min_interval
+
+        if start > now:
+            time.sleep(start - now)
+
+
+# Pooled keep-alive HTTP client with timeouts, exponential-backoff retries and per-host limits; run_all runs many
+# fetches concurrently on its thread pool so total time is bounded by the slowest one
+class FetchEngine:
+    def __init__(self, host_limits: Dict[str, Tuple[int, float]] = None, timeout: Tuple[float, float] = (5, 30),
+                 retries: int = 3, backoff: float = 0.5, max_workers: int = 8) -> None:
+        self.host_limits = host_limits if host_limits is not None else HOST_LIMITS
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="fetch")
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._limiters = {}
+        self._limiters_lock = threading.Lock()
+
+    def _limiter(self, host: str) -> HostLimiter:
+        with self._limiters_lock:
+            if host not in self._limiters:
+                self._limiters[host] = HostLimiter(*self.host_limits.get(host, self.host_limits["default"]))
+            return self._limiters[host]
+
+    def _retry_delay(self, attempt: int, response: Optional[requests.Response]) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), 60.0)
+
+        return self.backoff * 2 ** attempt + random.uniform(0, self.backoff)
+
+    # Blocking GET returning (body bytes, text encoding); retries connection errors, timeouts and 429/5xx
+    def fetch(self, url: str) -> Tuple[bytes, Optional[str]]:
+        limiter = self._limiter(urlparse(url).netloc)
+
+        for attempt in range(self.retries + 1):
+            response = None
+            try:
+                with limiter.slots:
+                    limiter.wait_turn()
+                    response = self.session.get(url, timeout=self.timeout)
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    return response.content, response.encoding
+                error = requests.HTTPError(f"{response.status_code} from {url}", response=response)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+
+            if attempt == self.retries:
+                raise error
+
+            delay = self._retry_delay(attempt, response)
+            print(f"Fetch of {url} failed ({error}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+    # Run fetch jobs concurrently on the engine's pool, returning results by key; it waits on the pool's futures rather
+    # than starting an event loop, so it also works when called from code running inside one
+    def run_all(self, jobs: Dict[str, Callable]) -> Dict[str, object]:
+        futures = {key: self.executor.submit(job) for key, job in jobs.items()}
+
+        return {key: future.result() for key, future in futures.items()}
+
+
+engine = FetchEngine()
@@ -1,95 +1,130 @@
-import requests
 from bs4 import BeautifulSoup
 import pandas as pd
+from typing import Callable, Dict, List
 
+from scripts import metrics
+from scripts.fetch import engine
+from scripts.html_tables import extract_rows, rows_to_frame
+from scripts.http_cache import cache
+from scripts.roster import RosterIndex, make_player_record
+from scripts.stages import fingerprint
 
-def get_standings_data(year: str) -> pd.DataFrame:
-    nhl_standings_html = requests.get(f"https://www.hockey-reference.com/leagues/NHL_{year}_standings.html").text
+ROSTERS_URL = "https://statsapi.web.nhl.com/api/v1/teams?expand=team.roster"
 
-    nhl_standings_soup = BeautifulSoup(nhl_standings_html, "html.parser")
+# Oldest cached standings/skater/roster page a refresh will use, in seconds (well below the daily refresh interval)
+REFRESH_MAX_AGE = 3600
 
-    team_row_html = nhl_standings_soup.find(id="standings").find('tbody').find_all(class_="full_table")
+# Scraped table layouts; text columns stay strings, every other column is parsed as a number
+STANDINGS_COLUMNS = ['Team', 'GP', 'W', 'L', 'OL', 'PTS', 'PTS%', 'GF', 'GA', 'SRS', 'SOS', 'RPt%', 'RW', 'RgRec',
+                     'RgPt%']
+STANDINGS_TEXT_COLUMNS = ['Team', 'RgRec']
 
-    team_data = []
+SKATER_COLUMNS = ['Rk', 'Player', 'Age', 'Tm', 'Pos', 'GP', 'G', 'A', 'PTS', 'PLUSMINUS', 'PIM', 'PS', 'EV', 'PP', 'SH',
+                  'GW', 'EV.1', 'PP.1', 'SH.1', 'S', 'S%', 'TOI', 'ATOI', 'BLK', 'HIT', 'FOW', 'FOL', 'FO%']
+SKATER_TEXT_COLUMNS = ['Player', 'Tm', 'Pos', 'ATOI']
 
-    for row in team_row_html:
-        team_name = row.find("th").find("a").text
-        team_values = [team_name] + [td.text for td in row.find_all("td")]
-        team_data.append(team_values)
+# leading voting columns shared by every award's table (the stat columns after them differ between awards)
+VOTING_COLUMNS = ['Place', 'Player', 'Age', 'Tm', 'Pos', 'Votes']
+VOTING_TEXT_COLUMNS = ['Player', 'Tm', 'Pos']
 
-    col_headers = ['Team', 'GP', 'W', 'L', 'OL', 'PTS', 'PTS%', 'GF', 'GA', 'SRS', 'SOS',
-                   'RPt%', 'RW', 'RgRec', 'RgPt%']
 
-    team_data_df = pd.DataFrame(team_data, columns=col_headers)
-    team_data_df["season"] = int(str(int(year) - 1) + year)
+def standings_url(year: str) -> str:
+    return f"https://www.hockey-reference.com/leagues/NHL_{year}_standings.html"
 
-    return team_data_df
 
+def skaters_url(year: str) -> str:
+    return f"https://www.hockey-reference.com/leagues/NHL_{year}_skaters.html"
 
-def get_skater_data(year: str) -> pd.DataFrame:
-    skater_stats_html = requests.get(f"https://www.hockey-reference.com/leagues/NHL_{year}_skaters.html").text
 
-    skater_stats_soup = BeautifulSoup(skater_stats_html, "html.parser")
+def voting_url(year: str) -> str:
+    return f"https://www.hockey-reference.com/awards/voting-{year}.html"
 
-    stats_row_html = skater_stats_soup.find(id="stats").find("tbody").find_all("tr")
 
-    skater_data = []
+def awards_url(award: str) -> str:
+    return f"https://www.hockey-reference.com/awards/{award}.html"
 
-    for row in stats_row_html:
-        if not row.get("class") or "thead" not in row.get("class"):
-            rk = row.find("th").text
-            player_values = [rk] + [td.text for td in row.find_all("td")]
-            skater_data.append(player_values)
 
-    col_headers = ['Rk', 'Player', 'Age', 'Tm', 'Pos', 'GP', 'G', 'A', 'PTS', 'PLUSMINUS',
-                   'PIM', 'PS', 'EV', 'PP', 'SH', 'GW', 'EV.1', 'PP.1', 'SH.1', 'S', 'S%',
-                   'TOI', 'ATOI', 'BLK', 'HIT', 'FOW', 'FOL', 'FO%']
+def parse_standings_data(nhl_standings_html: str, year: str, backend: str = None) -> pd.DataFrame:
+    team_data = extract_rows(nhl_standings_html, "standings", backend=backend, include_class="full_table",
+                             header_link=True)
+
+    team_data_df = rows_to_frame(team_data, STANDINGS_COLUMNS, STANDINGS_TEXT_COLUMNS)
+    team_data_df["season"] = int(str(int(year) - 1) + year)
+
+    return team_data_df
 
-    skater_data_df = pd.DataFrame(skater_data, columns=col_headers)
+
+def get_standings_data(year: str) -> pd.DataFrame:
+    return parse_standings_data(cache.get_text(standings_url(year), "standings"), year)
+
+
+def parse_skater_data(skater_stats_html: str, year: str, backend: str = None) -> pd.DataFrame:
+    skater_data = extract_rows(skater_stats_html, "stats", backend=backend, exclude_class="thead")
+
+    skater_data_df = rows_to_frame(skater_data, SKATER_COLUMNS, SKATER_TEXT_COLUMNS)
     skater_data_df["season"] = int(str(int(year) - 1) + year)
 
     return skater_data_df
 
 
-def get_current_data(year: str) -> None:
-    standings_df = get_standings_data(year)
-    skater_df = get_skater_data(year)
+def get_skater_data(year: str) -> pd.DataFrame:
+    return parse_skater_data(cache.get_text(skaters_url(year), "skaters"), year)
+
 
+# One award's voting results (e.g. the "norris_stats" table) from a season's awards voting page
+def parse_voting_data(voting_html: str, year: str, award: str = "norris") -> pd.DataFrame:
+    rows = extract_rows(voting_html, f"{award}_stats", exclude_class="thead")
+    voting_data = [row[:len(VOTING_COLUMNS)] for row in rows]
+
+    voting_data_df = rows_to_frame(voting_data, VOTING_COLUMNS, VOTING_TEXT_COLUMNS)
+    voting_data_df["season"] = int(str(int(year) - 1) + year)
+
+    return voting_data_df
+
+
+def write_current_data(standings_df: pd.DataFrame, skater_df: pd.DataFrame) -> None:
     standings_df.to_csv('../data/season_standings_current.csv', index_label=False)
     skater_df.to_csv('../data/skater_stats_current.csv', index_label=False)
 
     print("Current season's data updated.")
 
 
-# Get player IDs, team abbrevs, and jersey numbers from NHL Stats API
-def get_nhl_players() -> dict:
-    teams_players = requests.get("https://statsapi.web.nhl.com/api/v1/teams?expand=team.roster").json()["teams"]
-    # players = {}
+# Wrap a refresh fetch so its duration (and any failure) is recorded under the source's name
+def timed_fetch(source: str, fetch: Callable[[], object]) -> Callable[[], object]:
+    def run():
+        try:
+            with metrics.SCRAPE_DURATION.time(source=source):
+                return fetch()
+        except Exception:
+            metrics.SCRAPE_FAILURES.inc(source=source)
+            raise
 
-    teams = {}
+    return run
 
-    for team in teams_players:
-        roster = {}
 
+# Get player IDs, team abbrevs, and jersey numbers from NHL Stats API response, indexed for lookup by ID and by team + name
+# (every rostered player, since awards cover different positions)
+def parse_nhl_players(teams_json: dict) -> RosterIndex:
+    teams_players = teams_json["teams"]
+
+    players = []
+
+    for team in teams_players:
         try:
             for player in team["roster"]["roster"]:
-                if player["position"]["code"] == "D":
-                    roster[player["person"]["id"]] = {
-                        "name": player["person"]["fullName"],
-                        "team_dashed": '-'.join(team["name"].lower().replace("é", "e").replace('.', '').split()),
-                        "team_full": team["name"],
-                        "jersey_number": player.get("jerseyNumber")
-                    }
+                players.append(make_player_record(player["person"]["id"], player["person"]["fullName"],
+                                                  team["abbreviation"], team["name"], player.get("jerseyNumber")))
         except KeyError:  # account for possible KeyError when team["roster"] doesn't exit (Seattle - new franchise, no roster)
             pass
 
-        teams[team["abbreviation"]] = roster
+    return RosterIndex(players)
 
-    return teams
 
+def get_nhl_players() -> RosterIndex:
+    return parse_nhl_players(cache.get_json(ROSTERS_URL, "rosters"))
 
-def get_past_winners(name: str) -> list:
-    winners_html = requests.get("https://www.hockey-reference.com/awards/norris.html").text
+
+def parse_past_winners(winners_html: str, name: str) -> list:
     winners_soup = BeautifulSoup(winners_html, 'html.parser')
     winners_rows = winners_soup.select(f'#{name}')[0].find_all('tbody')[0].find_all('tr')
 
@@ -100,3 +135,52 @@ def get_past_winners(name: str) -> list:
         winners.append(data)
 
     return winners
+
+
+def get_past_winners(name: str) -> list:
+    return parse_past_winners(cache.get_text(awards_url(name), "awards"), name)
+
+
+# One refresh's fetched and parsed inputs, with a content fingerprint per source for change detection
+class RefreshInputs:
+    def __init__(self, standings: pd.DataFrame, skaters: pd.DataFrame, rosters: dict,
+                 past_winners: Dict[str, list]) -> None:
+        self.standings = standings
+        self.skaters = skaters
+        self.rosters = rosters
+        self.past_winners = past_winners
+
+    # Fingerprints of the parsed content (not the raw pages, whose markup changes from one request to the next)
+    def fingerprints(self) -> Dict[str, str]:
+        prints = {"standings": fingerprint(self.standings), "skaters": fingerprint(self.skaters),
+                  "rosters": fingerprint(self.rosters)}
+        for award, winners in self.past_winners.items():
+            prints[f"awards:{award}"] = fingerprint(winners)
+
+        return prints
+
+    @property
+    def roster(self) -> RosterIndex:
+        return parse_nhl_players(self.rosters)
+
+
+# Fetch every refresh input concurrently (standings, skaters, rosters, award history), so refresh time is bounded by
+# the slowest source.  The season's pages are refetched before use unless cached within the last REFRESH_MAX_AGE
+# seconds, so a refresh never scores pages the cache would only revalidate in the background; with `revalidate` every
+# page is refetched (scheduled, manual and forced refreshes), and cached copies are only a fallback for failed fetches
+def fetch_refresh_inputs(year: str, awards: List[str], revalidate: bool = False) -> RefreshInputs:
+    max_age = 0 if revalidate else REFRESH_MAX_AGE
+    jobs = {
+        "standings": lambda: cache.get_text(standings_url(year), "standings", max_age),
+        "skaters": lambda: cache.get_text(skaters_url(year), "skaters", max_age),
+        "rosters": lambda: cache.get_json(ROSTERS_URL, "rosters", max_age)
+    }
+    for award in awards:
+        jobs[f"awards:{award}"] = lambda award=award: cache.get_text(awards_url(award), "awards",
+                                                                     0 if revalidate else None)
+
+    pages = engine.run_all({source: timed_fetch(source, fetch) for source, fetch in jobs.items()})
+
+    return RefreshInputs(parse_standings_data(pages["standings"], year), parse_skater_data(pages["skaters"], year),
+                         pages["rosters"], {award: parse_past_winners(pages[f"awards:{award}"], award)
+                                            for award in awards})
@@ -0,0 +1,141 @@
+import contextlib
+import os
+import sqlite3
+from typing import Dict, List, Optional
+
+HISTORY_DB = os.environ.get("HISTORY_DB", "../history/predictions.sqlite3")
+
+# Retention: daily predictions are kept for the newest KEEP_SEASONS seasons; seasons that are over keep only their
+# top KEEP_RANKS players
+KEEP_SEASONS = int(os.environ.get("HISTORY_KEEP_SEASONS", "10"))
+KEEP_RANKS = int(os.environ.get("HISTORY_KEEP_RANKS", "25"))
+
+# One row per award, season, refresh date and rank; the primary key doubles as the (season, date) index and rows are
+# clustered by it (WITHOUT ROWID), so a day's top-N is a contiguous range
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    award TEXT NOT NULL,
+    season INTEGER NOT NULL,
+    refresh_date TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    team TEXT NOT NULL,
+    predicted_point_pct REAL NOT NULL,
+    PRIMARY KEY (award, season, refresh_date, rank)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS predictions_player ON predictions (award, name, season, refresh_date);
+"""
+
+
+# Append-only record of each refresh's ranked predictions, queried for per-player and top-N trajectories
+class PredictionHistory:
+    def __init__(self, path: str = HISTORY_DB) -> None:
+        self.path = path
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with self._connect() as conn:
+            # WAL lets requests read while a refresh is writing
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    # A connection per operation: refreshes write from a worker thread while requests read from the threadpool
+    @contextlib.contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    # Record one refresh's ranked results for an award; a second refresh on the same day replaces that day's rows
+    def append(self, award: str, season: int, refresh_date: str, ranked: List[dict]) -> None:
+        rows = [(award, season, refresh_date, rank, result["name"], result["team"], result["predicted_point_pct"])
+                for rank, result in enumerate(ranked, start=1)]
+
+        with self._connect() as conn:
+            conn.execute("DELETE FROM predictions WHERE award = ? AND season = ? AND refresh_date = ?",
+                         (award, season, refresh_date))
+            conn.executemany("INSERT INTO predictions VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def latest_season(self, award: str) -> Optional[int]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT MAX(season) FROM predictions WHERE award = ?", (award,)).fetchone()
+
+        return row[0]
+
+    # A player's rank and predicted share at each refresh of a season (the latest season by default)
+    def player_trajectory(self, award: str, name: str, season: Optional[int] = None) -> List[dict]:
+        season = season or self.latest_season(award)
+
+        with self._connect() as conn:
+            rows = conn.execute("SELECT refresh_date, rank, team, predicted_point_pct FROM predictions "
+                                "WHERE award = ? AND name = ? AND season = ? ORDER BY refresh_date",
+                                (award, name, season)).fetchall()
+
+        return [dict(row) for row in rows]
+
+    # The top `limit` players at each refresh of a season, by date
+    def top_trajectories(self, award: str, season: Optional[int] = None, limit: int = 10) -> Dict[str, List[dict]]:
+        season = season or self.latest_season(award)
+
+        with self._connect() as conn:
+            rows = conn.execute("SELECT refresh_date, rank, name, team, predicted_point_pct FROM predictions "
+                                "WHERE award = ? AND season = ? AND rank <= ? ORDER BY refresh_date, rank",
+                                (award, season, limit)).fetchall()
+
+        trajectories = {}
+        for row in rows:
+            trajectories.setdefault(row["refresh_date"], []).append(
+                {"rank": row["rank"], "name": row["name"], "team": row["team"],
+                 "predicted_point_pct": row["predicted_point_pct"]})
+
+        return trajectories
+
+    # Apply retention per award: drop seasons beyond the award's newest keep_seasons and trim its finished seasons to
+    # their top keep_ranks, then reclaim the freed pages (only if anything was removed); returns the rows removed
+    def compact(self, keep_seasons: int = KEEP_SEASONS, keep_ranks: int = KEEP_RANKS) -> int:
+        removed = 0
+
+        with self._connect() as conn:
+            awards = [row[0] for row in conn.execute("SELECT DISTINCT award FROM predictions")]
+
+            for award in awards:
+                seasons = [row[0] for row in conn.execute(
+                    "SELECT DISTINCT season FROM predictions WHERE award = ? ORDER BY season DESC", (award,))]
+
+                for season in seasons[keep_seasons:]:
+                    removed += conn.execute("DELETE FROM predictions WHERE award = ? AND season = ?",
+                                            (award, season)).rowcount
+                for season in seasons[1:keep_seasons]:
+                    removed += conn.execute("DELETE FROM predictions WHERE award = ? AND season = ? AND rank > ?",
+                                            (award, season, keep_ranks)).rowcount
+
+        if removed:
+            conn = sqlite3.connect(self.path, timeout=30)
+            try:
+                conn.execute("VACUUM")
+            finally:
+                conn.close()
+
+        return removed
+
+
+# Append every award's predictions from a serving state (dated by its version, YYYYmmddHHMMSS); retention is applied
+# when an award's season rolls over, the only time it has anything to remove, rather than after every refresh
+def record_state(history: PredictionHistory, state) -> None:
+    refresh_date = f"{state.version[:4]}-{state.version[4:6]}-{state.version[6:8]}"
+    rolled_over = False
+
+    for award, snapshot in state.snapshots.items():
+        season = int(state.current_data[award]["season"].iloc[0])
+        latest = history.latest_season(award)
+        rolled_over = rolled_over or (latest is not None and season > latest)
+        history.append(award, season, refresh_date, snapshot.ranked)
+
+    if rolled_over:
+        history.compact()
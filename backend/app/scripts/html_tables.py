@@ -0,0 +1,114 @@
+import os
+import re
+from typing import Callable, Dict, List, Optional
+
+from bs4 import BeautifulSoup
+import numpy as np
+import pandas as pd
+
+try:
+    from lxml import html as lxml_html
+except ImportError:  # lxml is optional; the BeautifulSoup backend covers every table
+    lxml_html = None
+
+# Extraction of a single hockey-reference table (e.g. #stats, #standings) into rows of cell text.
+# Every backend returns the same rows: one per tbody row, first cell from the row's <th>, remaining cells from its <td>s.
+#   include_class: keep only rows carrying this class (e.g. "full_table" in standings)
+#   exclude_class: drop rows carrying this class (e.g. repeated "thead" header rows in skater stats)
+#   header_link: take the <th> text from the link inside it, leaving out markers such as the playoff "*"
+
+
+# Locate the markup of one table by id, so the rest of the page (nav, scripts, other tables) is never parsed
+def table_fragment(page: str, table_id: str) -> str:
+    match = re.search(r'<table\b[^>]*\bid="%s"' % re.escape(table_id), page)
+
+    if match is None:
+        raise ValueError(f"Table #{table_id} not found in page")
+
+    end = page.find("</table>", match.end())
+    if end == -1:
+        raise ValueError(f"Table #{table_id} is not closed")
+
+    return page[match.start():end + len("</table>")]
+
+
+def extract_rows_bs4(page: str, table_id: str, include_class: str = None, exclude_class: str = None,
+                     header_link: bool = False) -> List[List[str]]:
+    soup = BeautifulSoup(page, "html.parser")
+    body = soup.find(id=table_id).find("tbody")
+    rows = body.find_all(class_=include_class) if include_class else body.find_all("tr")
+
+    table = []
+
+    for row in rows:
+        if exclude_class and exclude_class in (row.get("class") or []):
+            continue
+        header = row.find("th").find("a") if header_link else row.find("th")
+        table.append([header.text] + [td.text for td in row.find_all("td")])
+
+    return table
+
+
+# Text of an lxml cell; most cells have no child elements, so their .text is the whole text
+def _cell_text(cell) -> str:
+    if len(cell):
+        return "".join(cell.itertext())
+
+    return cell.text or ""
+
+
+# C-based extraction: only the target table's markup is handed to lxml, then rows are walked directly
+def extract_rows_lxml(page: str, table_id: str, include_class: str = None, exclude_class: str = None,
+                      header_link: bool = False) -> List[List[str]]:
+    table_el = lxml_html.fragment_fromstring(table_fragment(page, table_id))
+    body = table_el.find("tbody")
+
+    table = []
+
+    for row in body.iter("tr"):
+        classes = (row.get("class") or "").split()
+        if include_class and include_class not in classes:
+            continue
+        if exclude_class and exclude_class in classes:
+            continue
+        header = row.find(".//th")
+        if header_link:
+            header = header.find(".//a")
+        table.append([_cell_text(header)] + [_cell_text(td) for td in row.iter("td")])
+
+    return table
+
+
+BACKENDS: Dict[str, Callable[..., List[List[str]]]] = {"bs4": extract_rows_bs4}
+if lxml_html is not None:
+    BACKENDS["lxml"] = extract_rows_lxml
+
+DEFAULT_BACKEND = os.environ.get("HTML_PARSER", "lxml" if "lxml" in BACKENDS else "bs4")
+
+
+def extract_rows(page: str, table_id: str, backend: Optional[str] = None, **options) -> List[List[str]]:
+    name = backend or DEFAULT_BACKEND
+
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown or unavailable HTML parser backend '{name}' (available: {sorted(BACKENDS)})")
+
+    return BACKENDS[name](page, table_id, **options)
+
+
+# Transpose extracted rows into per-column arrays; columns outside text_columns are parsed as numbers
+# (empty cells become NaN), so the frame is typed without a second pass over the parsed tree
+def rows_to_frame(rows: List[List[str]], columns: List[str], text_columns: List[str]) -> pd.DataFrame:
+    for row in rows:
+        if len(row) != len(columns):
+            raise ValueError(f"Expected {len(columns)} cells per row, got {len(row)}: {row[:3]}")
+
+    arrays = list(zip(*rows)) if rows else [()] * len(columns)
+    data = {}
+
+    for column, values in zip(columns, arrays):
+        if column in text_columns:
+            data[column] = np.array(values, dtype=object)
+        else:
+            data[column] = pd.to_numeric(np.array(values, dtype=object), errors="coerce")
+
+    return pd.DataFrame(data, columns=columns)
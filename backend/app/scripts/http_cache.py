@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from scripts.fetch import engine
+
+# Per-source freshness settings, in seconds: (ttl, stale_while_revalidate)
+#   - within ttl, the cached payload is served without touching the network
+#   - within ttl + stale_while_revalidate, the cached payload is served while a background refetch runs
+#   - beyond that, the payload is refetched before returning; if the refetch fails, the last good payload is used
+SOURCE_TTLS = {
+    "standings": (6 * 3600, 18 * 3600),
+    "skaters": (6 * 3600, 18 * 3600),
+    "rosters": (24 * 3600, 6 * 24 * 3600),
+    "awards": (7 * 24 * 3600, 30 * 24 * 3600),
+    "default": (3600, 3600)
+}
+
+
+# Disk-backed HTTP GET cache with per-source TTLs, stale-while-revalidate and size-bounded LRU eviction
+class HTTPCache:
+    def __init__(self, directory: str, max_bytes: int = 64 * 1024 * 1024, ttls: Dict[str, Tuple[int, int]] = None,
+                 fetcher: Callable[[str], Tuple[bytes, Optional[str]]] = engine.fetch) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttls = ttls if ttls is not None else SOURCE_TTLS
+        self.fetcher = fetcher
+
+        self._lock = threading.Lock()
+        self._revalidating = {}
+
+    def _paths(self, url: str) -> Tuple[str, str]:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.directory, key)
+
+        return base + ".body", base + ".meta"
+
+    def _read(self, url: str) -> Tuple[Optional[bytes], Optional[dict]]:
+        body_path, meta_path = self._paths(url)
+
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None, None
+
+        # touch metadata file so eviction order tracks last access, not just last fetch
+        try:
+            os.utime(meta_path)
+        except OSError:
+            pass
+
+        return body, meta
+
+    # Write a file atomically so readers (or a restart mid-write) never see a partial payload
+    def _write_atomic(self, path: str, data: bytes) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _store(self, url: str, body: bytes, encoding: Optional[str]) -> dict:
+        os.makedirs(self.directory, exist_ok=True)
+        body_path, meta_path = self._paths(url)
+
+        meta = {"url": url, "fetched_at": time.time(), "encoding": encoding, "size": len(body)}
+
+        with self._lock:
+            self._write_atomic(body_path, body)
+            self._write_atomic(meta_path, json.dumps(meta).encode("utf-8"))
+            self._evict()
+
+        return meta
+
+    # Delete least recently used entries until the cache fits within max_bytes
+    def _evict(self) -> None:
+        entries = []
+        total = 0
+
+        for name in os.listdir(self.directory):
+            if not name.endswith(".meta"):
+                continue
+            meta_path = os.path.join(self.directory, name)
+            body_path = meta_path[:-len(".meta")] + ".body"
+            try:
+                size = os.path.getsize(body_path)
+                last_access = os.path.getmtime(meta_path)
+            except OSError:
+                continue
+            entries.append((last_access, size, body_path, meta_path))
+            total += size
+
+        for _, size, body_path, meta_path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            for path in (body_path, meta_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+
+    def _refetch(self, url: str) -> Tuple[bytes, dict]:
+        body, encoding = self.fetcher(url)
+        meta = self._store(url, body, encoding)
+
+        return body, meta
+
+    def _revalidate_in_background(self, url: str) -> None:
+        with self._lock:
+            if url in self._revalidating:
+                return
+
+            def run():
+                try:
+                    self._refetch(url)
+                except Exception as e:
+                    print(f"Background refresh of {url} failed, keeping cached copy: {e}")
+                finally:
+                    with self._lock:
+                        self._revalidating.pop(url, None)
+
+            thread = threading.Thread(target=run, daemon=True)
+            self._revalidating[url] = thread
+
+        thread.start()
+
+    # Wait for any in-flight background revalidations to finish
+    def join(self) -> None:
+        with self._lock:
+            threads = list(self._revalidating.values())
+
+        for thread in threads:
+            thread.join()
+
+    # Return response bytes and metadata for a URL, going to the network only when the cache can't answer.  With
+    # max_age, entries older than that many seconds are refetched before returning (never served stale while a
+    # background refetch runs), and a cached copy is only used if the refetch fails
+    def get(self, url: str, source: str = "default", max_age: Optional[float] = None) -> Tuple[bytes, dict]:
+        ttl, stale_window = self.ttls.get(source, self.ttls["default"])
+        if max_age is not None:
+            ttl, stale_window = min(ttl, max_age), 0
+
+        body, meta = self._read(url)
+
+        if body is not None:
+            age = time.time() - meta["fetched_at"]
+            if age < ttl:
+                return body, meta
+            if age < ttl + stale_window:
+                self._revalidate_in_background(url)
+                return body, meta
+
+        try:
+            return self._refetch(url)
+        except Exception as e:
+            # stale-if-error: an upstream outage falls back to the last good payload
+            if body is not None:
+                print(f"Fetch of {url} failed, serving cached copy from {time.ctime(meta['fetched_at'])}: {e}")
+                return body, meta
+            raise
+
+    def get_text(self, url: str, source: str = "default", max_age: Optional[float] = None) -> str:
+        body, meta = self.get(url, source, max_age)
+
+        return body.decode(meta.get("encoding") or "utf-8", errors="replace")
+
+    def get_json(self, url: str, source: str = "default", max_age: Optional[float] = None):
+        body, _ = self.get(url, source, max_age)
+
+        return json.loads(body)
+
+
+cache = HTTPCache(os.environ.get("HTTP_CACHE_DIR", "../cache/http"))
@@ -0,0 +1,54 @@
+import fcntl
+import os
+from typing import Optional
+
+from scripts.artifacts import ARTIFACT_DIR
+
+# Lock file deciding which server worker refreshes; it lives with the artifacts every worker reads
+REFRESH_LOCK = os.environ.get("REFRESH_LOCK", os.path.join(ARTIFACT_DIR, ".refresh.lock"))
+
+# How often followers look for a newer artifact (and for a leader that has gone away), in seconds
+FOLLOW_INTERVAL = int(os.environ.get("ARTIFACT_POLL_SECONDS", "30"))
+
+
+# Leader election between the worker processes of one server: the worker holding an exclusive flock on the lock file
+# scrapes, trains and publishes artifacts; the others only load what it publishes.  The OS releases the lock when
+# the leader exits, so a follower's next try_acquire takes over.  (Each worker must open the lock itself, which the
+# app does in its startup hook, after forking.)
+class RefreshLeader:
+    def __init__(self, path: str = REFRESH_LOCK) -> None:
+        self.path = path
+        self._fd: Optional[int] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._fd is not None
+
+    # Take the lock if no other process holds it; returns whether this process is (now) the leader
+    def try_acquire(self) -> bool:
+        if self._fd is not None:
+            return True
+
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+
+        # record the leader's pid for operators; the lock itself is what counts
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{os.getpid()}\n".encode("utf-8"))
+        self._fd = fd
+
+        return True
+
+    def release(self) -> None:
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
@@ -0,0 +1,296 @@
+import abc
+import atexit
+import contextlib
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+# Minimal Prometheus-style metrics (counters, gauges, histograms with labels) rendered in the text exposition format,
+# so the API and the refresh pipeline can be monitored without another dependency
+
+PREFIX = "nhl_awards_"
+
+# Multi-process mode, for servers with several worker processes: each process writes its values to
+# <METRICS_MULTIPROC_DIR>/<pid>.json every FLUSH_INTERVAL seconds, and /metrics (on whichever worker serves it) renders
+# every process' values combined.  Counters and histograms are summed over every process that has written, so they stay
+# monotonic when a worker restarts; gauges are combined over live processes only.  The directory has to be emptied
+# before the server starts (the Docker image's prestart.sh does this).
+MULTIPROC_DIR = os.environ.get("METRICS_MULTIPROC_DIR", "")
+FLUSH_INTERVAL = 5
+
+# Latency buckets for request handling and for refresh work (scrapes, pipeline stages, model fits), in seconds
+REQUEST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+REFRESH_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+# Base of the metric types; each one defines how processes' values combine and how its samples are rendered
+class Metric(abc.ABC):
+    kind = ""
+
+    def __init__(self, name: str, help_text: str) -> None:
+        self.name = PREFIX + name
+        self.help_text = help_text
+        self._lock = threading.Lock()
+        self._values: Dict[tuple, object] = {}
+
+    @staticmethod
+    def _key(labels: Dict[str, str]) -> tuple:
+        return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+    def snapshot(self) -> Dict[tuple, object]:
+        with self._lock:
+            return {key: value for key, value in self._values.items()}
+
+    # This process' values in JSON form, for multi-process mode
+    def export(self) -> list:
+        return [[[list(label) for label in key], value] for key, value in self.snapshot().items()]
+
+    # Combine the exported values of several processes into one set of values
+    @abc.abstractmethod
+    def combine(self, exports: List[list]) -> Dict[tuple, object]:
+        pass
+
+    @abc.abstractmethod
+    def samples(self, values: Dict[tuple, object]) -> List[str]:
+        pass
+
+    # Render this process' values, or the given (combined) values
+    def render(self, values: Dict[tuple, object] = None) -> str:
+        values = self.snapshot() if values is None else values
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"] + self.samples(values)
+
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def combine(self, exports: List[list]) -> Dict[tuple, object]:
+        combined = {}
+        for export in exports:
+            for key, value in export:
+                key = tuple(tuple(label) for label in key)
+                combined[key] = combined.get(key, 0.0) + value
+
+        return combined
+
+    def samples(self, values: Dict[tuple, object]) -> List[str]:
+        return [f"{self.name}{_format_labels(key)} {_format_value(value)}" for key, value in values.items()]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    # `aggregate` combines the values different processes hold for the same labels (e.g. max, min)
+    def __init__(self, name: str, help_text: str, aggregate: Callable[[List[float]], float] = max) -> None:
+        super().__init__(name, help_text)
+        self.aggregate = aggregate
+
+    def combine(self, exports: List[list]) -> Dict[tuple, object]:
+        grouped = {}
+        for export in exports:
+            for key, value in export:
+                grouped.setdefault(tuple(tuple(label) for label in key), []).append(value)
+
+        return {key: self.aggregate(values) for key, values in grouped.items()}
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    # Drop every labelled value (e.g. before publishing the row counts of a new state)
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = REQUEST_BUCKETS) -> None:
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    # Time the enclosed block and record its duration, whether it finishes or raises
+    @contextlib.contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self) -> Dict[tuple, object]:
+        with self._lock:
+            return {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+
+    def combine(self, exports: List[list]) -> Dict[tuple, object]:
+        combined = {}
+        for export in exports:
+            for key, (counts, total) in export:
+                key = tuple(tuple(label) for label in key)
+                previous_counts, previous_total = combined.get(key, ([0] * len(self.buckets), 0.0))
+                combined[key] = ([a + b for a, b in zip(previous_counts, counts)], previous_total + total)
+
+        return combined
+
+    def samples(self, values: Dict[tuple, object]) -> List[str]:
+        lines = []
+        for key, (counts, total) in values.items():
+            for bound, count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', _format_value(bound)),))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {counts[-1]}")
+
+        return lines
+
+
+REQUEST_DURATION = Histogram("http_request_duration_seconds", "Time to handle an API request, by route")
+REQUESTS = Counter("http_requests_total", "API requests handled, by route, method and status code")
+
+SCRAPE_DURATION = Histogram("scrape_duration_seconds", "Time to fetch one refresh source, by source",
+                            REFRESH_BUCKETS)
+SCRAPE_FAILURES = Counter("scrape_failures_total", "Refresh source fetches that failed, by source")
+STAGE_DURATION = Histogram("pipeline_stage_duration_seconds", "Time spent in each preprocessing stage",
+                           REFRESH_BUCKETS)
+FIT_DURATION = Histogram("model_fit_duration_seconds", "Time to fit one award model, by award target and backend",
+                         REFRESH_BUCKETS)
+
+DATASET_ROWS = Gauge("dataset_rows", "Rows in the serving state's data, by award and split (train/current)")
+MODEL_INFO = Gauge("model_info", "Version of the serving state's models (value is always 1)")
+# across workers, the oldest model any of them serves
+MODEL_TIMESTAMP = Gauge("model_timestamp_seconds", "Unix time the serving state's models were built", min)
+MODEL_AGE = Gauge("model_age_seconds", "Age of the serving state's models")
+
+REFRESH_RUNNING = Gauge("refresh_running", "1 while a refresh is running")
+REFRESH_LAST_SUCCESS = Gauge("refresh_last_success", "1 if the last finished refresh succeeded, 0 if it failed")
+REFRESH_UNCHANGED = Counter("refresh_unchanged_total", "Refreshes skipped because no input had changed")
+REFRESH_LAST_FINISHED = Gauge("refresh_last_finished_timestamp_seconds", "Unix time the last refresh finished, "
+                                                                         "by outcome")
+
+REGISTRY: List[Metric] = [REQUEST_DURATION, REQUESTS, SCRAPE_DURATION, SCRAPE_FAILURES, STAGE_DURATION, FIT_DURATION,
+                          DATASET_ROWS, MODEL_INFO, MODEL_TIMESTAMP, MODEL_AGE, REFRESH_RUNNING, REFRESH_LAST_SUCCESS,
+                          REFRESH_UNCHANGED, REFRESH_LAST_FINISHED]
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _process_path(directory: str, pid: int) -> str:
+    return os.path.join(directory, f"{pid}.json")
+
+
+# Write this process' values to the multi-process directory
+def flush(directory: str = MULTIPROC_DIR) -> None:
+    os.makedirs(directory, exist_ok=True)
+    exported = {metric.name: metric.export() for metric in REGISTRY}
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(exported, f)
+    os.replace(tmp_path, _process_path(directory, os.getpid()))
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+
+    return True
+
+
+# Every process' values combined, by metric name
+def _collect(directory: str) -> Dict[str, Dict[tuple, object]]:
+    flush(directory)
+
+    processes = []
+    for name in os.listdir(directory):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(directory, name)) as f:
+                processes.append((int(name[:-len(".json")]), json.load(f)))
+        except (OSError, ValueError):
+            continue
+
+    combined = {}
+    for metric in REGISTRY:
+        exports = [exported.get(metric.name, []) for pid, exported in processes
+                   if not isinstance(metric, Gauge) or _alive(pid)]
+        combined[metric.name] = metric.combine(exports)
+
+    return combined
+
+
+# Periodically write this process' values in multi-process mode (and once more on exit); a no-op otherwise
+_flusher = None
+
+
+def start_flushing(directory: str = MULTIPROC_DIR, interval: float = FLUSH_INTERVAL) -> None:
+    global _flusher
+
+    if not directory or _flusher is not None:
+        return
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                flush(directory)
+            except OSError as e:
+                print(f"Could not write metrics: {e}")
+
+    _flusher = threading.Thread(target=run, daemon=True, name="metrics-flush")
+    _flusher.start()
+    atexit.register(flush, directory)
+
+
+# All metrics in the text exposition format: this process' own, or every process' combined in multi-process mode
+def render(directory: str = MULTIPROC_DIR) -> str:
+    if directory:
+        values = _collect(directory)
+    else:
+        values = {metric.name: metric.snapshot() for metric in REGISTRY}
+
+    # the model age is derived when rendering, from the (oldest) model timestamp
+    values[MODEL_AGE.name] = {key: time.time() - timestamp for key, timestamp in values[MODEL_TIMESTAMP.name].items()}
+
+    return "\n".join(metric.render(values[metric.name]) for metric in REGISTRY) + "\n"
@@ -1,38 +1,115 @@
+import hashlib
+import json
+import os
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import GradientBoostingRegressor
-from typing import List
+import sklearn
+from concurrent.futures import ThreadPoolExecutor
+from sklearn.ensemble import ExtraTreesRegressor, GradientBoostingRegressor, HistGradientBoostingRegressor, \
+    RandomForestRegressor
+from sklearn.inspection import permutation_importance
+from typing import Callable, Dict, List, Optional
 
+from scripts import metrics
 
-class NorrisModel:
-    # initialize with GB regressor as default
-    def __init__(self, estimator=GradientBoostingRegressor(random_state=1)) -> None:
-        self.estimator = estimator
+# Estimator backends by name, each a factory so every model gets its own (unfitted) estimator
+ESTIMATOR_BACKENDS: Dict[str, Callable[[], object]] = {
+    "gbr": lambda: GradientBoostingRegressor(random_state=1),
+    "hist_gbr": lambda: HistGradientBoostingRegressor(random_state=1),
+    "random_forest": lambda: RandomForestRegressor(n_estimators=200, min_samples_leaf=2, n_jobs=-1, random_state=1),
+    "extra_trees": lambda: ExtraTreesRegressor(n_estimators=200, min_samples_leaf=2, n_jobs=-1, random_state=1)
+}
+
+DEFAULT_BACKEND = os.environ.get("MODEL_BACKEND", "gbr")
+
+# Scores below this (roughly the lowest possible share received, one 5th place vote) count as no votes
+MIN_SCORE = 0.0023
+
+
+def make_estimator(backend: str = None):
+    name = backend or DEFAULT_BACKEND
+
+    if name not in ESTIMATOR_BACKENDS:
+        raise ValueError(f"Unknown estimator backend '{name}' (available: {sorted(ESTIMATOR_BACKENDS)})")
+
+    return ESTIMATOR_BACKENDS[name]()
+
+
+# Content hash of each season's rows, so backtest fold keys and model training versions only change when the data
+# they depend on changes
+def season_digests(data: pd.DataFrame) -> Dict[int, str]:
+    row_hashes = pd.util.hash_pandas_object(data, index=False).to_numpy()
+    columns = ",".join(data.columns).encode("utf-8")
+
+    digests = {}
+    for season, positions in data.groupby("season").indices.items():
+        digest = hashlib.sha256(columns)
+        digest.update(row_hashes[positions].tobytes())
+        digests[int(season)] = digest.hexdigest()
+
+    return digests
+
+
+# Estimator configuration that fitted models (and backtest fold results) depend on
+def model_key(target: str, backend: str) -> str:
+    params = sorted((name, repr(value)) for name, value in make_estimator(backend).get_params().items())
+
+    return json.dumps({"target": target, "backend": backend, "params": params, "scikit-learn": sklearn.__version__})
+
+
+class AwardModel:
+    # initialize with the configured backend's estimator (a new one per model, so models never share a fitted estimator)
+    def __init__(self, target: str = "norris_point_pct", estimator=None, backend: str = None) -> None:
+        self.target = target
+        self.estimator = estimator if estimator is not None else make_estimator(backend)
+        self.backend = type(self.estimator).__name__ if estimator is not None else backend or DEFAULT_BACKEND
         self.feature_importances = None
+        self.train_rows = 0
+        # version of the training data and configuration the model was fitted for (see scripts/model_store.py)
+        self.training_version: Optional[str] = None
+
+    def _features(self, data: pd.DataFrame) -> pd.DataFrame:
+        return data.drop([self.target, "name", "team", "season"], axis=1)
 
-    def fit(self, data: pd.DataFrame) -> None:
+    # Fit on training data, recording how long the fit (including importances) takes
+    def fit(self, data: pd.DataFrame, importances: bool = True) -> None:
+        with metrics.FIT_DURATION.time(target=self.target, backend=self.backend):
+            self._fit(data, importances)
+
+    def _fit(self, data: pd.DataFrame, importances: bool) -> None:
         # separate features from target variable in train data
-        y_train = data["norris_point_pct"]
-        X_train = data.drop(["norris_point_pct", "name", "team", "season"], axis=1)
+        y_train = data[self.target]
+        X_train = self._features(data)
 
         # fit instantiated estimator on features and target in train data
         self.estimator.fit(X_train, y_train)
+        self.train_rows = len(X_train)
+
+        # importances are only needed for served models (backtest folds skip them)
+        if not importances:
+            return
 
-        # determine feature importances (top 10) and apply to class attribute after model fitting
-        importance_values = np.round(self.estimator.feature_importances_, 4)
+        # determine feature importances (top 10) and apply to class attribute after model fitting; estimators without
+        # built-in importances (e.g. histogram gradient boosting) use permutation importance on the training data
+        if hasattr(self.estimator, "feature_importances_"):
+            raw_importances = self.estimator.feature_importances_
+        else:
+            raw_importances = permutation_importance(self.estimator, X_train, y_train, n_repeats=3,
+                                                     random_state=1).importances_mean
+        importance_values = np.round(raw_importances, 4)
         columns = X_train.columns
         self.feature_importances = pd.Series(importance_values, index=columns).sort_values(ascending=False).head(
             10).to_dict()
-        self.feature_importances = self.feature_importances.items()
 
-    def predict(self, data: pd.DataFrame) -> List[dict]:
-        # ensure data does not have target variable or name/season columns included
-        data_filtered = data.drop(["norris_point_pct", "name", "team", "season"], axis=1)
+    # Raw predicted vote share for each row, in row order
+    def predict_scores(self, data: pd.DataFrame) -> np.ndarray:
+        return self.estimator.predict(self._features(data))
 
-        predictions = self.estimator.predict(data_filtered)
+    def predict(self, data: pd.DataFrame) -> List[dict]:
+        predictions = self.predict_scores(data)
 
-        # replace all values less than 0.00023 (roughly lowest possible % received [1 5th place vote])
-        predictions[predictions < 0.0023] = 0
+        # replace all values less than MIN_SCORE (roughly lowest possible % received [1 5th place vote])
+        predictions[predictions < MIN_SCORE] = 0
 
         # rescale prediction values: scale based on difference between sum of values and 1
         predictions = predictions * (1 / np.sum(predictions))
@@ -52,3 +129,24 @@ class NorrisModel:
         results_dict = gt_zero_results.to_dict("records")
 
         return results_dict
+
+
+def _fit_model(target: str, train_data: pd.DataFrame, backend: str = None) -> AwardModel:
+    model = AwardModel(target, backend=backend)
+    model.fit(train_data)
+
+    return model
+
+
+# Fit one model per award concurrently; tree building in scikit-learn releases the GIL, so the fits run on separate
+# cores and refresh time tracks the slowest award rather than the sum of all of them
+def fit_award_models(train_sets: Dict[str, pd.DataFrame], targets: Dict[str, str],
+                     backend: str = None) -> Dict[str, AwardModel]:
+    if len(train_sets) == 1:
+        return {award: _fit_model(targets[award], data, backend) for award, data in train_sets.items()}
+
+    with ThreadPoolExecutor(max_workers=min(len(train_sets), os.cpu_count() or 1), thread_name_prefix="fit") as pool:
+        futures = {award: pool.submit(_fit_model, targets[award], data, backend)
+                   for award, data in train_sets.items()}
+
+        return {award: future.result() for award, future in futures.items()}
@@ -0,0 +1,127 @@
+import argparse
+import hashlib
+import os
+import tempfile
+from typing import Dict, Optional
+
+import joblib
+import pandas as pd
+
+from scripts.awards import AWARDS, available_awards
+from scripts.model import DEFAULT_BACKEND, AwardModel, fit_award_models, model_key, season_digests
+from scripts.preprocess import award_datasets, split_data
+
+MODEL_STORE_DIR = os.environ.get("MODEL_STORE_DIR", "../cache/models")
+
+# Stored models kept per award (older training versions are pruned)
+KEEP_MODELS = 3
+
+
+# Version of an award model's training data and configuration: the completed seasons' rows don't change during a
+# season, so this only changes when a season rolls over into the training data, past data is backfilled or the
+# estimator configuration changes
+def training_version(train_data: pd.DataFrame, target: str, backend: str = None) -> str:
+    digest = hashlib.sha256(model_key(target, backend or DEFAULT_BACKEND).encode("utf-8"))
+
+    for season, season_digest in sorted(season_digests(train_data).items()):
+        digest.update(f"{season}:{season_digest}".encode("utf-8"))
+
+    return digest.hexdigest()[:32]
+
+
+# Fitted award models on disk, one file per award and training version
+class ModelStore:
+    def __init__(self, directory: str = MODEL_STORE_DIR, keep: int = KEEP_MODELS) -> None:
+        self.directory = directory
+        self.keep = keep
+
+    def _path(self, award: str, version: str) -> str:
+        return os.path.join(self.directory, f"{award}-{version}.joblib")
+
+    def load(self, award: str, version: str) -> Optional[AwardModel]:
+        try:
+            model = joblib.load(self._path(award, version))
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Could not load stored {award} model {version}: {e}")
+            return None
+
+        return model if getattr(model, "training_version", None) == version else None
+
+    def save(self, award: str, model: AwardModel) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        os.close(fd)
+
+        try:
+            joblib.dump(model, tmp_path)
+            os.replace(tmp_path, self._path(award, model.training_version))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+        self.prune(award)
+
+    # Drop all but the award's most recently stored models
+    def prune(self, award: str) -> None:
+        paths = [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                 if name.startswith(f"{award}-") and name.endswith(".joblib")]
+
+        for path in sorted(paths, key=os.path.getmtime, reverse=True)[self.keep:]:
+            os.remove(path)
+
+
+# One model per award for its training data: the previous state's model or a stored one when its training version
+# matches, otherwise (or when retraining is forced) a newly fitted model, which is stored for later refreshes
+def ensure_models(train_sets: Dict[str, pd.DataFrame], targets: Dict[str, str], store: ModelStore = None,
+                  previous: Dict[str, AwardModel] = None, retrain: bool = False,
+                  backend: str = None) -> Dict[str, AwardModel]:
+    store = store or ModelStore()
+    previous = previous or {}
+    versions = {award: training_version(data, targets[award], backend) for award, data in train_sets.items()}
+
+    models = {}
+    for award, version in versions.items():
+        if retrain:
+            continue
+        if getattr(previous.get(award), "training_version", None) == version:
+            models[award] = previous[award]
+        else:
+            models[award] = store.load(award, version)
+
+    to_fit = {award: train_sets[award] for award in versions if models.get(award) is None}
+    reused = [award for award in versions if award not in to_fit]
+    if reused:
+        print(f"Training data unchanged for {', '.join(reused)}; reusing fitted models.")
+
+    if to_fit:
+        print(f"Training models for {', '.join(to_fit)}...")
+        for award, model in fit_award_models(to_fit, {award: targets[award] for award in to_fit}, backend).items():
+            model.training_version = versions[award]
+            models[award] = model
+
+            try:
+                store.save(award, model)
+            except Exception as e:
+                print(f"Could not store {award} model: {e}")
+
+    return models
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fit and store award models for the current training data")
+    parser.add_argument("--data", default="../data")
+    parser.add_argument("--out", default=MODEL_STORE_DIR)
+    parser.add_argument("--award", action="append", help="award to train (repeatable; default every available award)")
+    parser.add_argument("--retrain", action="store_true", help="refit even if a model for the training data is stored")
+    args = parser.parse_args()
+
+    train_awards = args.award or available_awards(args.data)
+    splits = {award: split_data(data) for award, data in award_datasets(args.data, train_awards).items()}
+    trained = ensure_models({award: train for award, (train, _) in splits.items()},
+                            {award: AWARDS[award].target for award in splits}, ModelStore(args.out),
+                            retrain=args.retrain)
+
+    for award_name, award_model in trained.items():
+        print(f"{award_name}: training version {award_model.training_version} ({award_model.train_rows} rows)")
@@ -1,10 +1,33 @@
 import os
-import warnings
 
+import numpy as np
 import pandas as pd
 from typing import List, Dict, Tuple
 
-from sklearn.preprocessing import minmax_scale, LabelEncoder
+from sklearn.preprocessing import LabelEncoder
+
+from scripts import catalog, feature_store, stages, teams
+from scripts.awards import AWARDS, Award
+
+SEASON_DATASETS = ["skater_stats", "season_standings"] + [award.voting_dataset for award in AWARDS.values()]
+
+# Lean mode, for running in small containers: steps modify the frames they're given instead of copying them first,
+# columns the model never uses are dropped before the merge, small integer columns stay compact and stage outputs
+# aren't memoized.  The data produced is the same; callers must not reuse frames they pass in.
+LEAN = os.environ.get("PREPROCESS_LEAN", "") not in ("", "0")
+
+
+# A frame a step is about to modify: a defensive copy, or the frame itself in lean mode
+def _owned(df: pd.DataFrame) -> pd.DataFrame:
+    return df if LEAN else df.copy()
+
+
+# Season labels (e.g. "19791980") of the per-season CSVs in one dataset folder, oldest first
+def folder_seasons(source: str, folder: str) -> List[str]:
+    prefix = f"{folder}_"
+
+    return sorted(name[len(prefix):-len(".csv")] for name in os.listdir(os.path.join(source, folder))
+                  if name.startswith(prefix) and name.endswith(".csv"))
 
 
 # Get list of all seasons included in past (non-current season's) data
@@ -12,209 +35,184 @@ def get_seasons(source: str) -> List[str]:
     seasons = None
 
     if "skater_stats.csv" in os.listdir(source):
-        stats_df = pd.read_csv(os.path.join(source, "skater_stats.csv"))
-        seasons = list(stats_df["season"].astype('str').unique())
+        # seasons come from the data manifest, so the stats file itself is never parsed here
+        seasons = catalog.file_seasons(source, "skater_stats.csv")
     else:
-        seasons = [filename.rstrip('.csv')[-8:] for filename in os.listdir(f"{source}/skater_stats")]
+        seasons = folder_seasons(source, "skater_stats")
 
     return seasons
 
 
-# If separate folders of individual CSV files need to be aggregated
+# If separate folders of individual CSV files need to be aggregated; each dataset is read season by season and
+# concatenated once, so rebuilding the aggregated files is linear in the number of seasons
 def _merge_csv(source: str) -> None:
-    data_folders = ["skater_stats", "season_standings", "norris_voting"]
-    seasons = get_seasons(source)
+    for folder in SEASON_DATASETS:
+        if not os.path.isdir(os.path.join(source, folder)):
+            continue
 
-    dataframes = {}
+        frames = []
 
-    for season in seasons:
-        for folder in data_folders:
-            df = pd.read_csv(f"{source}/{folder}/{folder}_{season}.csv")
+        for season in folder_seasons(source, folder):
+            df = pd.read_csv(os.path.join(source, folder, f"{folder}_{season}.csv"))
             df["season"] = season
-            if dataframes.get(folder) is None:
-                dataframes[folder] = df
-            else:
-                dataframes[folder] = pd.concat([dataframes[folder], df]).reset_index(drop=True)
+            frames.append(df)
+
+        if frames:
+            pd.concat(frames, ignore_index=True).to_csv(os.path.join(source, f"{folder}.csv"), index=False)
+
+
+def _read_csv(path: str) -> pd.DataFrame:
+    if catalog.schema_name(catalog.dataset_name(os.path.basename(path))) is not None:
+        return catalog.read_dataset(path)
 
-    for df_name in dataframes:
-        dataframes[df_name].to_csv(os.path.join(source, f"{df_name}.csv"), index=False)
+    return pd.read_csv(path)
+
+
+# Parsed CSVs are memoized by file size and modification time across reads
+READ_MEMO = stages.StageMemo()
+
+
+# Read either the past (aggregated) or the current season's CSVs into separate dataframes; the files are independent,
+# so they are read concurrently
+def _read_csv_group(source: str, current: bool) -> Dict[str, pd.DataFrame]:
+    csv_files = [name for name in os.listdir(source) if ".csv" in name and ("current" in name) == current]
+    names = {filename: catalog.dataset_name(filename) for filename in csv_files}
+
+    read_graph = stages.StageGraph("read_csv", [
+        stages.Stage(f"read:{filename}", _read_csv, [f"path:{filename}"], memoize=True, key=stages.file_fingerprint)
+        for filename in csv_files], memo=READ_MEMO)
+    frames = read_graph.run({f"path:{filename}": os.path.join(source, filename) for filename in csv_files},
+                            memoize=not LEAN)
+
+    return {names[filename]: frames[f"read:{filename}"] for filename in csv_files}
+
+
+# Fingerprint of the past seasons' CSVs by size and modification time (the current season's are rewritten by every
+# refresh, and are covered by the fingerprints of the fetched pages instead)
+def historical_fingerprint(source: str) -> str:
+    csv_files = sorted(name for name in os.listdir(source) if ".csv" in name and "current" not in name)
+
+    return stages.fingerprint([stages.file_fingerprint(os.path.join(source, name)) for name in csv_files])
 
 
 # Convert aggregated CSVs to separate dataframes
 def read_to_dfs(source: str) -> dict:
     print("Importing CSV data into dataframes...")
 
-    past_csv_files = [name for name in os.listdir(source) if ".csv" in name and "current" not in name]
-    current_csv_files = [name for name in os.listdir(source) if (".csv" in name) and ("current" in name)]
-
-    dataframes = {}
-
     # read past data into DFs
-    for filename in past_csv_files:
-        df = pd.read_csv(os.path.join(source, filename))
-        name = filename.split('.')[0]
-        dataframes[name] = df
+    dataframes = _read_csv_group(source, current=False)
 
     # read current data into DFs and concat
-    for filename in current_csv_files:
-        df = pd.read_csv(os.path.join(source, filename))
-        name = filename.split('.')[0].rstrip('_current')
-        dataframes[name] = pd.concat([dataframes[name], df])
+    for name, df in _read_csv_group(source, current=True).items():
+        dataframes[name] = catalog.concat_dataset(name, [dataframes[name], df])
 
     return dataframes
 
 
-# Fix team name values, including apply proper Winnipeg Jets names
-def fix_team_names(team_data: pd.DataFrame) -> pd.DataFrame:
-    # Fix team name values
-    replace_values = {
-        "ampa Bay Lightning": "Tampa Bay Lightning",
-        "ew Jersey Devils": "New Jersey Devils",
-        "hicago Black Hawks": "Chicago Black Hawks",
-        "hiladelphia Flyers": "Philadelphia Flyers",
-        "innesota North Stars": "Minnesota North Stars",
-        "ontreal Canadiens": "Montreal Canadiens",
-        "orida Panthers": "Florida Panthers"
-    }
+# Read only the current season's CSVs
+def read_current_dfs(source: str) -> dict:
+    print("Importing current season CSV data into dataframes...")
 
-    team_data = team_data.copy().replace({"Team": replace_values})
+    return _read_csv_group(source, current=True)
 
-    seasons = list(team_data["season"].unique())
 
-    # fix Jets rows to distinguish old org from new
-    def replace_jets(row):
-        new_jets_start = seasons.index(20112012)
+# Read one award's voting results (all seasons)
+def read_voting(source: str, award: Award) -> pd.DataFrame:
+    voting = catalog.read_dataset(os.path.join(source, f"{award.voting_dataset}.csv"))
+    voting["Player"] = voting["Player"].str.replace("*", "", regex=False)
 
-        if row["Team"] == "Winnipeg Jets":
-            if row["season"] in seasons[new_jets_start:]:  # for seasons 20112012 and later
-                row["Team"] = "Winnipeg Jets (New)"
-            else:
-                row["Team"] = "Winnipeg Jets (Original)"
+    return voting
 
-        return row
 
-    team_data = team_data.apply(replace_jets, axis=1)
+# Fix team name values, including apply proper Winnipeg Jets names
+def fix_team_names(team_data: pd.DataFrame) -> pd.DataFrame:
+    team_data = _owned(team_data)
+    team_data["Team"] = teams.normalize_team_names(team_data["Team"], team_data["season"])
 
     return team_data
 
 
-# Replace full team names with team abbreviations
+# Replace full team names with (categorical) team abbreviations
 def replace_names_abbrevs(team_data: pd.DataFrame) -> pd.DataFrame:
-    team_abbrevs = {
-        "Anaheim Ducks": "ANA",
-        "Arizona Coyotes": "ARI",
-        "Atlanta Flames": "ATF",
-        "Atlanta Thrashers": "ATL",
-        "Boston Bruins": "BOS",
-        "Buffalo Sabres": "BUF",
-        "Carolina Hurricanes": "CAR",
-        "Chicago Black Hawks": "CBH",
-        "Columbus Blue Jackets": "CBJ",
-        "Calgary Flames": "CGY",
-        "Chicago Blackhawks": "CHI",
-        "Colorado Rockies": "CLR",
-        "Colorado Avalanche": "COL",
-        "Dallas Stars": "DAL",
-        "Detroit Red Wings": "DET",
-        "Edmonton Oilers": "EDM",
-        "Florida Panthers": "FLA",
-        "Hartford Whalers": "HAR",
-        "Los Angeles Kings": "LAK",
-        "Mighty Ducks of Anaheim": "MDA",
-        "Minnesota Wild": "MIN",
-        "Minnesota North Stars": "MNS",
-        "Montreal Canadiens": "MTL",
-        "New Jersey Devils": "NJD",
-        "Nashville Predators": "NSH",
-        "New York Islanders": "NYI",
-        "New York Rangers": "NYR",
-        "Ottawa Senators": "OTT",
-        "Philadelphia Flyers": "PHI",
-        "Phoenix Coyotes": "PHX",
-        "Pittsburgh Penguins": "PIT",
-        "Quebec Nordiques": "QUE",
-        "San Jose Sharks": "SJS",
-        "St. Louis Blues": "STL",
-        "Tampa Bay Lightning": "TBL",
-        "Toronto Maple Leafs": "TOR",
-        "Vancouver Canucks": "VAN",
-        "Vegas Golden Knights": "VEG",
-        "Winnipeg Jets (Original)": "WIN",
-        "Winnipeg Jets (New)": "WPG",
-        "Washington Capitals": "WSH"
-    }
-
-    team_data = team_data.copy().replace(team_abbrevs)
+    team_data = _owned(team_data)
+    team_data["Team"] = teams.team_names_to_abbrevs(team_data["Team"])
 
     return team_data
 
 
 # Eliminates multiple entries for players (i.e. due to being traded mid-season
 def convert_multiples(skater_data: pd.DataFrame) -> pd.DataFrame:
-    skater_data = skater_data.copy()
+    skater_data = _owned(skater_data)
+
+    # defensemen and forwards are resolved separately: the same name can be a different player at the other position
+    # (or a player listed at another position for part of the season), and awards model each group on its own
+    skater_data["position_group"] = np.where(skater_data["Pos"] == "D", "D", "F")
 
     # identify all multi-team players (in most cases, players who were traded during a season)
     # by filtering dataframe to entries with "TOT" as the team
-    traded_players = skater_data[skater_data["Tm"] == "TOT"]
+    is_total = skater_data["Tm"] == "TOT"
+    player_keys = ["Player", "season", "position_group"]
 
-    # crate a list that contains just the names and seasons, which we can iterate through
-    traded_players_list = [(row[0], row[1]) for row in traded_players[["Player", "season"]].values]
+    # sort single-team rows by games played first, then PLUSMINUS > points if GP the same for multiple rows;
+    # the sort is stable, so ties keep their original order, and the first row per player + season is the team to use
+    team_rows = skater_data.loc[~is_total, player_keys + ["Tm", "GP", "PLUSMINUS", "PTS"]]
+    team_rows = team_rows.sort_values(by=["GP", "PLUSMINUS", "PTS"], ascending=False, kind="mergesort")
+    team_most_games = team_rows.drop_duplicates(subset=player_keys).set_index(player_keys)["Tm"]
 
-    # create a list and populate with the team abbreviations that represent replacement values for "TOT" for each player + season
-    team_most_games = []
+    # now replace "TOT" values in the original dataframe with the updated team abbreviation values
+    traded_keys = pd.MultiIndex.from_frame(skater_data.loc[is_total, player_keys])
+    skater_data.loc[is_total, "Tm"] = team_most_games.reindex(traded_keys).values
 
-    for player, season in traded_players_list:
-        player_data = skater_data.loc[
-            (skater_data["Player"] == player) & (skater_data["season"] == season) & (
-                    skater_data["Tm"] != "TOT")].copy()
-        # sort each individual player's DF by games played first, then PLUSMINUS > points if GP the same for multiple rows
-        player_data = player_data.sort_values(by=["GP", "PLUSMINUS", "PTS"], ascending=False)
-        team_most_games.append(player_data.iloc[0]["Tm"])
+    skater_data = skater_data.drop_duplicates(subset=["season", "Rk", "position_group"], keep="last")
 
-    # now replace "TOT" values in the original defensemen dataframe with the updated team abbreviation values
-    skater_data.loc[skater_data["Tm"] == "TOT", "Tm"] = team_most_games
+    return skater_data.drop(columns="position_group")
 
-    skater_data = skater_data.drop_duplicates(subset=["season", "Rk"], keep="last")
 
-    return skater_data
+# Clean standings: remove playoff asterisks, normalize team names and replace them with abbreviations
+def clean_standings(standings: pd.DataFrame) -> pd.DataFrame:
+    standings = _owned(standings)
+    standings["Team"] = standings["Team"].str.replace("*", "", regex=False)
 
+    return replace_names_abbrevs(fix_team_names(standings))
 
-# Run dataframes through all pre-merge preprocessing steps
-def pre_merge_preprocess(dfs: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
-    print("Performing pre-merge preprocessing...")
 
-    # remove asterisks from team names
-    dfs["season_standings"]["Team"] = dfs["season_standings"]["Team"].str.replace("*", "")
-    dfs["skater_stats"]["Player"] = dfs["skater_stats"]["Player"].str.replace("*", "")
-    dfs["norris_voting"]["Player"] = dfs["norris_voting"]["Player"].str.replace("*", "")
+# Clean skater stats: remove asterisks from names, then resolve multi-team (traded) players
+def clean_skaters(skaters: pd.DataFrame) -> pd.DataFrame:
+    skaters = _owned(skaters)
+    skaters["Player"] = skaters["Player"].str.replace("*", "", regex=False)
 
-    # Adjust team names in standings data
-    dfs["season_standings"] = fix_team_names(dfs["season_standings"])
+    # every position is kept; each award filters to its eligible players after the shared preprocessing
+    skaters = skaters.sort_values(by=["season", "Player", "GP"]).reset_index(drop=True)
+    skaters = convert_multiples(skaters)
 
-    # replace team names with abbrevs in standings data
-    dfs["season_standings"] = replace_names_abbrevs(dfs["season_standings"])
+    # the rank only identifies rows within convert_multiples
+    return skaters.drop(columns="Rk") if LEAN else skaters
 
-    # filter player data to defensemen only
-    dfs["skater_stats"] = dfs["skater_stats"][dfs["skater_stats"]["Pos"] == "D"].copy().sort_values(
-        by=["season", "Player", "GP"]).reset_index(drop=True)
 
-    # deal with multiples (traded players)
-    dfs["skater_stats"] = convert_multiples(dfs["skater_stats"].copy())
+# Run dataframes through all pre-merge preprocessing steps (the standings and skater branches run concurrently)
+def pre_merge_preprocess(dfs: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    print("Performing pre-merge preprocessing...")
+
+    cleaned = SEASON_GRAPH.run(dfs, outputs=["clean_skaters", "clean_standings"], memoize=not LEAN)
 
-    return dfs
+    return dict(dfs, skater_stats=cleaned["clean_skaters"], season_standings=cleaned["clean_standings"])
 
 
-# Merge dataframes into one, dropping duplicate columns along the way
+# Merge player and team standings dataframes into one (voting results are joined per award later)
 def merge_dataframes(dfs: Dict[str, pd.DataFrame]) -> pd.DataFrame:
     print("Merging dataframes...")
 
-    players_teams_data = dfs["skater_stats"].merge(dfs["season_standings"], how="left", left_on=["season", "Tm"],
-                                                   right_on=["season", "Team"], suffixes=("_player", "_team"))
-    voting_data = dfs["norris_voting"].drop(["Age", "Tm", "Pos", "G", "A", "PTS", "PLUSMINUS", "PS"], axis=1)
-    all_merged_data = players_teams_data.merge(voting_data, how="left", left_on=["season", "Player"],
-                                               right_on=["season", "Player"])
+    skaters, standings = dfs["skater_stats"], dfs["season_standings"]
+
+    if LEAN:
+        # of the standings, only the points survive drop_unused_cols, so nothing else is carried through the merge
+        standings = standings[["season", "Team", "PTS"]]
+        skaters = skaters.rename(columns={"GP": "GP_player"})
 
-    return all_merged_data
+    players_teams_data = skaters.merge(standings, how="left", left_on=["season", "Tm"], right_on=["season", "Team"],
+                                       suffixes=("_player", "_team"))
+
+    return players_teams_data
 
 
 # Drop columns that won't be used for modeling
@@ -222,7 +220,6 @@ def drop_unused_cols(df: pd.DataFrame) -> pd.DataFrame:
     # create list of column names that will be dropped from the dataframe
     columns_to_drop = [
         "Rk",
-        "Pos",
         "FOW",
         "FOL",
         "FO%",
@@ -252,42 +249,45 @@ def drop_unused_cols(df: pd.DataFrame) -> pd.DataFrame:
         "GPS"
     ]
 
-    # create a copy of the dataframe post-dropping of columns
-    pared_data = df.drop(columns_to_drop, axis=1).copy()
+    # create a copy of the dataframe post-dropping of columns (columns pruned when reading the CSVs are already gone);
+    # drop already returns a new frame, so lean mode doesn't copy it again
+    pared_data = df.drop(columns_to_drop, axis=1, errors="ignore")
 
-    return pared_data
+    return pared_data if LEAN else pared_data.copy()
 
 
-# Apply remaining column cleanup/adjustments
-def adjust_remaining_cols(df: pd.DataFrame) -> pd.DataFrame:
-    # create dictionary for substitutions
-    abbrev_subs = {
-        "PHX": "ARI",  # Phoenix Coyotes became Arizona Coyotes
-        "MDA": "ANA",  # Mighty Ducks of Anaheim became Anaheim Ducks
-        "CBH": "CHI",  # Chicago Black Hawks became Chicago Blackhawks
-        "VEG": "VGK"   # Adjust Vegas abbrev to use more commonly used one
-    }
+# Convert compact load dtypes (categoricals, small ints, float32) back to object/int64/float64 before feature math;
+# lean mode keeps the small ints, which are exact and come out of the feature math and scaling as float64 anyway
+def widen_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    for col in df.columns:
+        dtype = df[col].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(object)
+        elif pd.api.types.is_integer_dtype(dtype) and dtype != np.int64 and not LEAN:
+            df[col] = df[col].astype(np.int64)
+        elif pd.api.types.is_float_dtype(dtype) and dtype != np.float64:
+            df[col] = df[col].astype(np.float64)
 
-    # apply substitutions
-    df["Tm"] = df["Tm"].replace(abbrev_subs)
+    return df
 
-    # fix nulls in Votes column
-    df.loc[df["Votes"].isnull(), "Votes"] = 0
 
-    # convert Votes to percentage of total, excluding current season
-    for season in df["season"].unique():
-        season_vote_data = df.loc[df["season"] == season, "Votes"]
-        season_vote_data = season_vote_data / season_vote_data.sum()
-        df.loc[df["season"] == season, "Votes"] = season_vote_data
+# Apply remaining column cleanup/adjustments
+def adjust_remaining_cols(df: pd.DataFrame) -> pd.DataFrame:
+    # fold relocated/renamed franchises into their current abbreviations
+    df["Tm"] = teams.relocate_abbrevs(df["Tm"])
 
-    # fix ATOI column datatype/values
-    df["ATOI"] = df["TOI"] / df["GP_player"]
+    # fix ATOI column datatype/values (the scraped string column isn't read, so insert it in its usual place after TOI)
+    if "ATOI" in df.columns:
+        df["ATOI"] = df["TOI"] / df["GP_player"]
+    else:
+        df.insert(df.columns.get_loc("TOI") + 1, "ATOI", df["TOI"] / df["GP_player"])
 
     # create dictionary for column label substitutions
     new_column_labels = {
         "Player": "name",
         "Age": "age",
         "Tm": "team",
+        "Pos": "position",
         "GP_player": "games_played",
         "G": "goals",
         "A": "assists",
@@ -309,7 +309,6 @@ def adjust_remaining_cols(df: pd.DataFrame) -> pd.DataFrame:
         "BLK": "blocked_shots",
         "HIT": "hits",
         "PTS_team": "team_standings_pts",
-        "Votes": "norris_point_pct",
     }
 
     # apply substitutions and check new column labels
@@ -329,13 +328,16 @@ def fix_missing_values(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
+# Stats that get per-game and per-60 versions
+AVERAGED_STATS = ["goals", "assists", "points", "blocked_shots", "hits"]
+
+
 # Add per-game and per-60 features
 def generate_features(df: pd.DataFrame) -> pd.DataFrame:
-    stats_to_average = ["goals", "assists", "points", "blocked_shots", "hits"]
     pg_suffix = "_per_game"
     p60_suffix = "_per_60"
 
-    for stat in stats_to_average:
+    for stat in AVERAGED_STATS:
         pg_label = stat + pg_suffix
         df[pg_label] = df[stat] / df["games_played"]
 
@@ -345,24 +347,78 @@ def generate_features(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
+# Continuous columns min-max scaled within each season
+SCALED_COLUMNS = ["age", "games_played", "goals", "assists", "points", "plus_minus", "penalty_minutes",
+                  "point_share", "even_strength_goals", "power_play_goals", "shorthanded_goals",
+                  "game_winning_goals", "even_strength_assists", "power_play_assists", "shorthanded_assists",
+                  "shots", "shooting_pct", "total_toi", "avg_toi", "blocked_shots", "hits", "team_standings_pts",
+                  "goals_per_game", "goals_per_60", "assists_per_game", "assists_per_60", "points_per_game",
+                  "points_per_60", "blocked_shots_per_game", "blocked_shots_per_60", "hits_per_game",
+                  "hits_per_60"]
+
+
+# Group rows by season: sorted unique seasons, each row's season group, row order sorted by group, group start offsets
+def _season_groups(seasons: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    unique_seasons, inverse = np.unique(seasons, return_inverse=True)
+    order = np.argsort(inverse, kind="stable")
+    starts = np.searchsorted(inverse[order], np.arange(len(unique_seasons)))
+
+    return unique_seasons, inverse, order, starts
+
+
+# Per-season min-max scaler (same arithmetic and NaN handling as sklearn's minmax_scale), reusable on new rows
+class SeasonScaler:
+    def __init__(self, columns: List[str]) -> None:
+        self.columns = columns
+        self.seasons = None
+        self.scale_ = None
+        self.min_ = None
+
+    def fit(self, df: pd.DataFrame) -> "SeasonScaler":
+        seasons, _, order, starts = _season_groups(df["season"].to_numpy())
+        values = df[self.columns].to_numpy(dtype=np.float64)[order]
+
+        # fmin/fmax ignore NaN like nanmin/nanmax, and give NaN for all-NaN seasons without warnings
+        data_min = np.fmin.reduceat(values, starts, axis=0)
+        data_range = np.fmax.reduceat(values, starts, axis=0) - data_min
+
+        # constant columns scale to 0 rather than dividing by zero
+        data_range[data_range < 10 * np.finfo(np.float64).eps] = 1.0
+
+        self.seasons = seasons
+        self.scale_ = 1.0 / data_range
+        self.min_ = -data_min * self.scale_
+
+        return self
+
+    def transform(self, df: pd.DataFrame) -> np.ndarray:
+        season_values = df["season"].to_numpy()
+        idx = np.searchsorted(self.seasons, season_values).clip(max=len(self.seasons) - 1)
+
+        if not np.array_equal(self.seasons[idx], season_values):
+            raise ValueError("SeasonScaler was not fit on every season being transformed")
+
+        return df[self.columns].to_numpy(dtype=np.float64) * self.scale_[idx] + self.min_[idx]
+
+    # Scale and offset of one fitted season for the given columns (scaled = raw * scale + offset)
+    def season_params(self, season: int, columns: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        idx = np.searchsorted(self.seasons, season)
+
+        if idx == len(self.seasons) or self.seasons[idx] != season:
+            raise ValueError(f"SeasonScaler was not fit on season {season}")
+
+        positions = [self.columns.index(column) for column in columns]
+
+        return self.scale_[idx, positions], self.min_[idx, positions]
+
+
 # Rescale continuous variables to establish equivalency between seasons (using min-max scaling)
 def rescale_continuous(df: pd.DataFrame) -> pd.DataFrame:
-    cols = ["age", "games_played", "goals", "assists", "points", "plus_minus", "penalty_minutes",
-            "point_share", "even_strength_goals", "power_play_goals", "shorthanded_goals",
-            "game_winning_goals", "even_strength_assists", "power_play_assists", "shorthanded_assists",
-            "shots", "shooting_pct", "total_toi", "avg_toi", "blocked_shots", "hits", "team_standings_pts",
-            "goals_per_game", "goals_per_60", "assists_per_game", "assists_per_60", "points_per_game",
-            "points_per_60", "blocked_shots_per_game", "blocked_shots_per_60", "hits_per_game",
-            "hits_per_60"]
-
-    with warnings.catch_warnings():
-        # temporarily ignore RuntimeWarning for trying to rescale segments of data with NaN values
-        warnings.filterwarnings("ignore", category=RuntimeWarning)
-
-        for season in df["season"].unique():
-            season_cols = df.loc[df["season"] == season, cols].copy()
-            rescaled_data = minmax_scale(season_cols)
-            df.loc[df["season"] == season, cols] = rescaled_data
+    scaler = SeasonScaler(SCALED_COLUMNS).fit(df)
+    df[SCALED_COLUMNS] = scaler.transform(df)
+
+    # keep the fitted scaler so the same scaling can be applied to new rows later
+    df.attrs["season_scaler"] = scaler
 
     return df
 
@@ -373,61 +429,139 @@ def encode_categorical(df: pd.DataFrame) -> pd.DataFrame:
     encoder = LabelEncoder()
     df["team_encoded"] = encoder.fit_transform(df["team"])
 
+    # keep the team -> code mapping so new rows get the codes the model was trained with
+    df.attrs["team_encoding"] = {team: code for code, team in enumerate(encoder.classes_)}
+
     return df
 
 
 # Filter data to subset that will be used for training model
-def filter_data(df: pd.DataFrame) -> pd.DataFrame:
+def filter_data(df: pd.DataFrame, target: str = "norris_point_pct") -> pd.DataFrame:
     toi_idx = df[df["total_toi"].notnull()].head(1).index.values[0]
 
-    # filter data to when TOI/ATOI started being tracked (index 4388)
-    filtered_data = df.loc[toi_idx:].copy()
+    # filter data to when TOI/ATOI started being tracked (dropping columns below returns a new frame either way)
+    filtered_data = _owned(df.loc[toi_idx:])
 
     # remove columns with null values left
     cols_with_nulls = filtered_data.columns[filtered_data.isna().any()].tolist()
-    cols_to_drop = [col for col in cols_with_nulls if col != "norris_point_pct"]
+    cols_to_drop = [col for col in cols_with_nulls if col != target]
     filtered_data = filtered_data.drop(cols_to_drop, axis=1)
 
     return filtered_data
 
 
-# Apply all post-merge preprocessing steps, using make_pipeline as applicable
-def post_merge_preprocess(df: pd.DataFrame) -> pd.DataFrame:
-    print("Performing post-merge preprocessing...")
+# Join an award's voting results onto its players as the target: each player's share of the season's voting points
+# (seasons without votes, i.e. the current season, become NaN)
+def add_vote_share(df: pd.DataFrame, voting: pd.DataFrame, target: str) -> pd.DataFrame:
+    votes = voting[["season", "Player", "Votes"]].rename(columns={"Player": "name", "Votes": target})
+    df = df.merge(votes, how="left", on=["season", "name"])
+
+    _, inverse, order, starts = _season_groups(df["season"].to_numpy())
+    vote_values = df[target].fillna(0).to_numpy(dtype=np.float64)
+    season_totals = np.add.reduceat(vote_values[order], starts)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        df[target] = vote_values / season_totals[inverse]
+
+    return df
 
-    post_merge_pipe = make_pipeline([drop_unused_cols, adjust_remaining_cols, fix_missing_values, generate_features, rescale_continuous, encode_categorical, filter_data])
 
-    data = post_merge_pipe(df)
+# Award-specific steps on top of the feature base: eligible players and vote share target
+def award_population(base: pd.DataFrame, voting: pd.DataFrame, award: Award) -> pd.DataFrame:
+    df = base[award.eligible(base)].drop(columns="position").reset_index(drop=True)
+
+    return add_vote_share(df, voting, award.target)
+
+
+# Per-award stages: the population, then the steps that depend on it (per-season scaling, team encodings, TOI-era
+# filtering); every award's branch only needs the shared feature base and that award's voting results
+def award_stages(award: Award) -> List[stages.Stage]:
+    name = award.name
+
+    return [
+        stages.Stage(f"{name}:voting", lambda source: read_voting(source, award), ["source"]),
+        stages.Stage(f"{name}:population", lambda base, voting: award_population(base, voting, award),
+                     ["base", f"{name}:voting"]),
+        stages.Stage(f"{name}:rescale_continuous", rescale_continuous, [f"{name}:population"]),
+        stages.Stage(f"{name}:encode_categorical", encode_categorical, [f"{name}:rescale_continuous"]),
+        stages.Stage(f"{name}:filter_data", lambda df: filter_data(df, award.target), [f"{name}:encode_categorical"])
+    ]
 
-    return data
 
+# Season processing as a stage graph: the standings and skater cleaning branches are independent, then the merged
+# frame goes through the row-wise post-merge steps; the result is the feature base shared by every award (cleaned
+# inputs are memoized, so unchanged seasons skip trade resolution)
+SEASON_GRAPH = stages.StageGraph("seasons", [
+    stages.Stage("clean_standings", clean_standings, ["season_standings"], memoize=True),
+    stages.Stage("clean_skaters", clean_skaters, ["skater_stats"], memoize=True),
+    stages.Stage("merge_dataframes",
+                 lambda skaters, standings: merge_dataframes({"skater_stats": skaters, "season_standings": standings}),
+                 ["clean_skaters", "clean_standings"]),
+    stages.Stage("drop_unused_cols", drop_unused_cols, ["merge_dataframes"]),
+    stages.Stage("widen_dtypes", widen_dtypes, ["drop_unused_cols"]),
+    stages.Stage("adjust_remaining_cols", adjust_remaining_cols, ["widen_dtypes"]),
+    stages.Stage("fix_missing_values", fix_missing_values, ["adjust_remaining_cols"]),
+    stages.Stage("generate_features", generate_features, ["fix_missing_values"])
+])
 
-# Create a pipeline of functions
-def make_pipeline(funcs: List[callable]) -> callable:
-    def inner(inp):
-        curr_val = inp
-        for f in funcs:
-            curr_val = f(curr_val)
 
-        return curr_val
+# Run seasons through pre-merge, merge and per-season post-merge steps
+def process_seasons(dfs: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    print("Processing seasons (cleaning, merging and generating features)...")
 
-    return inner
+    return SEASON_GRAPH.run(dfs, outputs=["generate_features"], memoize=not LEAN)["generate_features"]
 
 
-# Create pipeline of data conversion and preprocessing/merge steps up to multiple parameter funcs, output final data and encodings
-def merge_process(source: str) -> pd.DataFrame:
-    process_pipe = make_pipeline([read_to_dfs, pre_merge_preprocess, merge_dataframes, post_merge_preprocess])
-    data = process_pipe(source)
+# Processed historical seasons, read from the feature store when the historical CSVs haven't changed
+def get_historical_data(source: str) -> pd.DataFrame:
+    fingerprint = feature_store.source_fingerprint(source, LEAN)
+    historical_data = feature_store.load_historical(fingerprint)
+
+    if historical_data is None:
+        print("Historical data changed or not yet processed, rebuilding feature store...")
+        historical_data = process_seasons(_read_csv_group(source, current=False))
+        feature_store.save_historical(fingerprint, historical_data)
+
+    return historical_data
+
+
+# Feature base for every season (all skaters, with team standings and derived features), shared by all awards
+def build_feature_base(source: str, incremental: bool = True) -> pd.DataFrame:
+    if not incremental:
+        return process_seasons(read_to_dfs(source))
+
+    # only the current season is processed on each refresh; history comes from the feature store
+    historical_data = get_historical_data(source)
+    current_data = process_seasons(read_current_dfs(source))
+    current_data.index = pd.RangeIndex(len(historical_data), len(historical_data) + len(current_data))
+
+    return pd.concat([historical_data, current_data])
+
+
+# Build the shared feature base once, then each award's model-ready data from it
+def award_datasets(source: str, awards: List[str], incremental: bool = True) -> Dict[str, pd.DataFrame]:
+    # one branch per award, run concurrently; the graph holds the only reference to the feature base, so it's released
+    # once every award's population has been selected from it
+    award_graph = stages.StageGraph("awards", [stage for name in awards for stage in award_stages(AWARDS[name])])
+    outputs = award_graph.run({"source": source, "base": build_feature_base(source, incremental)},
+                              outputs=[f"{name}:filter_data" for name in awards])
+    datasets = {name: outputs[f"{name}:filter_data"] for name in awards}
 
     print("Data preprocessed and ready for use.")
 
-    return data
+    return datasets
+
+
+# Model-ready data for a single award
+def merge_process(source: str, incremental: bool = True, award: str = "norris") -> pd.DataFrame:
+    return award_datasets(source, [award], incremental)[award]
 
 
 def split_data(data: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
     latest_season = data.iloc[-1]["season"]
 
-    train_data = data[data["season"] != latest_season].copy()
-    predict_data = data[data["season"] == latest_season].copy()
+    # boolean selection already copies; the extra copy only detaches the frames from `data`
+    train_data = _owned(data[data["season"] != latest_season])
+    predict_data = _owned(data[data["season"] == latest_season])
 
     return train_data, predict_data
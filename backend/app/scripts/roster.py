@@ -0,0 +1,50 @@
+import unicodedata
+from typing import Dict, List, Optional
+
+# Output fields added to each prediction result from the matching roster record
+ENRICHMENT_FIELDS = ["headshot_url", "team_logo_url", "nhl_page", "team_full"]
+
+
+# Normalize a player name for matching: strip accents/punctuation, lowercase, collapse whitespace
+def normalize_name(name: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", name)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    cleaned = "".join(c if c.isalnum() or c.isspace() else " " for c in stripped.lower())
+
+    return " ".join(cleaned.split())
+
+
+# Build a roster record for a player, precomputing all URLs used in /predict output
+def make_player_record(player_id: int, name: str, team: str, team_full: str, jersey_number: Optional[str]) -> dict:
+    team_dashed = '-'.join(team_full.lower().replace("é", "e").replace('.', '').split())
+    name_dashed = name.lower().replace(" ", "-")
+
+    return {
+        "id": player_id,
+        "name": name,
+        "team": team,
+        "team_full": team_full,
+        "team_dashed": team_dashed,
+        "jersey_number": jersey_number,
+        "headshot_url": f"https://cms.nhl.bamgrid.com/images/headshots/current/168x168/{player_id}.jpg",
+        "team_logo_url": f"https://cdn.usteamcolors.com/images/nhl/{team_dashed}.svg",
+        "nhl_page": f"https://www.nhl.com/player/{name_dashed}-{player_id}"
+    }
+
+
+# League roster indexed by player ID and by (team, normalized name) for O(1) enrichment lookups
+class RosterIndex:
+    def __init__(self, players: List[dict]) -> None:
+        self.by_id: Dict[int, dict] = {}
+        self.by_team_name: Dict[tuple, dict] = {}
+
+        for player in players:
+            player["enrichment"] = {field: player[field] for field in ENRICHMENT_FIELDS}
+            self.by_id[player["id"]] = player
+            self.by_team_name[(player["team"], normalize_name(player["name"]))] = player
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def lookup(self, name: str, team: str) -> Optional[dict]:
+        return self.by_team_name.get((team, normalize_name(name)))
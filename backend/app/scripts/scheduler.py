@@ -0,0 +1,184 @@
+import datetime
+import hmac
+import json
+import os
+import random
+from typing import Callable, List, Optional, Set
+
+from scripts.artifacts import ARTIFACT_DIR
+
+# When the refresh leader refreshes, as a cron expression (minute hour day-of-month month day-of-week, local time)
+REFRESH_SCHEDULE = os.environ.get("REFRESH_SCHEDULE", "0 0 * * *")
+
+# Up to this many seconds are added at random to each scheduled refresh, so deployments don't all scrape at once
+REFRESH_JITTER = int(os.environ.get("REFRESH_JITTER_SECONDS", "300"))
+
+# After a failed refresh, retry after REFRESH_BACKOFF seconds, doubling with each further failure up to
+# REFRESH_BACKOFF_MAX (or at the next scheduled time, if that comes first)
+REFRESH_BACKOFF = int(os.environ.get("REFRESH_BACKOFF_SECONDS", "300"))
+REFRESH_BACKOFF_MAX = int(os.environ.get("REFRESH_BACKOFF_MAX_SECONDS", str(6 * 3600)))
+
+# Manual refresh requests are left in this file for the refresh leader, so any worker can accept one
+REFRESH_TRIGGER = os.environ.get("REFRESH_TRIGGER", os.path.join(ARTIFACT_DIR, ".refresh.request"))
+
+# Bearer token for manual refresh requests; manual refreshes are disabled when it is unset
+REFRESH_TOKEN = os.environ.get("REFRESH_TOKEN", "")
+
+# How often the refresh leader checks for a manual refresh request, in seconds
+TRIGGER_POLL = 5
+
+# Field ranges: minute, hour, day of month, month, day of week (0 or 7 is Sunday)
+CRON_FIELDS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+
+# Values one cron field allows: '*', numbers, ranges ('1-5') and steps ('*/15', '0-30/10'), separated by commas
+def parse_cron_field(field: str, low: int, high: int) -> Set[int]:
+    values = set()
+
+    for part in field.split(","):
+        spec, _, step = part.partition("/")
+        step = int(step) if step else 1
+
+        if spec == "*":
+            start, end = low, high
+        elif "-" in spec:
+            start, end = (int(bound) for bound in spec.split("-", 1))
+        else:
+            start = end = int(spec)
+
+        if step < 1 or start < low or end > high or start > end:
+            raise ValueError(f"Invalid cron field '{field}' (allowed {low}-{high})")
+
+        values.update(range(start, end + 1, step))
+
+    return values
+
+
+# A five-field cron schedule; as in cron, when both day fields are restricted a day matching either one qualifies
+class CronSchedule:
+    def __init__(self, expression: str) -> None:
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression '{expression}' needs 5 fields, got {len(fields)}")
+
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, weekdays = (
+            parse_cron_field(field, low, high) for field, (low, high) in zip(fields, CRON_FIELDS))
+        self.weekdays = {day % 7 for day in weekdays}
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def _day_matches(self, day: datetime.datetime) -> bool:
+        if day.month not in self.months:
+            return False
+
+        in_days = day.day in self.days
+        # datetime's weekday() counts from Monday, cron's from Sunday
+        in_weekdays = (day.weekday() + 1) % 7 in self.weekdays
+
+        if self._any_day or self._any_weekday:
+            return in_days and in_weekdays
+
+        return in_days or in_weekdays
+
+    # The first scheduled minute strictly after `moment`
+    def next_after(self, moment: datetime.datetime) -> datetime.datetime:
+        candidate = moment.replace(second=0, microsecond=0) + datetime.timedelta(minutes=1)
+        limit = candidate + datetime.timedelta(days=4 * 366)
+
+        while candidate < limit:
+            if not self._day_matches(candidate):
+                candidate = candidate.replace(hour=0, minute=0) + datetime.timedelta(days=1)
+            elif candidate.hour not in self.hours:
+                candidate = candidate.replace(minute=0) + datetime.timedelta(hours=1)
+            elif candidate.minute not in self.minutes:
+                candidate += datetime.timedelta(minutes=1)
+            else:
+                return candidate
+
+        raise ValueError(f"Cron expression '{self.expression}' never fires")
+
+
+# When the refresh leader should next refresh: on the cron schedule plus jitter, or sooner with exponential backoff
+# after failures; also carries manual refresh requests from any worker to the leader
+class RefreshScheduler:
+    def __init__(self, schedule: str = REFRESH_SCHEDULE, jitter: int = REFRESH_JITTER, backoff: int = REFRESH_BACKOFF,
+                 max_backoff: int = REFRESH_BACKOFF_MAX, trigger_path: str = REFRESH_TRIGGER,
+                 rng: Callable[[], float] = random.random) -> None:
+        self.schedule = CronSchedule(schedule)
+        self.jitter = jitter
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.trigger_path = trigger_path
+        self.rng = rng
+        self.failures = 0
+
+    def backoff_delay(self) -> float:
+        return min(self.backoff * 2 ** (self.failures - 1), self.max_backoff)
+
+    # Seconds until the next refresh attempt
+    def next_delay(self, now: datetime.datetime = None) -> float:
+        now = now or datetime.datetime.now()
+        delay = (self.schedule.next_after(now) - now).total_seconds() + self.rng() * self.jitter
+
+        if self.failures:
+            delay = min(delay, self.backoff_delay())
+
+        return delay
+
+    def record_success(self) -> None:
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+
+    # Leave a manual refresh request for the leader; a forced (or retraining) request stays so until the leader takes it
+    def request_refresh(self, force: bool = False, retrain: bool = False) -> None:
+        pending = self._read_request() or {}
+        request = {"force": force or retrain or bool(pending.get("force")),
+                   "retrain": retrain or bool(pending.get("retrain")),
+                   "requested": datetime.datetime.now().isoformat(timespec="seconds")}
+
+        if os.path.dirname(self.trigger_path):
+            os.makedirs(os.path.dirname(self.trigger_path), exist_ok=True)
+
+        tmp_path = f"{self.trigger_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(request, f)
+        os.replace(tmp_path, self.trigger_path)
+
+    def _read_request(self) -> Optional[dict]:
+        try:
+            with open(self.trigger_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    # Take the pending manual request, if any (removing it); returns its force and retrain flags
+    def take_request(self) -> Optional[dict]:
+        request = self._read_request()
+        if request is None:
+            return None
+
+        try:
+            os.remove(self.trigger_path)
+        except OSError:
+            pass
+
+        return {"force": bool(request.get("force")), "retrain": bool(request.get("retrain"))}
+
+
+# Names of the inputs whose fingerprints differ between two refreshes (every input when there is nothing to compare)
+def changed_inputs(previous: Optional[dict], current: dict) -> List[str]:
+    if not previous:
+        return sorted(current)
+
+    return sorted(name for name in set(previous) | set(current) if previous.get(name) != current.get(name))
+
+
+# Whether an Authorization header carries the refresh token (compared in constant time)
+def refresh_authorized(authorization: Optional[str], token: str = REFRESH_TOKEN) -> bool:
+    scheme, _, credentials = (authorization or "").partition(" ")
+
+    return bool(token) and scheme.lower() == "bearer" and hmac.compare_digest(credentials.strip().encode("utf-8"),
+                                                                              token.encode("utf-8"))
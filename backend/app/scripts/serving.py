@@ -0,0 +1,123 @@
+import datetime
+import threading
+import time
+from typing import Dict, Optional
+
+import pandas as pd
+
+from scripts import metrics
+from scripts.awards import AWARDS
+from scripts.model import AwardModel
+from scripts.model_store import ModelStore, ensure_models
+from scripts.preprocess import split_data
+from scripts.roster import RosterIndex
+from scripts.snapshot import PredictionSnapshot, build_snapshots, create_payloads
+from scripts.whatif import WhatIfScorer
+
+
+# Everything a request needs, built together by one refresh and published by a single reference swap
+class ServingState:
+    def __init__(self, models: Dict[str, AwardModel], current_data: Dict[str, pd.DataFrame], nhl_data: RosterIndex,
+                 last_updated: str, snapshots: Dict[str, PredictionSnapshot], version: str) -> None:
+        self.models = models
+        self.current_data = current_data
+        self.nhl_data = nhl_data
+        self.last_updated = last_updated
+        self.snapshots = snapshots
+        self.version = version
+        # fingerprints of the refresh inputs this state was built from, to skip refreshes when nothing has changed
+        self.input_fingerprints: Dict[str, str] = {}
+        self._scorers: Dict[str, WhatIfScorer] = {}
+
+    # What-if scorer for an award, built on first use from this state's model and current data (None if not served)
+    def whatif_scorer(self, award: str) -> Optional[WhatIfScorer]:
+        if award not in self.models:
+            return None
+
+        if award not in self._scorers:
+            self._scorers[award] = WhatIfScorer(self.models[award], self.current_data[award])
+
+        return self._scorers[award]
+
+
+# Score every award's current season with a model for its training data and build the state serving the predictions;
+# models are only fitted (in parallel) when their training data changed since they were last fitted, or on `retrain`
+def build_state(datasets: Dict[str, pd.DataFrame], roster: RosterIndex, past_winners: Dict[str, list],
+                previous_models: Dict[str, AwardModel] = None, retrain: bool = False,
+                store: ModelStore = None) -> ServingState:
+    splits = {award: split_data(data) for award, data in datasets.items()}
+
+    models = ensure_models({award: train for award, (train, _) in splits.items()},
+                           {award: AWARDS[award].target for award in splits}, store, previous_models, retrain)
+    current_data = {award: current for award, (_, current) in splits.items()}
+
+    now = datetime.datetime.now()
+    last_updated = now.strftime("%a, %b %d %I:%M%p PT")
+    version = now.strftime("%Y%m%d%H%M%S")
+
+    print("Building prediction response snapshots...")
+    payloads = create_payloads(models, current_data, roster, last_updated, past_winners)
+
+    return ServingState(models, current_data, roster, last_updated, build_snapshots(payloads, version), version)
+
+
+# Unix time a state was built, from its version (YYYYmmddHHMMSS, local time)
+def state_timestamp(version: str) -> float:
+    return datetime.datetime.strptime(version, "%Y%m%d%H%M%S").timestamp()
+
+
+# Expose a newly published state's version and row counts as metrics
+def publish_metrics(state: ServingState) -> None:
+    metrics.MODEL_INFO.clear()
+    metrics.MODEL_INFO.set(1, version=state.version)
+    metrics.MODEL_TIMESTAMP.set(state_timestamp(state.version))
+
+    metrics.DATASET_ROWS.clear()
+    for award, data in state.current_data.items():
+        metrics.DATASET_ROWS.set(len(data), award=award, split="current")
+        metrics.DATASET_ROWS.set(state.models[award].train_rows, award=award, split="train")
+
+
+# Progress/outcome of background refreshes, reported by the health endpoint
+class RefreshStatus:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.running = False
+        self.last_started: Optional[str] = None
+        self.last_finished: Optional[str] = None
+        self.last_success_version: Optional[str] = None
+        self.last_error: Optional[str] = None
+
+    # Mark a refresh as started; returns False if one is already in progress
+    def start(self) -> bool:
+        with self._lock:
+            if self.running:
+                return False
+            self.running = True
+            self.last_started = datetime.datetime.now().isoformat(timespec="seconds")
+            metrics.REFRESH_RUNNING.set(1)
+            return True
+
+    def finish(self, version: Optional[str] = None, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            self.running = False
+            self.last_finished = datetime.datetime.now().isoformat(timespec="seconds")
+            if error is None:
+                self.last_success_version = version
+                self.last_error = None
+            else:
+                self.last_error = f"{type(error).__name__}: {error}"
+
+            metrics.REFRESH_RUNNING.set(0)
+            metrics.REFRESH_LAST_SUCCESS.set(1 if error is None else 0)
+            metrics.REFRESH_LAST_FINISHED.set(time.time(), outcome="success" if error is None else "failure")
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "running": self.running,
+                "last_started": self.last_started,
+                "last_finished": self.last_finished,
+                "last_success_version": self.last_success_version,
+                "last_error": self.last_error
+            }
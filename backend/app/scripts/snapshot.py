@@ -0,0 +1,217 @@
+import gzip
+import hashlib
+import io
+import json
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from scripts.model import AwardModel
+from scripts.roster import RosterIndex
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the standard library encoder produces the same JSON, more slowly
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Top-level payload sections, plus "urls" for the player/team links inside each result
+PAYLOAD_FIELDS = ["results", "updated", "importances", "past_winners"]
+URL_FIELDS = ["headshot_url", "team_logo_url", "nhl_page"]
+VIEW_FIELDS = PAYLOAD_FIELDS + ["urls"]
+
+# Content codings in preference order, and the smallest body worth compressing
+CONTENT_CODINGS = (["br"] if brotli is not None else []) + ["gzip"]
+MIN_COMPRESS_SIZE = 1024
+
+# Distinct limit/offset/fields views kept per snapshot
+MAX_VIEWS = 64
+
+
+def encode_json(payload: dict) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+# Pick the preferred coding the client accepts (Accept-Encoding, with q-values), or None to send the body as is
+def negotiate_encoding(accept_encoding: Optional[str], size: int) -> Optional[str]:
+    if not accept_encoding or size < MIN_COMPRESS_SIZE:
+        return None
+
+    accepted = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+
+    for coding in CONTENT_CODINGS:
+        if accepted.get(coding, accepted.get("*", 0.0)) > 0:
+            return coding
+
+    return None
+
+
+# Weak comparison of an If-None-Match header value against an ETag, per RFC 7232
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+
+    return False
+
+
+# gzip with a zeroed header timestamp, so a payload always compresses to the same bytes (gzip.compress only takes
+# mtime from Python 3.8, newer than the python3.7 image)
+def gzip_bytes(data: bytes) -> bytes:
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode="wb", compresslevel=9, mtime=0) as f:
+        f.write(data)
+
+    return buf.getvalue()
+
+
+# One encoded view of a payload; each compressed variant is produced on first request and reused after that
+class EncodedView:
+    def __init__(self, body: bytes) -> None:
+        self.body = body
+        self.digest = hashlib.sha256(body).hexdigest()[:32]
+        self._variants = {None: body}
+
+    # strong ETag per representation, so a compressed variant is never revalidated against the identity bytes
+    def etag(self, coding: Optional[str] = None) -> str:
+        return f'"{self.digest}-{coding}"' if coding else f'"{self.digest}"'
+
+    def content(self, coding: Optional[str] = None) -> bytes:
+        if coding not in self._variants:
+            if coding == "gzip":
+                self._variants[coding] = gzip_bytes(self.body)
+            elif coding == "br":
+                self._variants[coding] = brotli.compress(self.body)
+            else:
+                raise ValueError(f"Unsupported content coding '{coding}'")
+
+        return self._variants[coding]
+
+
+# Immutable, pre-encoded /predict response built once per data/model refresh
+class PredictionSnapshot:
+    def __init__(self, payload: dict, version: str, max_age: int = 300) -> None:
+        self.payload = payload
+        self.version = version
+        self.max_age = max_age
+
+        # results are built in rank order, so a page of them is a slice of this list
+        self.ranked: List[dict] = list(payload["results"].values())
+
+        # encode once so serving a full request never touches the JSON encoder
+        self.full = EncodedView(encode_json(payload))
+        self.body = self.full.body
+
+        # strong ETag derived from the exact bytes being served
+        self.etag = self.full.etag()
+        self.headers = self.response_headers(self.full)
+
+        self._views: Dict[tuple, EncodedView] = {}
+
+    def response_headers(self, view: EncodedView, coding: Optional[str] = None) -> Dict[str, str]:
+        headers = {
+            "ETag": view.etag(coding),
+            "Cache-Control": f"public, max-age={self.max_age}, must-revalidate",
+            "X-Snapshot-Version": self.version,
+            "Vary": "Accept-Encoding"
+        }
+        if coding:
+            headers["Content-Encoding"] = coding
+
+        return headers
+
+    # Check an If-None-Match header value against this snapshot's ETag (or the ETag of the view being served)
+    def matches(self, if_none_match: Optional[str], etag: Optional[str] = None) -> bool:
+        return etag_matches(if_none_match, etag or self.etag)
+
+    # Encoded view with results [offset, offset + limit) and only the given comma-separated fields, built once per
+    # distinct request and cached for the life of the snapshot
+    def view(self, offset: int = 0, limit: Optional[int] = None, fields: Optional[str] = None) -> EncodedView:
+        selected = VIEW_FIELDS if fields is None else [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = [field for field in selected if field not in VIEW_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields {unknown} (available: {VIEW_FIELDS})")
+
+        key = (offset, limit, frozenset(selected))
+        if key == (0, None, frozenset(VIEW_FIELDS)):
+            return self.full
+
+        if key not in self._views:
+            if len(self._views) >= MAX_VIEWS:
+                self._views.pop(next(iter(self._views)))
+            self._views[key] = EncodedView(encode_json(self._view_payload(offset, limit, selected)))
+
+        return self._views[key]
+
+    def _view_payload(self, offset: int, limit: Optional[int], selected: List[str]) -> dict:
+        payload = {field: self.payload[field] for field in PAYLOAD_FIELDS if field in selected and field != "results"}
+
+        if "results" in selected:
+            page = self.ranked[offset:None if limit is None else offset + limit]
+            if "urls" not in selected:
+                page = [{k: v for k, v in result.items() if k not in URL_FIELDS} for result in page]
+            payload["results"] = {str(offset + i + 1): result for i, result in enumerate(page)}
+
+        return payload
+
+
+# Assemble the full /predict payload for an award from already-computed pieces
+def build_payload(results: dict, updated: str, importances: dict, past_winners: list) -> dict:
+    ranked = {str(rank): result for rank, result in results.items()}
+
+    return {"results": ranked, "updated": updated, "importances": dict(importances), "past_winners": past_winners}
+
+
+# Takes prediction results dict, adds player headshot URL, player NHL.com page URL, team logo URL
+def compile_output(results: dict, roster: RosterIndex) -> dict:
+    # roster records carry precomputed URLs/full team name, so enrichment is one dict lookup per result
+    for rank in results:
+        player = roster.lookup(results[rank]["name"], results[rank]["team"])
+
+        if player is not None:
+            results[rank].update(player["enrichment"])
+
+    return results
+
+
+# Score each award's current-season data once with its own model and assemble that award's /predict payload
+def create_payloads(models: Dict[str, AwardModel], current_data: Dict[str, pd.DataFrame], roster: RosterIndex,
+                    last_updated: str, past_winners: Dict[str, list]) -> Dict[str, dict]:
+    payloads = {}
+
+    for award, model in models.items():
+        top_results = model.predict(current_data[award])
+        results = compile_output({i + 1: top_results[i] for i in range(len(top_results))}, roster)
+        payloads[award] = build_payload(results, last_updated, model.feature_importances, past_winners.get(award, []))
+
+    return payloads
+
+
+# Build the set of per-award snapshots that get published together after a refresh
+def build_snapshots(payloads: Dict[str, dict], version: str) -> Dict[str, PredictionSnapshot]:
+    return {award: PredictionSnapshot(payload, f"{award}-{version}") for award, payload in payloads.items()}
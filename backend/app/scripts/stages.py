@@ -0,0 +1,239 @@
+import hashlib
+import os
+import resource
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from scripts import metrics
+
+# Print a per-stage timing/memory report after every graph run
+PROFILE = os.environ.get("PIPELINE_PROFILE", "") not in ("", "0")
+
+# Memoized stage outputs kept per graph
+MEMO_SIZE = 32
+
+
+# Content fingerprint of a stage input; raises TypeError for values that can't be fingerprinted (their stage is then
+# simply run rather than memoized)
+def fingerprint(value) -> str:
+    digest = hashlib.sha256()
+    _update(digest, value)
+
+    return digest.hexdigest()
+
+
+def _update(digest, value) -> None:
+    if isinstance(value, pd.DataFrame):
+        digest.update(b"frame")
+        digest.update(repr(list(zip(value.columns, map(str, value.dtypes)))).encode("utf-8"))
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, pd.Series):
+        digest.update(f"series:{value.name}:{value.dtype}".encode("utf-8"))
+        digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, np.ndarray):
+        digest.update(f"array:{value.dtype}:{value.shape}".encode("utf-8"))
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        digest.update(b"dict")
+        for key in sorted(value, key=repr):
+            digest.update(repr(key).encode("utf-8"))
+            _update(digest, value[key])
+    elif isinstance(value, (list, tuple)):
+        digest.update(f"seq:{len(value)}".encode("utf-8"))
+        for item in value:
+            _update(digest, item)
+    elif value is None or isinstance(value, (str, bytes, int, float, bool)):
+        digest.update(repr(value).encode("utf-8"))
+    else:
+        raise TypeError(f"Cannot fingerprint {type(value).__name__}")
+
+
+# Fingerprint of a file path by its size and modification time, for stages that read files
+def file_fingerprint(path: str) -> str:
+    stat = os.stat(path)
+
+    return f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+# Memoized outputs are handed out as copies, since later stages modify their input frames in place
+def _copy(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy()
+    if isinstance(value, dict):
+        return {key: _copy(item) for key, item in value.items()}
+
+    return value
+
+
+def _size_mb(value) -> float:
+    if isinstance(value, pd.DataFrame):
+        return value.memory_usage(deep=True).sum() / 2 ** 20
+    if isinstance(value, dict):
+        return sum(_size_mb(item) for item in value.values())
+
+    return 0.0
+
+
+# Bounded store of memoized stage outputs, shareable between graphs built for the same stages
+class StageMemo:
+    def __init__(self, size: int = MEMO_SIZE) -> None:
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return (_copy(self._entries[key]),)
+
+    def put(self, key: tuple, value) -> None:
+        with self._lock:
+            self._entries[key] = _copy(value)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+
+# One step of a stage graph: a function of the named inputs (graph inputs or other stages' outputs)
+class Stage:
+    def __init__(self, name: str, func: Callable, inputs: List[str], memoize: bool = False,
+                 key: Optional[Callable[..., str]] = None) -> None:
+        self.name = name
+        self.func = func
+        self.inputs = inputs
+        self.memoize = memoize
+
+        # memo key from the stage's inputs; defaults to their content fingerprint
+        self.key = key or (lambda *values: fingerprint(list(values)))
+
+
+# Runs stages in dependency order; stages whose inputs are ready run concurrently on a thread pool (pandas' CSV
+# reader and most column operations release the GIL), and memoized stages are skipped when their inputs are unchanged
+class StageGraph:
+    def __init__(self, name: str, stages: List[Stage], max_workers: int = 4, memo: StageMemo = None) -> None:
+        self.name = name
+        self.stages = {stage.name: stage for stage in stages}
+        self.max_workers = max_workers
+        self.memo = memo or StageMemo()
+
+        self._check_acyclic()
+
+    def _check_acyclic(self) -> None:
+        visiting, done = set(), set()
+
+        def visit(name):
+            if name in done or name not in self.stages:
+                return
+            if name in visiting:
+                raise ValueError(f"Stage graph {self.name} has a cycle through '{name}'")
+            visiting.add(name)
+            for dependency in self.stages[name].inputs:
+                visit(dependency)
+            visiting.discard(name)
+            done.add(name)
+
+        for stage_name in self.stages:
+            visit(stage_name)
+
+    # Stages needed to produce the requested outputs
+    def _required(self, outputs: List[str]) -> List[str]:
+        required, pending = set(), list(outputs)
+
+        while pending:
+            name = pending.pop()
+            if name in self.stages and name not in required:
+                required.add(name)
+                pending.extend(self.stages[name].inputs)
+
+        return [name for name in self.stages if name in required]
+
+    def _run_stage(self, stage: Stage, values: list, profile: bool, memoize: bool) -> tuple:
+        start = time.perf_counter()
+        memo_key, cached = None, False
+
+        if stage.memoize and memoize:
+            try:
+                memo_key = (stage.name, stage.key(*values))
+            except TypeError:
+                memo_key = None
+
+        hit = self.memo.get(memo_key) if memo_key is not None else None
+
+        if hit is not None:
+            result, cached = hit[0], True
+        else:
+            with metrics.STAGE_DURATION.time(stage=stage.name):
+                result = stage.func(*values)
+
+            if memo_key is not None:
+                self.memo.put(memo_key, result)
+
+        if not profile:
+            return result, None
+
+        # ru_maxrss is the process peak (in KB on Linux), so with concurrent stages it's shared by the overlapping ones
+        return result, {"stage": stage.name, "seconds": time.perf_counter() - start, "cached": cached,
+                        "output_mb": _size_mb(result),
+                        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+
+    # Run the stages needed for `outputs` (every stage by default) from the given graph inputs; returns the outputs.
+    # Values are released once every stage reading them has started; memoize=False skips the memo entirely.
+    def run(self, inputs: Dict[str, object], outputs: List[str] = None, profile: bool = None,
+            memoize: bool = True) -> Dict[str, object]:
+        outputs = outputs or list(self.stages)
+        todo = self._required(outputs)
+        missing = {name for stage in todo for name in self.stages[stage].inputs
+                   if name not in self.stages and name not in inputs}
+        if missing:
+            raise ValueError(f"Stage graph {self.name} is missing inputs {sorted(missing)}")
+
+        profile = PROFILE if profile is None else profile
+        values = dict(inputs)
+        report = []
+        running = {}
+        readers = Counter(dep for name in todo for dep in self.stages[name].inputs)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name) as pool:
+            while todo or running:
+                for name in [name for name in todo if all(dep in values for dep in self.stages[name].inputs)]:
+                    stage = self.stages[name]
+                    running[pool.submit(self._run_stage, stage, [values[dep] for dep in stage.inputs], profile,
+                                        memoize)] = name
+                    todo.remove(name)
+
+                    # drop intermediates nothing else reads, so they can be freed as soon as their readers finish
+                    for dep in stage.inputs:
+                        readers[dep] -= 1
+                        if readers[dep] == 0 and dep not in outputs:
+                            values.pop(dep, None)
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    values[name], stats = future.result()
+                    if stats is not None:
+                        report.append(stats)
+
+        if profile:
+            print_report(self.name, report)
+
+        return {name: values[name] for name in outputs}
+
+
+def print_report(graph: str, report: List[dict]) -> None:
+    print(f"Stage profile for {graph}:")
+    print(f"  {'stage':<36}{'seconds':>10}{'output MB':>12}{'peak RSS MB':>14}")
+
+    for stats in report:
+        cached = " (memoized)" if stats["cached"] else ""
+        print(f"  {stats['stage']:<36}{stats['seconds']:>10.4f}{stats['output_mb']:>12.1f}"
+              f"{stats['peak_rss_mb']:>14.1f}{cached}")
+
+    print(f"  {'total (sum of stages)':<36}{sum(stats['seconds'] for stats in report):>10.4f}")
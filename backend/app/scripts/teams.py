@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+
+# Single source of truth for team identity across standings (full names) and skater stats (abbreviations)
+
+# Team names truncated by the standings scrape
+NAME_FIXES = {
+    "ampa Bay Lightning": "Tampa Bay Lightning",
+    "ew Jersey Devils": "New Jersey Devils",
+    "hicago Black Hawks": "Chicago Black Hawks",
+    "hiladelphia Flyers": "Philadelphia Flyers",
+    "innesota North Stars": "Minnesota North Stars",
+    "ontreal Canadiens": "Montreal Canadiens",
+    "orida Panthers": "Florida Panthers"
+}
+
+# Names shared by different franchises: (name, first season of later franchise, earlier franchise name, later franchise name)
+FRANCHISE_ERAS = [
+    ("Winnipeg Jets", 20112012, "Winnipeg Jets (Original)", "Winnipeg Jets (New)")
+]
+
+# Full team name -> abbreviation used by hockey-reference skater stats
+TEAM_ABBREVS = {
+    "Anaheim Ducks": "ANA",
+    "Arizona Coyotes": "ARI",
+    "Atlanta Flames": "ATF",
+    "Atlanta Thrashers": "ATL",
+    "Boston Bruins": "BOS",
+    "Buffalo Sabres": "BUF",
+    "Carolina Hurricanes": "CAR",
+    "Chicago Black Hawks": "CBH",
+    "Columbus Blue Jackets": "CBJ",
+    "Calgary Flames": "CGY",
+    "Chicago Blackhawks": "CHI",
+    "Colorado Rockies": "CLR",
+    "Colorado Avalanche": "COL",
+    "Dallas Stars": "DAL",
+    "Detroit Red Wings": "DET",
+    "Edmonton Oilers": "EDM",
+    "Florida Panthers": "FLA",
+    "Hartford Whalers": "HAR",
+    "Los Angeles Kings": "LAK",
+    "Mighty Ducks of Anaheim": "MDA",
+    "Minnesota Wild": "MIN",
+    "Minnesota North Stars": "MNS",
+    "Montreal Canadiens": "MTL",
+    "New Jersey Devils": "NJD",
+    "Nashville Predators": "NSH",
+    "New York Islanders": "NYI",
+    "New York Rangers": "NYR",
+    "Ottawa Senators": "OTT",
+    "Philadelphia Flyers": "PHI",
+    "Phoenix Coyotes": "PHX",
+    "Pittsburgh Penguins": "PIT",
+    "Quebec Nordiques": "QUE",
+    "Seattle Kraken": "SEA",
+    "San Jose Sharks": "SJS",
+    "St. Louis Blues": "STL",
+    "Tampa Bay Lightning": "TBL",
+    "Toronto Maple Leafs": "TOR",
+    "Vancouver Canucks": "VAN",
+    "Vegas Golden Knights": "VEG",
+    "Winnipeg Jets (Original)": "WIN",
+    "Winnipeg Jets (New)": "WPG",
+    "Washington Capitals": "WSH"
+}
+
+# Abbreviations folded into the franchise's current one for modeling/output
+RELOCATIONS = {
+    "PHX": "ARI",  # Phoenix Coyotes became Arizona Coyotes
+    "MDA": "ANA",  # Mighty Ducks of Anaheim became Anaheim Ducks
+    "CBH": "CHI",  # Chicago Black Hawks became Chicago Blackhawks
+    "VEG": "VGK"   # Adjust Vegas abbrev to use more commonly used one
+}
+
+TEAM_CODES = sorted(set(TEAM_ABBREVS.values()))
+
+
+# Map values through a lookup table, leaving values not in the table unchanged
+def _map_known(values: pd.Series, table: dict) -> pd.Series:
+    return values.map(table).fillna(values)
+
+
+# Fix truncated names and split franchises that shared a name, based on season
+def normalize_team_names(names: pd.Series, seasons: pd.Series) -> pd.Series:
+    names = _map_known(names, NAME_FIXES)
+
+    for name, first_season, earlier_name, later_name in FRANCHISE_ERAS:
+        is_team = (names == name).to_numpy()
+        if is_team.any():
+            era_names = np.where(seasons.to_numpy() >= first_season, later_name, earlier_name)
+            names = names.mask(is_team, era_names)
+
+    return names
+
+
+# Convert full team names to categorical abbreviation codes
+def team_names_to_abbrevs(names: pd.Series) -> pd.Series:
+    abbrevs = _map_known(names, TEAM_ABBREVS)
+    unknown = sorted(set(abbrevs.dropna()) - set(TEAM_CODES))
+
+    if unknown:
+        print(f"No abbreviation for team(s) {unknown}, keeping full name")
+
+    return abbrevs.astype(pd.CategoricalDtype(TEAM_CODES + unknown))
+
+
+# Fold historical abbreviations into each franchise's current abbreviation
+def relocate_abbrevs(abbrevs: pd.Series) -> pd.Series:
+    return _map_known(abbrevs, RELOCATIONS)
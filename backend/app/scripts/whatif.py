@@ -0,0 +1,169 @@
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from scripts.model import MIN_SCORE, AwardModel
+from scripts.preprocess import AVERAGED_STATS
+
+# Raw stats that accumulate over a season, scaled together when projecting a line to a games-played pace
+PACE_STATS = ["games_played", "goals", "assists", "points", "plus_minus", "penalty_minutes", "point_share",
+              "even_strength_goals", "power_play_goals", "shorthanded_goals", "game_winning_goals",
+              "even_strength_assists", "power_play_assists", "shorthanded_assists", "shots", "total_toi",
+              "blocked_shots", "hits"]
+
+MAX_LINES = 10000
+
+
+# Scores hypothetical stat lines against the current season with the season's fitted model, scaling and team
+# encoding, so a variation is answered with one predict call instead of a re-run of merge_process and a refit
+class WhatIfScorer:
+    def __init__(self, model: AwardModel, current_data: pd.DataFrame) -> None:
+        scaler = current_data.attrs["season_scaler"]
+
+        self.model = model
+        self.team_encoding = current_data.attrs["team_encoding"]
+        self.season = int(current_data["season"].iloc[0])
+        self.feature_columns = list(model._features(current_data.head(0)).columns)
+
+        # raw stats are the scaled columns the model uses; per-game/per-60 and average TOI are derived from the others
+        # (when the model uses the stats they come from, otherwise they are set like raw stats)
+        self.scaled_columns = [column for column in scaler.columns if column in self.feature_columns]
+        self.derived = {column: stats for column, stats in self._derived_columns().items()
+                        if column in self.scaled_columns and set(stats) <= set(self.scaled_columns)}
+        self.input_columns = [column for column in self.scaled_columns if column not in self.derived]
+        self.scale, self.offset = scaler.season_params(self.season, self.scaled_columns)
+
+        # current-season lines in raw units, the base that hypothetical lines modify
+        raw = (current_data[self.scaled_columns].to_numpy(dtype=np.float64) - self.offset) / self.scale
+        self.base = pd.DataFrame(raw, columns=self.scaled_columns)[self.input_columns]
+        self.names = current_data["name"].to_numpy()
+        self.teams = current_data["team"].to_numpy()
+
+        # first current row of each player, and of each player/team pair
+        self.rows = {}
+        for position, (name, team) in enumerate(zip(self.names, self.teams)):
+            self.rows.setdefault(name, position)
+            self.rows.setdefault((name, team), position)
+
+        self.field_scores = model.predict_scores(current_data)
+        self.sorted_scores = np.sort(self.field_scores)
+
+        # the field's scores as AwardModel.predict counts them towards the vote shares it normalizes to
+        self.field_counted = np.where(self.field_scores < MIN_SCORE, 0, self.field_scores)
+        self.field_total = float(self.field_counted.sum())
+
+    # Derived feature -> the (numerator, denominator) it is computed from, mirroring adjust_remaining_cols and
+    # generate_features
+    @staticmethod
+    def _derived_columns() -> Dict[str, tuple]:
+        derived = {"avg_toi": ("total_toi", "games_played")}
+
+        for stat in AVERAGED_STATS:
+            derived[f"{stat}_per_game"] = (stat, "games_played")
+            derived[f"{stat}_per_60"] = (stat, "total_toi")
+
+        return derived
+
+    # Score lines of the form {"name", "team", "pace", "stats"}: a line naming a current player starts from that
+    # player's line (optionally projected to "pace" games), then "stats" overrides raw stats; a line for anyone else
+    # must give every raw stat.  Returns one result per line, in order.
+    def score(self, lines: List[dict]) -> List[dict]:
+        if len(lines) > MAX_LINES:
+            raise ValueError(f"At most {MAX_LINES} lines can be scored per request")
+
+        positions = np.array([self._base_row(line) for line in lines], dtype=np.int64)
+        known = positions >= 0
+
+        # start from each line's base player (NaN for new players), every column at once
+        values = self.base.to_numpy()[np.maximum(positions, 0)]
+        values[~known] = np.nan
+        raw = pd.DataFrame(values, columns=self.input_columns)
+
+        pace = np.array([line.get("pace") or np.nan for line in lines], dtype=np.float64)
+        if np.any(~np.isnan(pace)):
+            if "games_played" not in raw.columns:
+                raise ValueError("The model doesn't use games played, so lines can't be projected to a pace")
+            factor = np.where(np.isnan(pace), 1.0, pace / raw["games_played"].to_numpy())
+            pace_columns = [column for column in PACE_STATS if column in raw.columns]
+            raw[pace_columns] = raw[pace_columns].to_numpy() * factor[:, None]
+
+        overrides = pd.DataFrame([line.get("stats") or {} for line in lines], index=raw.index)
+        unknown = [column for column in overrides.columns if column not in self.input_columns]
+        if unknown:
+            raise ValueError(f"Unknown or derived stats {unknown} (settable: {self.input_columns})")
+        overrides = overrides.astype(np.float64)
+        raw = overrides.combine_first(raw)[self.input_columns]
+        self._recompute_shooting_pct(raw, overrides)
+
+        incomplete = raw.isna().any(axis=1).to_numpy()
+        if incomplete.any():
+            line = int(np.argmax(incomplete))
+            raise ValueError(f"Line {line} is missing stats {list(raw.columns[raw.iloc[line].isna()])}")
+
+        for column, (numerator, denominator) in self.derived.items():
+            scale = 60 if denominator == "total_toi" else 1
+            raw[column] = raw[numerator] / (raw[denominator] / scale)
+
+        teams = np.array([line.get("team") or (self.teams[p] if p >= 0 else None)
+                          for line, p in zip(lines, positions)], dtype=object)
+        missing_teams = sorted({str(team) for team in teams if team not in self.team_encoding})
+        if missing_teams:
+            raise ValueError(f"Unknown teams {missing_teams}")
+
+        features = pd.DataFrame(raw[self.scaled_columns].to_numpy() * self.scale + self.offset,
+                                columns=self.scaled_columns)
+        features["team_encoded"] = [self.team_encoding[team] for team in teams]
+
+        scores = self.model.estimator.predict(features[self.feature_columns])
+
+        return self._results(lines, positions, teams, scores)
+
+    # Shooting percentage is a raw stat in the data but follows from goals and shots: lines that set either (and not
+    # shooting_pct itself) get it recomputed, in % and 0 without shots as in fix_missing_values
+    @staticmethod
+    def _recompute_shooting_pct(raw: pd.DataFrame, overrides: pd.DataFrame) -> None:
+        if not {"shooting_pct", "goals", "shots"} <= set(raw.columns):
+            return
+
+        def overridden(column):
+            return overrides[column].notna() if column in overrides.columns else pd.Series(False, index=raw.index)
+
+        stale = (overridden("goals") | overridden("shots")) & ~overridden("shooting_pct")
+        shots = raw.loc[stale, "shots"]
+        raw.loc[stale, "shooting_pct"] = (raw.loc[stale, "goals"] / shots * 100).where(shots > 0, 0)
+
+    def _base_row(self, line: dict) -> int:
+        name = line.get("name")
+        team = line.get("team")
+
+        if team is not None and (name, team) in self.rows:
+            return self.rows[(name, team)]
+
+        return self.rows.get(name, -1)
+
+    # Predicted vote share (in %, normalized like /predict against the current field with the line in place of the
+    # player's own current line) and where it would rank in that field
+    def _results(self, lines: List[dict], positions: np.ndarray, teams: np.ndarray,
+                 scores: np.ndarray) -> List[dict]:
+        ahead = len(self.sorted_scores) - np.searchsorted(self.sorted_scores, scores, side="right")
+        known = positions >= 0
+        current = np.where(known, self.field_scores[np.where(known, positions, 0)], np.nan)
+        ahead = ahead - (known & (current > scores))
+
+        counted = np.where(scores < MIN_SCORE, 0, scores)
+        current_counted = np.where(known, self.field_counted[np.where(known, positions, 0)], 0)
+        totals = self.field_total - current_counted + counted
+        shares = np.divide(counted, totals, out=np.zeros_like(counted), where=totals > 0) * 100
+
+        results = []
+        for i, line in enumerate(lines):
+            result = {"name": line.get("name"), "team": teams[i],
+                      "predicted_point_pct": round(float(shares[i]), 2), "rank": int(ahead[i]) + 1}
+            if known[i]:
+                share = current_counted[i] / self.field_total * 100 if self.field_total > 0 else 0.0
+                result["current_point_pct"] = round(float(share), 2)
+            results.append(result)
+
+        return results
+
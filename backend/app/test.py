@@ -1,6 +1,81 @@
-from scripts import preprocess
+from scripts import awards, backfill, backtest, catalog, evaluation, metrics, stages, feature_store, gather_data, html_tables, preprocess, teams
+from scripts.artifacts import list_artifacts, load_latest_artifact, save_artifact
+from scripts.model import ESTIMATOR_BACKENDS, AwardModel, fit_award_models
+from scripts.model_store import ModelStore, ensure_models, training_version
+from scripts.fetch import FetchEngine
+from scripts.history import PredictionHistory, record_state
+from scripts.http_cache import HTTPCache
+from scripts.leader import RefreshLeader
+from scripts.scheduler import CronSchedule, RefreshScheduler, changed_inputs, refresh_authorized
+from scripts.roster import RosterIndex, make_player_record, normalize_name
+from scripts.serving import RefreshStatus, ServingState
+from scripts.whatif import WhatIfScorer
+from scripts.snapshot import PredictionSnapshot, build_payload, build_snapshots, create_payloads, negotiate_encoding
+from fastapi.testclient import TestClient
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import asyncio
+import datetime
+import gzip
+import json
+import main
+import numpy as np
+import os
 import pandas as pd
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 import unittest
+import unittest.mock
+
+
+# Local HTTP server standing in for hockey-reference/NHL API, counting hits and optionally failing
+class StubServer:
+    def __init__(self, delay: float = 0.0):
+        stub = self
+        self.hits = 0
+        self.failing = False
+        self.fail_first = 0
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with stub.lock:
+                    stub.hits += 1
+                    stub.in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub.in_flight)
+                    failing = stub.failing or stub.hits <= stub.fail_first
+                time.sleep(stub.delay)
+                with stub.lock:
+                    stub.in_flight -= 1
+                if failing:
+                    self.send_response(503)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body = f"<html>{self.path} #{stub.hits}</html>".encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
 
 
 class PreprocessTest(unittest.TestCase):
@@ -15,6 +90,1181 @@ class PreprocessTest(unittest.TestCase):
         for df in self.dfs:
             self.assertEqual(type(self.dfs[df]), pd.DataFrame)
 
+    def test_read_to_dfs_applies_schema(self):
+        skater_stats = self.dfs["skater_stats"]
+
+        self.assertTrue({"D", "C", "LW", "RW"} <= set(skater_stats["Pos"]))
+        self.assertNotIn("FO%", skater_stats.columns)
+        self.assertEqual(skater_stats["Player"].dtype.name, "category")
+        self.assertEqual(skater_stats["GP"].dtype, np.int16)
+
+    def test_get_seasons_from_manifest(self):
+        seasons = preprocess.get_seasons(self.past_data_src)
+
+        self.assertEqual(seasons[0], "19791980")
+        self.assertEqual(seasons[-1], "20192020")
+        self.assertEqual(catalog.load_manifest(self.past_data_src)["skater_stats.csv"]["seasons"], seasons)
+
+
+class TeamsTest(unittest.TestCase):
+    def test_standings_names_to_codes(self):
+        standings = pd.DataFrame({
+            "Team": ["Winnipeg Jets", "Winnipeg Jets", "ampa Bay Lightning", "Seattle Kraken", "Hamilton Tigers"],
+            "season": [19951996, 20112012, 20032004, 20212022, 19241925]
+        })
+
+        codes = preprocess.replace_names_abbrevs(preprocess.fix_team_names(standings))["Team"]
+
+        self.assertEqual(codes.dtype.name, "category")
+        self.assertEqual(list(codes), ["WIN", "WPG", "TBL", "SEA", "Hamilton Tigers"])
+
+    def test_relocations(self):
+        self.assertEqual(list(teams.relocate_abbrevs(pd.Series(["PHX", "MDA", "BOS"]))), ["ARI", "ANA", "BOS"])
+
+
+# Original per-player loop implementation of convert_multiples, kept as a reference for regression testing
+def convert_multiples_reference(skater_data: pd.DataFrame) -> pd.DataFrame:
+    skater_data = skater_data.copy()
+    traded_players = skater_data[skater_data["Tm"] == "TOT"]
+    traded_players_list = [(row[0], row[1]) for row in traded_players[["Player", "season"]].values]
+
+    team_most_games = []
+
+    for player, season in traded_players_list:
+        player_data = skater_data.loc[
+            (skater_data["Player"] == player) & (skater_data["season"] == season) & (
+                    skater_data["Tm"] != "TOT")].copy()
+        player_data = player_data.sort_values(by=["GP", "PLUSMINUS", "PTS"], ascending=False)
+        team_most_games.append(player_data.iloc[0]["Tm"])
+
+    skater_data.loc[skater_data["Tm"] == "TOT", "Tm"] = team_most_games
+
+    return skater_data.drop_duplicates(subset=["season", "Rk"], keep="last")
+
+
+class ConvertMultiplesTest(unittest.TestCase):
+    def setUp(self):
+        skater_stats = pd.read_csv("../data/skater_stats.csv")
+        self.skater_stats = skater_stats.sort_values(by=["season", "Player", "GP"]).reset_index(drop=True)
+
+    def test_matches_reference_for_defensemen(self):
+        defensemen = self.skater_stats[self.skater_stats["Pos"] == "D"].reset_index(drop=True)
+
+        pd.testing.assert_frame_equal(preprocess.convert_multiples(defensemen), convert_multiples_reference(defensemen))
+
+    def test_matches_reference_for_all_positions(self):
+        recent = self.skater_stats[self.skater_stats["season"] >= 20162017].reset_index(drop=True)
+
+        pd.testing.assert_frame_equal(preprocess.convert_multiples(recent), convert_multiples_reference(recent))
+
+
+class StageGraphTest(unittest.TestCase):
+    def test_independent_stages_run_concurrently(self):
+        # each branch waits for the other, so this only finishes if they run at the same time
+        barrier = threading.Barrier(2, timeout=5)
+
+        def branch(value):
+            barrier.wait()
+            return value * 2
+
+        graph = stages.StageGraph("test", [
+            stages.Stage("left", branch, ["a"]),
+            stages.Stage("right", branch, ["b"]),
+            stages.Stage("total", lambda left, right: left + right, ["left", "right"])
+        ])
+
+        self.assertEqual(graph.run({"a": 1, "b": 2}, outputs=["total"]), {"total": 6})
+
+    def test_memoized_by_input_fingerprint(self):
+        calls = []
+
+        def double(df):
+            calls.append(len(df))
+            df["x"] = df["x"] * 2
+            return df
+
+        graph = stages.StageGraph("test", [stages.Stage("double", double, ["df"], memoize=True)])
+        df = pd.DataFrame({"x": [1, 2, 3]})
+
+        first = graph.run({"df": df.copy()})["double"]
+        first["x"] = 0  # callers modifying an output don't affect the memoized copy
+        second = graph.run({"df": df.copy()})["double"]
+        self.assertEqual(list(second["x"]), [2, 4, 6])
+        self.assertEqual(len(calls), 1)
+
+        graph.run({"df": pd.DataFrame({"x": [1, 2, 4]})})
+        self.assertEqual(len(calls), 2)
+
+    def test_invalid_graphs(self):
+        with self.assertRaises(ValueError):
+            stages.StageGraph("test", [stages.Stage("a", abs, ["b"]), stages.Stage("b", abs, ["a"])])
+
+        graph = stages.StageGraph("test", [stages.Stage("a", abs, ["missing"])])
+        with self.assertRaises(ValueError):
+            graph.run({})
+
+
+class SeasonScalerTest(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame({
+            "season": [20202021, 20192020, 20202021, 20192020, 20202021],
+            "points": [10.0, 4.0, 30.0, 8.0, 20.0],
+            "hits": [np.nan, 5.0, np.nan, 5.0, np.nan]
+        })
+
+    def test_matches_minmax_scale_per_season(self):
+        from sklearn.preprocessing import minmax_scale
+        scaled = preprocess.SeasonScaler(["points", "hits"]).fit(self.df).transform(self.df)
+
+        for season in self.df["season"].unique():
+            mask = (self.df["season"] == season).to_numpy()
+            expected = minmax_scale(self.df.loc[mask, ["points", "hits"]])
+            np.testing.assert_array_equal(scaled[mask], expected)
+
+    def test_reapply_to_new_rows(self):
+        scaler = preprocess.SeasonScaler(["points", "hits"]).fit(self.df)
+        new_rows = pd.DataFrame({"season": [20202021], "points": [25.0], "hits": [1.0]})
+
+        self.assertAlmostEqual(scaler.transform(new_rows)[0, 0], 0.75)
+
+        with self.assertRaises(ValueError):
+            scaler.transform(pd.DataFrame({"season": [20212022], "points": [1.0], "hits": [1.0]}))
+
+
+class FeatureStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.default_dir = feature_store.FEATURE_STORE_DIR
+        feature_store.FEATURE_STORE_DIR = self.tmp.name
+
+    def tearDown(self):
+        feature_store.FEATURE_STORE_DIR = self.default_dir
+        self.tmp.cleanup()
+
+    def test_incremental_matches_full_recompute(self):
+        full = preprocess.merge_process("../data", incremental=False)
+
+        pd.testing.assert_frame_equal(preprocess.merge_process("../data"), full)
+        self.assertEqual(len(os.listdir(self.tmp.name)), 1)
+
+        # second run reads history from the store
+        pd.testing.assert_frame_equal(preprocess.merge_process("../data"), full)
+
+    def test_lean_and_default_frames_stored_apart(self):
+        preprocess.get_historical_data("../data")
+        with unittest.mock.patch.object(preprocess, "LEAN", True), \
+                unittest.mock.patch.object(preprocess, "process_seasons", wraps=preprocess.process_seasons) as process:
+            preprocess.get_historical_data("../data")
+
+        # the lean run rebuilt its own frame rather than reading the default one
+        process.assert_called_once()
+        self.assertNotEqual(feature_store.source_fingerprint("../data", lean=True),
+                            feature_store.source_fingerprint("../data"))
+
+
+# Peak memory allowed for a cold merge_process on the bundled data in lean mode: traced Python allocations, and growth
+# of the process' peak RSS over its size after imports (default mode peaks around 28 MB traced, lean around 17 MB)
+LEAN_TRACED_BUDGET_MB = 24
+LEAN_RSS_BUDGET_MB = 96
+
+MEMORY_PROBE = """
+import json, resource, tracemalloc
+from scripts import preprocess
+rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+tracemalloc.start()
+preprocess.merge_process("../data")
+print(json.dumps({"traced_mb": tracemalloc.get_traced_memory()[1] / 2 ** 20,
+                  "rss_growth_mb": (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024}))
+"""
+
+
+class LeanPreprocessTest(unittest.TestCase):
+    def test_lean_mode_matches_default(self):
+        default = preprocess.merge_process("../data", incremental=False)
+
+        with unittest.mock.patch.object(preprocess, "LEAN", True):
+            lean = preprocess.merge_process("../data", incremental=False)
+
+        pd.testing.assert_frame_equal(lean, default)
+
+    def test_lean_mode_skips_stage_memo(self):
+        memo = stages.StageMemo()
+        with unittest.mock.patch.object(preprocess, "LEAN", True), \
+                unittest.mock.patch.object(preprocess.SEASON_GRAPH, "memo", memo):
+            preprocess.pre_merge_preprocess(preprocess.read_to_dfs("../data"))
+
+        self.assertEqual(len(memo._entries), 0)
+
+    # Run in a fresh interpreter (with an empty feature store), so the peak reflects one cold run and nothing else
+    def test_peak_memory_budget(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, PREPROCESS_LEAN="1", FEATURE_STORE_DIR=tmp)
+            output = subprocess.run([sys.executable, "-c", MEMORY_PROBE], env=env, capture_output=True, text=True,
+                                    check=True).stdout
+
+        usage = json.loads(output.strip().splitlines()[-1])
+
+        self.assertLess(usage["traced_mb"], LEAN_TRACED_BUDGET_MB)
+        self.assertLess(usage["rss_growth_mb"], LEAN_RSS_BUDGET_MB)
+
+
+class AwardsTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.default_dir = feature_store.FEATURE_STORE_DIR
+        feature_store.FEATURE_STORE_DIR = os.path.join(self.tmp.name, "features")
+
+        # a source with a second award, using the Norris votes as stand-in Hart votes
+        self.source = os.path.join(self.tmp.name, "data")
+        os.makedirs(self.source)
+        for name in os.listdir("../data"):
+            os.symlink(os.path.abspath(os.path.join("../data", name)), os.path.join(self.source, name))
+        os.symlink(os.path.abspath("../data/norris_voting.csv"), os.path.join(self.source, "hart_voting.csv"))
+
+    def tearDown(self):
+        feature_store.FEATURE_STORE_DIR = self.default_dir
+        self.tmp.cleanup()
+
+    def test_available_awards(self):
+        self.assertEqual(awards.available_awards("../data"), ["norris"])
+        self.assertEqual(awards.available_awards(self.source), ["norris", "hart"])
+
+    def test_awards_share_feature_base(self):
+        datasets = preprocess.award_datasets(self.source, ["norris", "hart"])
+
+        pd.testing.assert_frame_equal(datasets["norris"], preprocess.merge_process(self.source))
+        self.assertIn("hart_point_pct", datasets["hart"].columns)
+        self.assertNotIn("norris_point_pct", datasets["hart"].columns)
+        self.assertGreater(len(datasets["hart"]), 2 * len(datasets["norris"]))
+
+        # each award's target is a vote share within its own population
+        norris_train, _ = preprocess.split_data(datasets["norris"])
+        season_totals = norris_train.groupby("season")["norris_point_pct"].sum()
+        np.testing.assert_allclose(season_totals[season_totals > 0], 1.0)
+
+    def test_rookie_eligibility(self):
+        base = pd.DataFrame({
+            "name": ["A", "A", "A", "B", "C"],
+            "season": [20182019, 20192020, 20202021, 20202021, 20202021],
+            "games_played": [10, 10, 30, 82, 5],
+            "age": [20, 21, 22, 23, 30]
+        })
+
+        self.assertEqual(list(awards.is_rookie(base)), [True, True, True, True, False])
+
+        base.loc[1, "games_played"] = 20
+        self.assertEqual(list(awards.is_rookie(base)), [True, True, False, True, False])
+
+    def test_models_fit_per_award(self):
+        norris_data = make_test_state("20210101000000").current_data["norris"]
+        hart_data = norris_data.rename(columns={"norris_point_pct": "hart_point_pct"})
+        hart_data["hart_point_pct"] = hart_data["hart_point_pct"].values[::-1]
+
+        models = fit_award_models({"norris": norris_data, "hart": hart_data},
+                                  {"norris": "norris_point_pct", "hart": "hart_point_pct"})
+
+        self.assertEqual(models["hart"].target, "hart_point_pct")
+        self.assertIsNot(models["norris"].estimator, models["hart"].estimator)
+        self.assertNotEqual(models["hart"].predict(hart_data), models["norris"].predict(norris_data))
+
+
+class ModelBackendTest(unittest.TestCase):
+    def setUp(self):
+        self.data = make_test_state("20210101000000").current_data["norris"]
+
+    def test_each_backend_fits_fresh_estimator(self):
+        for backend in ESTIMATOR_BACKENDS:
+            first, second = AwardModel(backend=backend), AwardModel(backend=backend)
+            self.assertIsNot(first.estimator, second.estimator)
+
+            first.fit(self.data)
+            self.assertEqual(len(first.predict_scores(self.data)), len(self.data))
+            # backends without built-in importances fall back to permutation importance
+            self.assertEqual(set(first.feature_importances), {"points", "avg_toi", "team_encoded"})
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            AwardModel(backend="svm")
+
+    def test_season_metrics(self):
+        metrics = evaluation.season_metrics([0.5, 0.3, 0.2, 0.0], [0.2, 0.4, 0.1, 0.3])
+
+        self.assertFalse(metrics["top1"])
+        self.assertTrue(metrics["top3"])
+        self.assertAlmostEqual(metrics["rank_corr"], 0.5)
+        self.assertAlmostEqual(metrics["mae"], 0.2)
+
+
+class BacktestTest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(1)
+        self.data = pd.DataFrame({
+            "name": [f"Player {i % 10}" for i in range(50)],
+            "team": ["COL", "VGK"] * 25,
+            "season": np.repeat([20162017, 20172018, 20182019, 20192020, 20202021], 10),
+            "points": rng.rand(50),
+            "avg_toi": rng.rand(50),
+        })
+        self.data["norris_point_pct"] = self.data["points"] * self.data["avg_toi"]
+        # current season has no voting results yet
+        self.data.loc[self.data["season"] == 20202021, "norris_point_pct"] = np.nan
+
+        self.cache = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.cache.cleanup()
+
+    def run_backtest(self, backend="gbr"):
+        return backtest.backtest(self.data, "norris_point_pct", backend, cache_dir=self.cache.name, max_workers=1)
+
+    def test_one_fold_per_voted_season(self):
+        report = self.run_backtest()
+
+        self.assertEqual(list(report["season"]), [20162017, 20172018, 20182019, 20192020])
+        self.assertEqual(set(report.columns), {"season", "top1", "top3", "rank_corr", "mae"})
+
+    def test_rerun_only_recomputes_affected_folds(self):
+        first = self.run_backtest()
+
+        # unchanged data and model: every fold comes from the cache
+        with unittest.mock.patch.object(backtest, "run_fold", side_effect=AssertionError("refit")):
+            pd.testing.assert_frame_equal(self.run_backtest(), first)
+
+        # current-season rows don't take part in any fold
+        self.data.loc[self.data["season"] == 20202021, "points"] = 0.0
+        with unittest.mock.patch.object(backtest, "run_fold", side_effect=AssertionError("refit")):
+            self.run_backtest()
+
+        # a different model config refits every fold
+        with unittest.mock.patch.object(backtest, "run_fold", wraps=backtest.run_fold) as run_fold:
+            self.run_backtest("extra_trees")
+        self.assertEqual(run_fold.call_count, 4)
+
+
+class WhatIfTest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(2)
+        raw = pd.DataFrame({
+            "name": [f"Player {i}" for i in range(60)],
+            "team": ["COL", "VGK", "EDM"] * 20,
+            "season": [20192020] * 30 + [20202021] * 30,
+            "games_played": rng.randint(20, 82, 60).astype(float),
+            "goals": rng.randint(0, 30, 60).astype(float),
+            "total_toi": rng.uniform(400, 2000, 60),
+            "shots": rng.randint(40, 250, 60).astype(float),
+        })
+        raw["shooting_pct"] = (raw["goals"] / raw["shots"] * 100).round(1)
+        raw["avg_toi"] = raw["total_toi"] / raw["games_played"]
+        raw["goals_per_game"] = raw["goals"] / raw["games_played"]
+        raw["norris_point_pct"] = raw["goals_per_game"] * raw["avg_toi"] * (1 + raw["shooting_pct"] / 10)
+        self.raw = raw
+
+        columns = ["games_played", "goals", "total_toi", "shots", "shooting_pct", "avg_toi", "goals_per_game"]
+        scaler = preprocess.SeasonScaler(columns).fit(raw)
+        data = raw.copy()
+        data[columns] = scaler.transform(raw)
+        data.attrs["season_scaler"] = scaler
+        data = preprocess.encode_categorical(data)
+
+        train, current = preprocess.split_data(data)
+        model = AwardModel()
+        model.fit(train)
+        self.model = model
+        self.current = current
+        self.scorer = WhatIfScorer(model, current)
+
+    def test_unchanged_lines_match_current_predictions(self):
+        results = self.scorer.score([{"name": name} for name in self.current["name"]])
+        predicted = {p["name"]: p["predicted_point_pct"] for p in self.model.predict(self.current.copy())}
+        listed = [r for r in results if r["name"] in predicted]
+        expected = [predicted[r["name"]] for r in listed]
+
+        # same shares as /predict lists (every player with a share), up to the last rounded digit
+        self.assertTrue(listed)
+        np.testing.assert_allclose([r["predicted_point_pct"] for r in listed], expected, atol=0.011)
+        np.testing.assert_allclose([r["current_point_pct"] for r in listed], expected, atol=0.011)
+        self.assertEqual(sorted(r["rank"] for r in results)[0], 1)
+
+    def test_goal_override_recomputes_shooting_pct(self):
+        player = self.raw[self.raw["name"] == "Player 40"].iloc[0]
+        goals = player["goals"] + 15
+
+        recomputed, explicit = self.scorer.score([
+            {"name": "Player 40", "stats": {"goals": goals}},
+            {"name": "Player 40", "stats": {"goals": goals, "shooting_pct": goals / player["shots"] * 100}}])
+
+        self.assertEqual(recomputed["predicted_point_pct"], explicit["predicted_point_pct"])
+
+    def test_pace_scales_counting_stats(self):
+        player = self.raw[self.raw["name"] == "Player 40"].iloc[0]
+        factor = 82 / player["games_played"]
+        overrides = {"games_played": 82, "goals": player["goals"] * factor, "total_toi": player["total_toi"] * factor,
+                     "shots": player["shots"] * factor, "shooting_pct": player["shooting_pct"]}
+
+        paced, overridden = self.scorer.score([{"name": "Player 40", "pace": 82},
+                                               {"name": "Player 40", "stats": overrides}])
+
+        self.assertEqual(paced["predicted_point_pct"], overridden["predicted_point_pct"])
+
+    def test_new_player_and_errors(self):
+        line = {"name": "Prospect", "team": "EDM",
+                "stats": {"games_played": 82, "goals": 25, "total_toi": 1900, "shots": 200}}
+        self.assertNotIn("current_point_pct", self.scorer.score([line])[0])
+
+        with self.assertRaises(ValueError):
+            self.scorer.score([{"name": "Prospect", "team": "EDM", "stats": {"goals": 25}}])
+        with self.assertRaises(ValueError):
+            self.scorer.score([{"name": "Player 40", "stats": {"avg_toi": 25}}])
+        with self.assertRaises(ValueError):
+            self.scorer.score([{"name": "Player 40", "team": "SEA"}])
+
+    def test_derived_stat_without_its_sources(self):
+        # a model using avg_toi but not total_toi/games_played: avg_toi is set like a raw stat
+        columns = ["goals", "avg_toi"]
+        raw = self.raw[["name", "team", "season", "norris_point_pct"] + columns].copy()
+        scaler = preprocess.SeasonScaler(columns).fit(raw)
+        raw[columns] = scaler.transform(raw)
+        raw.attrs["season_scaler"] = scaler
+        train, current = preprocess.split_data(preprocess.encode_categorical(raw))
+        model = AwardModel()
+        model.fit(train)
+        scorer = WhatIfScorer(model, current)
+
+        lower, higher = scorer.score([{"name": "Player 40", "stats": {"avg_toi": 10}},
+                                      {"name": "Player 40", "stats": {"avg_toi": 40}}])
+        self.assertEqual(scorer.input_columns, columns)
+        self.assertNotEqual(lower["predicted_point_pct"], higher["predicted_point_pct"])
+        with self.assertRaises(ValueError):
+            scorer.score([{"name": "Player 40", "pace": 82}])
+
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        results = {1: {"name": "Adam Fox", "team": "NYR", "predicted_point_pct": 11.83}}
+        payload = build_payload(results, "Mon, Jan 01 12:00AM PT", {"points": 0.25}.items(), [["2020-21", "Adam Fox", "NYR"]])
+        self.snapshot = PredictionSnapshot(payload, "norris-1")
+
+    def test_body_is_pre_encoded(self):
+        self.assertEqual(type(self.snapshot.body), bytes)
+        self.assertIn(b'"1":{"name":"Adam Fox"', self.snapshot.body)
+        self.assertIn(b'"importances":{"points":0.25}', self.snapshot.body)
+
+    def test_etag_matching(self):
+        self.assertTrue(self.snapshot.matches(self.snapshot.etag))
+        self.assertTrue(self.snapshot.matches(f'"stale", W/{self.snapshot.etag}'))
+        self.assertTrue(self.snapshot.matches("*"))
+        self.assertFalse(self.snapshot.matches('"stale"'))
+        self.assertFalse(self.snapshot.matches(None))
+
+    def test_views(self):
+        results = {rank: {"name": f"Player {rank}", "team": "NYR", "predicted_point_pct": 10.0 - rank,
+                          "headshot_url": "h", "team_logo_url": "t", "nhl_page": "p"} for rank in range(1, 51)}
+        snapshot = PredictionSnapshot(build_payload(results, "now", {}, [["2020-21", "Adam Fox", "NYR"]]), "norris-2")
+
+        page = json.loads(snapshot.view(offset=10, limit=5, fields="results").body)
+        self.assertEqual(list(page), ["results"])
+        self.assertEqual(list(page["results"]), ["11", "12", "13", "14", "15"])
+        self.assertEqual(page["results"]["11"], {"name": "Player 11", "team": "NYR", "predicted_point_pct": -1.0})
+
+        self.assertIs(snapshot.view(), snapshot.full)
+        self.assertIs(snapshot.view(0, 3, "results,urls"), snapshot.view(0, 3, "urls,results"))
+        with self.assertRaises(ValueError):
+            snapshot.view(fields="results,players")
+
+    def test_compressed_variants(self):
+        self.assertEqual(negotiate_encoding("gzip, deflate", 5000), "gzip")
+        self.assertIsNone(negotiate_encoding("gzip;q=0, identity", 5000))
+        self.assertIsNone(negotiate_encoding("gzip", 100))
+
+        view = self.snapshot.full
+        self.assertEqual(gzip.decompress(view.content("gzip")), view.body)
+        self.assertEqual(view.content("gzip")[4:8], bytes(4))  # zero header mtime: same payload, same bytes
+        self.assertNotEqual(view.etag("gzip"), view.etag())
+        self.assertEqual(self.snapshot.response_headers(view, "gzip")["Content-Encoding"], "gzip")
+
+
+class HTTPCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.stub = StubServer()
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.stub.close()
+        self.tmp.cleanup()
+
+    def make_cache(self, ttl, stale_window, max_bytes=1024 * 1024):
+        return HTTPCache(self.tmp.name, max_bytes=max_bytes, ttls={"default": (ttl, stale_window)},
+                         fetcher=FetchEngine(retries=0).fetch)
+
+    def test_fresh_entries_persist_across_instances(self):
+        self.make_cache(3600, 0).get_text(f"{self.stub.url}/standings")
+        text = self.make_cache(3600, 0).get_text(f"{self.stub.url}/standings")
+
+        self.assertEqual(text, "<html>/standings #1</html>")
+        self.assertEqual(self.stub.hits, 1)
+
+    def test_stale_while_revalidate(self):
+        cache = self.make_cache(0, 3600)
+        cache.get_text(f"{self.stub.url}/skaters")
+
+        self.assertEqual(cache.get_text(f"{self.stub.url}/skaters"), "<html>/skaters #1</html>")
+        cache.join()
+        self.assertEqual(self.stub.hits, 2)
+        self.assertEqual(cache.get_text(f"{self.stub.url}/skaters"), "<html>/skaters #2</html>")
+        cache.join()
+
+    def test_max_age_revalidates_synchronously(self):
+        cache = self.make_cache(3600, 3600)
+        cache.get_text(f"{self.stub.url}/standings")
+        time.sleep(0.05)
+
+        self.assertEqual(cache.get_text(f"{self.stub.url}/standings", max_age=3600), "<html>/standings #1</html>")
+        self.assertEqual(cache.get_text(f"{self.stub.url}/standings", max_age=0.01), "<html>/standings #2</html>")
+
+        # the stale copy is only a fallback when the refetch fails
+        self.stub.failing = True
+        self.assertEqual(cache.get_text(f"{self.stub.url}/standings", max_age=0), "<html>/standings #2</html>")
+
+    def test_outage_falls_back_to_last_good_payload(self):
+        cache = self.make_cache(0, 0)
+        cache.get_text(f"{self.stub.url}/awards")
+        self.stub.failing = True
+
+        self.assertEqual(cache.get_text(f"{self.stub.url}/awards"), "<html>/awards #1</html>")
+        with self.assertRaises(Exception):
+            cache.get_text(f"{self.stub.url}/uncached")
+
+    def test_size_bounded_eviction(self):
+        cache = self.make_cache(3600, 0, max_bytes=40)
+        for page in ("a", "b", "c"):
+            cache.get_text(f"{self.stub.url}/{page}")
+
+        cache.get_text(f"{self.stub.url}/c")
+        self.assertEqual(self.stub.hits, 3)
+        cache.get_text(f"{self.stub.url}/a")
+        self.assertEqual(self.stub.hits, 4)
+
+
+class FetchEngineTest(unittest.TestCase):
+    def setUp(self):
+        self.stub = StubServer(delay=0.3)
+
+    def tearDown(self):
+        self.stub.close()
+
+    def test_concurrent_fetches_bounded_by_slowest(self):
+        engine = FetchEngine(host_limits={"default": (4, 0.0)})
+        jobs = {page: (lambda page=page: engine.fetch(f"{self.stub.url}/{page}")[0]) for page in ("a", "b", "c", "d")}
+
+        start = time.perf_counter()
+        results = engine.run_all(jobs)
+
+        self.assertLess(time.perf_counter() - start, 0.9)
+        self.assertTrue(results["c"].startswith(b"<html>/c #"))
+
+    def test_run_all_inside_running_event_loop(self):
+        engine = FetchEngine()
+        jobs = {page: (lambda page=page: engine.fetch(f"{self.stub.url}/{page}")[0]) for page in ("a", "b")}
+
+        async def fetch_from_loop():
+            return engine.run_all(jobs)
+
+        results = asyncio.run(fetch_from_loop())
+
+        self.assertTrue(results["b"].startswith(b"<html>/b #"))
+
+    def test_per_host_limits(self):
+        engine = FetchEngine(host_limits={"default": (2, 0.1)})
+        jobs = {page: (lambda page=page: engine.fetch(f"{self.stub.url}/{page}")) for page in range(6)}
+
+        start = time.perf_counter()
+        engine.run_all(jobs)
+
+        self.assertEqual(self.stub.max_in_flight, 2)
+        self.assertGreaterEqual(time.perf_counter() - start, 0.9)
+
+    def test_retries_with_backoff(self):
+        self.stub.delay = 0
+        self.stub.fail_first = 2
+        engine = FetchEngine(retries=2, backoff=0.01)
+
+        body, _ = engine.fetch(f"{self.stub.url}/standings")
+
+        self.assertEqual(body, b"<html>/standings #3</html>")
+
+        self.stub.failing = True
+        with self.assertRaises(Exception):
+            FetchEngine(retries=1, backoff=0.01).fetch(f"{self.stub.url}/standings")
+
+
+def read_fixture(name: str) -> str:
+    with open(os.path.join("fixtures", name), "rb") as f:
+        return gzip.decompress(f.read()).decode("utf-8")
+
+
+class HTMLTablesTest(unittest.TestCase):
+    def setUp(self):
+        self.skaters_html = read_fixture("NHL_2021_skaters.html.gz")
+        self.standings_html = read_fixture("NHL_2021_standings.html.gz")
+
+    @unittest.skipUnless("lxml" in html_tables.BACKENDS, "lxml not installed")
+    def test_backends_equivalent(self):
+        pd.testing.assert_frame_equal(gather_data.parse_skater_data(self.skaters_html, "2021", backend="lxml"),
+                                      gather_data.parse_skater_data(self.skaters_html, "2021", backend="bs4"))
+        pd.testing.assert_frame_equal(gather_data.parse_standings_data(self.standings_html, "2021", backend="lxml"),
+                                      gather_data.parse_standings_data(self.standings_html, "2021", backend="bs4"))
+
+    def test_parsed_tables_match_bundled_data(self):
+        skaters = gather_data.parse_skater_data(self.skaters_html, "2021")
+        standings = gather_data.parse_standings_data(self.standings_html, "2021")
+
+        self.assertEqual(skaters["GP"].dtype, np.int64)
+        self.assertEqual(standings["Team"].iloc[0], "Carolina Hurricanes")  # playoff "*" left out
+
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, df in (("skater_stats_current.csv", skaters), ("season_standings_current.csv", standings)):
+                df.to_csv(os.path.join(tmp, name), index_label=False)
+                pd.testing.assert_frame_equal(catalog.read_dataset(os.path.join(tmp, name)),
+                                              catalog.read_dataset(os.path.join("../data", name)))
+
+    def test_missing_table(self):
+        with self.assertRaises(ValueError):
+            html_tables.table_fragment(self.standings_html, "stats")
+
+
+class BackfillTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.voting = pd.read_csv("../data/norris_voting.csv")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_merge_csv_aggregates_season_files(self):
+        seasons = [19791980, 19801981, 19811982]
+        expected = self.voting[self.voting["season"].isin(seasons)].reset_index(drop=True)
+
+        os.makedirs(os.path.join(self.tmp.name, "norris_voting"))
+        for season in reversed(seasons):
+            expected[expected["season"] == season].drop(columns="season").to_csv(
+                os.path.join(self.tmp.name, "norris_voting", f"norris_voting_{season}.csv"), index=False)
+
+        preprocess._merge_csv(self.tmp.name)
+
+        pd.testing.assert_frame_equal(pd.read_csv(os.path.join(self.tmp.name, "norris_voting.csv")), expected)
+
+    def test_backfill_writes_and_resumes(self):
+        voting = self.voting[self.voting["season"] == 20192020].drop(columns="season").fillna("")
+        rows = "".join(f"<tr><th>{values[0]}</th>" + "".join(f"<td>{v}</td>" for v in values[1:]) + "</tr>"
+                       for values in voting.astype(str).values)
+        pages = {
+            gather_data.skaters_url("2021"): read_fixture("NHL_2021_skaters.html.gz"),
+            gather_data.standings_url("2021"): read_fixture("NHL_2021_standings.html.gz"),
+            gather_data.voting_url("2021"): f'<table id="norris_stats"><tbody>{rows}</tbody></table>'
+        }
+        fetched = []
+
+        def fetch(url):
+            fetched.append(url)
+            return pages[url]
+
+        # the stub voting page only has the Norris table, so only the other awards' voting files fail
+        failures = backfill.backfill(2021, 2021, self.tmp.name, fetch=fetch)
+        self.assertEqual(set(failures), {("2021", award.voting_dataset) for award in awards.AWARDS.values()
+                                         if award.name != "norris"})
+        self.assertEqual(sorted(fetched), sorted(pages))
+        self.assertEqual(len(pd.read_csv(os.path.join(self.tmp.name, "norris_voting.csv"))), len(voting))
+        self.assertEqual(preprocess.folder_seasons(self.tmp.name, "skater_stats"), ["20202021"])
+
+        # season files already on disk are skipped (only the voting page is retried); the lockout season is never requested
+        backfill.backfill(2021, 2021, self.tmp.name, aggregate=False, fetch=fetch)
+        self.assertEqual(fetched[3:], [gather_data.voting_url("2021")])
+        self.assertEqual({year for year, _ in backfill.missing_files(self.tmp.name, 2004, 2021)},
+                         {str(year) for year in range(2004, 2022)} - {"2005"})
+
+
+class RosterIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = RosterIndex([
+            make_player_record(8474565, "Alex Pietrangelo", "VGK", "Vegas Golden Knights", "7"),
+            make_player_record(8480069, "Cale Makar", "COL", "Colorado Avalanche", "8")
+        ])
+
+    def test_normalize_name(self):
+        self.assertEqual(normalize_name("  Jérôme  Iginla "), "jerome iginla")
+        self.assertEqual(normalize_name("P.K. Subban"), normalize_name("P K Subban"))
+
+    def test_lookup_uses_precomputed_urls(self):
+        player = self.index.lookup("Cale Makar", "COL")
+
+        self.assertEqual(player["id"], 8480069)
+        self.assertEqual(player["enrichment"]["nhl_page"], "https://www.nhl.com/player/cale-makar-8480069")
+        self.assertEqual(player["enrichment"]["team_logo_url"], "https://cdn.usteamcolors.com/images/nhl/colorado-avalanche.svg")
+        self.assertIs(self.index.by_id[8480069], player)
+
+    def test_lookup_misses(self):
+        self.assertIsNone(self.index.lookup("Cale Makar", "VGK"))
+        self.assertIsNone(self.index.lookup("Unknown Player", "COL"))
+
+
+class MetricsTest(unittest.TestCase):
+    def test_histogram_exposition(self):
+        histogram = metrics.Histogram("test_seconds", "Test latency", buckets=(0.1, 1.0))
+        for value in [0.05, 0.5, 5.0]:
+            histogram.observe(value, path='/p"x')
+
+        text = histogram.render()
+        self.assertIn("# TYPE nhl_awards_test_seconds histogram", text)
+        self.assertIn('nhl_awards_test_seconds_bucket{path="/p\\"x",le="0.1"} 1', text)
+        self.assertIn('nhl_awards_test_seconds_bucket{path="/p\\"x",le="1.0"} 2', text)
+        self.assertIn('nhl_awards_test_seconds_bucket{path="/p\\"x",le="+Inf"} 3', text)
+        self.assertIn('nhl_awards_test_seconds_count{path="/p\\"x"} 3', text)
+
+    def test_timed_fetch_records_failures(self):
+        def fail():
+            raise ConnectionError("down")
+
+        with self.assertRaises(ConnectionError):
+            gather_data.timed_fetch("test-source", fail)()
+
+        self.assertIn('nhl_awards_scrape_failures_total{source="test-source"} 1.0', metrics.render())
+        self.assertIn('nhl_awards_scrape_duration_seconds_count{source="test-source"} 1', metrics.render())
+
+    def test_incomplete_metric_type_fails_at_construction(self):
+        class Incomplete(metrics.Metric):
+            def combine(self, exports):
+                return {}
+
+        with self.assertRaises(TypeError):
+            Incomplete("test_incomplete", "Missing samples")
+
+    def test_multiprocess_combination(self):
+        other_worker = os.getppid()
+        exited_worker = subprocess.Popen([sys.executable, "-c", "pass"])
+        exited_worker.wait()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            for pid, requests, running in [(other_worker, 2.0, 1), (exited_worker.pid, 5.0, 7)]:
+                with open(os.path.join(tmp, f"{pid}.json"), "w") as f:
+                    json.dump({metrics.SCRAPE_FAILURES.name: [[[["source", "multiproc"]], requests]],
+                               metrics.REFRESH_RUNNING.name: [[[], running]]}, f)
+
+            metrics.SCRAPE_FAILURES.inc(source="multiproc")
+            text = metrics.render(tmp)
+
+            # counters include exited workers' counts, gauges only live processes'
+            self.assertIn('nhl_awards_scrape_failures_total{source="multiproc"} 8.0', text)
+            self.assertIn("nhl_awards_refresh_running 1", text)
+            self.assertTrue(os.path.exists(os.path.join(tmp, f"{os.getpid()}.json")))
+
+
+class RefreshStatusTest(unittest.TestCase):
+    def test_single_refresh_at_a_time(self):
+        status = RefreshStatus()
+
+        self.assertTrue(status.start())
+        self.assertFalse(status.start())
+        status.finish(error=ValueError("upstream down"))
+        self.assertEqual(status.as_dict()["last_error"], "ValueError: upstream down")
+
+        self.assertTrue(status.start())
+        status.finish(version="20210101000000")
+        self.assertEqual(status.as_dict()["last_success_version"], "20210101000000")
+        self.assertIsNone(status.as_dict()["last_error"])
+
+
+# Small fitted serving state for tests that don't need the full bundled dataset
+def make_test_state(version: str) -> ServingState:
+    rng = np.random.RandomState(0)
+    data = pd.DataFrame({
+        "name": [f"Player {i}" for i in range(40)],
+        "team": ["COL", "VGK"] * 20,
+        "season": [20192020] * 20 + [20202021] * 20,
+        "points": rng.rand(40),
+        "avg_toi": rng.rand(40),
+    })
+    data["norris_point_pct"] = data["points"] * data["avg_toi"]
+
+    # scaled and team-encoded as merge_process leaves it, so what-if scoring works against the state too
+    scaler = preprocess.SeasonScaler(["points", "avg_toi"]).fit(data)
+    data[["points", "avg_toi"]] = scaler.transform(data)
+    data.attrs["season_scaler"] = scaler
+    data = preprocess.encode_categorical(data)
+
+    train, current = preprocess.split_data(data)
+    model = AwardModel()
+    model.fit(train)
+    current_data = {"norris": current}
+    roster = RosterIndex([make_player_record(1, "Player 21", "VGK", "Vegas Golden Knights", "2")])
+    payloads = create_payloads({"norris": model}, current_data, roster, "Mon, Jan 01 12:00AM PT", {"norris": []})
+
+    return ServingState({"norris": model}, current_data, roster, "Mon, Jan 01 12:00AM PT",
+                        build_snapshots(payloads, version), version)
+
+
+class HistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.history = PredictionHistory(os.path.join(self.tmp.name, "history.sqlite3"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def ranked(self, *names):
+        return [{"name": name, "team": "NYR", "predicted_point_pct": 10.0 - i} for i, name in enumerate(names)]
+
+    def test_trajectories(self):
+        self.history.append("norris", 20202021, "2021-01-01", self.ranked("Fox", "Hedman", "Makar"))
+        self.history.append("norris", 20202021, "2021-01-02", self.ranked("Hedman", "Fox", "Makar"))
+        # a second refresh the same day replaces that day
+        self.history.append("norris", 20202021, "2021-01-02", self.ranked("Makar", "Fox", "Hedman"))
+
+        self.assertEqual([(row["refresh_date"], row["rank"]) for row in self.history.player_trajectory("norris", "Makar")],
+                         [("2021-01-01", 3), ("2021-01-02", 1)])
+
+        top = self.history.top_trajectories("norris", limit=2)
+        self.assertEqual({date: [row["name"] for row in rows] for date, rows in top.items()},
+                         {"2021-01-01": ["Fox", "Hedman"], "2021-01-02": ["Makar", "Fox"]})
+        self.assertEqual(self.history.player_trajectory("hart", "Makar"), [])
+
+    def test_compaction(self):
+        for season in [20182019, 20192020, 20202021]:
+            self.history.append("norris", season, f"{str(season)[4:]}-01-01", self.ranked("Fox", "Hedman", "Makar"))
+
+        # oldest season dropped, finished season trimmed to the top 2, current season kept whole
+        self.assertEqual(self.history.compact(keep_seasons=2, keep_ranks=2), 4)
+        self.assertEqual(self.history.top_trajectories("norris", 20182019), {})
+        self.assertEqual(len(self.history.top_trajectories("norris", 20192020)["2020-01-01"]), 2)
+        self.assertEqual(len(self.history.top_trajectories("norris")["2021-01-01"]), 3)
+
+    def test_compaction_is_per_award(self):
+        for season in [20182019, 20192020, 20202021]:
+            self.history.append("norris", season, f"{str(season)[4:]}-01-01", self.ranked("Fox", "Hedman", "Makar"))
+        # an award last recorded in older seasons keeps its own newest keep_seasons, not the newest across awards
+        for season in [20172018, 20182019]:
+            self.history.append("hart", season, f"{str(season)[4:]}-01-01", self.ranked("McDavid", "Kucherov"))
+
+        self.assertEqual(self.history.compact(keep_seasons=2, keep_ranks=1), 6)
+        self.assertEqual(len(self.history.top_trajectories("hart", 20172018)["2018-01-01"]), 1)
+        self.assertEqual(len(self.history.top_trajectories("hart")["2019-01-01"]), 2)
+        self.assertEqual(len(self.history.top_trajectories("norris", 20192020)["2020-01-01"]), 1)
+
+    def test_record_state(self):
+        record_state(self.history, make_test_state("20210315000000"))
+
+        top = self.history.top_trajectories("norris", 20202021)
+        self.assertEqual(list(top), ["2021-03-15"])
+
+    def test_record_state_compacts_on_rollover_only(self):
+        with unittest.mock.patch.object(self.history, "compact") as compact:
+            record_state(self.history, make_test_state("20210315000000"))
+            record_state(self.history, make_test_state("20210316000000"))
+            compact.assert_not_called()
+
+        # the first refresh of a new season is when a finished season needs trimming
+        history = PredictionHistory(os.path.join(self.tmp.name, "rollover.sqlite3"))
+        history.append("norris", 20192020, "2020-03-15", self.ranked("Fox"))
+        with unittest.mock.patch.object(history, "compact") as compact:
+            record_state(history, make_test_state("20210315000000"))
+            compact.assert_called_once()
+
+
+class ModelStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = ModelStore(self.tmp.name)
+
+        rng = np.random.RandomState(0)
+        self.train = pd.DataFrame({
+            "name": [f"Player {i}" for i in range(40)],
+            "team": ["COL", "VGK"] * 20,
+            "season": [20182019] * 20 + [20192020] * 20,
+            "points": rng.rand(40),
+        })
+        self.train["norris_point_pct"] = self.train["points"] / 10
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_training_version(self):
+        version = training_version(self.train, "norris_point_pct")
+
+        self.assertEqual(training_version(self.train.copy(), "norris_point_pct"), version)
+        self.assertNotEqual(training_version(self.train, "norris_point_pct", "random_forest"), version)
+
+        # a season rolling over into the training data changes the version
+        rolled_over = pd.concat([self.train, self.train.assign(season=20202021)], ignore_index=True)
+        self.assertNotEqual(training_version(rolled_over, "norris_point_pct"), version)
+
+    def test_fit_once_then_reuse(self):
+        targets = {"norris": "norris_point_pct"}
+        models = ensure_models({"norris": self.train}, targets, self.store)
+        version = models["norris"].training_version
+
+        self.assertEqual(version, training_version(self.train, "norris_point_pct"))
+
+        with unittest.mock.patch("scripts.model_store.fit_award_models") as fit:
+            # the previous state's model, then the stored one, without refitting
+            self.assertIs(ensure_models({"norris": self.train}, targets, self.store, models)["norris"], models["norris"])
+            stored = ensure_models({"norris": self.train}, targets, self.store)["norris"]
+            fit.assert_not_called()
+
+        self.assertEqual(stored.training_version, version)
+        self.assertTrue(np.allclose(stored.predict_scores(self.train), models["norris"].predict_scores(self.train)))
+
+        retrained = ensure_models({"norris": self.train}, targets, self.store, models, retrain=True)["norris"]
+        self.assertIsNot(retrained, models["norris"])
+
+
+class RefreshLeaderTest(unittest.TestCase):
+    def test_single_leader_with_takeover(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "artifacts", ".refresh.lock")
+            first, second = RefreshLeader(path), RefreshLeader(path)
+
+            self.assertTrue(first.try_acquire())
+            self.assertFalse(second.try_acquire())
+            self.assertTrue(first.try_acquire())
+
+            # the lock is released when the leader goes away, and the next follower to try takes over
+            first.release()
+            self.assertTrue(second.try_acquire())
+            self.assertFalse(first.is_leader)
+            second.release()
+
+
+class RefreshSchedulerTest(unittest.TestCase):
+    def test_cron_next_after(self):
+        moment = datetime.datetime(2021, 1, 1, 23, 30, 15)  # a Friday
+
+        self.assertEqual(CronSchedule("0 0 * * *").next_after(moment), datetime.datetime(2021, 1, 2, 0, 0))
+        self.assertEqual(CronSchedule("*/20 * * * *").next_after(moment), datetime.datetime(2021, 1, 1, 23, 40))
+        self.assertEqual(CronSchedule("30 6 * * 1-5").next_after(moment), datetime.datetime(2021, 1, 4, 6, 30))
+        self.assertEqual(CronSchedule("0 12 15 * 0").next_after(moment), datetime.datetime(2021, 1, 3, 12, 0))
+        self.assertEqual(CronSchedule("0 0 1 3 *").next_after(moment), datetime.datetime(2021, 3, 1, 0, 0))
+
+        for invalid in ["0 0 * *", "60 0 * * *", "0 0 31 2 *", "*/0 * * * *"]:
+            with self.assertRaises(ValueError):
+                CronSchedule(invalid).next_after(moment)
+
+    def test_jitter_and_backoff(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            scheduler = RefreshScheduler("0 0 * * *", jitter=300, backoff=60, max_backoff=200,
+                                         trigger_path=os.path.join(tmp, ".refresh.request"), rng=lambda: 0.5)
+            now = datetime.datetime(2021, 1, 1, 23, 0)
+
+            self.assertEqual(scheduler.next_delay(now), 3600 + 150)
+
+            delays = []
+            for _ in range(4):
+                scheduler.record_failure()
+                delays.append(scheduler.next_delay(now))
+            self.assertEqual(delays, [60, 120, 200, 200])
+
+            scheduler.record_success()
+            self.assertEqual(scheduler.next_delay(now), 3750)
+
+    def test_manual_requests(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "artifacts", ".refresh.request")
+            leader, follower = RefreshScheduler(trigger_path=path), RefreshScheduler(trigger_path=path)
+
+            self.assertIsNone(leader.take_request())
+
+            # a forced request isn't downgraded by a later plain one, and retraining implies a forced refresh
+            follower.request_refresh(force=True)
+            follower.request_refresh()
+            self.assertEqual(leader.take_request(), {"force": True, "retrain": False})
+            self.assertIsNone(leader.take_request())
+
+            follower.request_refresh(retrain=True)
+            self.assertEqual(leader.take_request(), {"force": True, "retrain": True})
+
+            self.assertTrue(refresh_authorized("Bearer secret", "secret"))
+            self.assertFalse(refresh_authorized("Bearer wrong", "secret"))
+            self.assertFalse(refresh_authorized(None, "secret"))
+            self.assertFalse(refresh_authorized("Bearer ", ""))
+
+    def test_revalidating_refresh_fetches_despite_fresh_cache(self):
+        pages = {gather_data.standings_url("2021"): read_fixture("NHL_2021_standings.html.gz").encode("utf-8"),
+                 gather_data.skaters_url("2021"): read_fixture("NHL_2021_skaters.html.gz").encode("utf-8"),
+                 gather_data.ROSTERS_URL: json.dumps({"teams": []}).encode("utf-8")}
+        fetched = []
+
+        def fetcher(url):
+            fetched.append(url)
+            return pages[url], "utf-8"
+
+        with tempfile.TemporaryDirectory() as tmp:
+            with unittest.mock.patch.object(gather_data, "cache", HTTPCache(tmp, fetcher=fetcher)):
+                gather_data.fetch_refresh_inputs("2021", [])
+                self.assertEqual(len(fetched), 3)
+
+                # freshly cached pages are reused by an ordinary refresh, but not by a forced/scheduled one
+                gather_data.fetch_refresh_inputs("2021", [])
+                self.assertEqual(len(fetched), 3)
+                inputs = gather_data.fetch_refresh_inputs("2021", [], revalidate=True)
+                self.assertEqual(len(fetched), 6)
+
+        self.assertEqual(inputs.standings["Team"].iloc[0], "Carolina Hurricanes")
+
+    def test_change_detection(self):
+        standings = pd.DataFrame({"Team": ["NYR", "COL"], "GP": [10, 11]})
+        skaters = pd.DataFrame({"Player": ["Adam Fox"], "GP": [10]})
+        rosters = {"teams": [{"abbreviation": "NYR", "name": "New York Rangers", "roster": {"roster": []}}]}
+
+        def inputs(games_played):
+            return gather_data.RefreshInputs(standings.assign(GP=games_played), skaters.copy(), rosters,
+                                             {"norris": [["2020-21", "Adam Fox", "NYR"]]})
+
+        before = inputs([10, 11]).fingerprints()
+
+        self.assertEqual(changed_inputs(before, inputs([10, 11]).fingerprints()), [])
+        self.assertEqual(changed_inputs(before, inputs([11, 11]).fingerprints()), ["standings"])
+        self.assertEqual(changed_inputs(None, before), ["awards:norris", "rosters", "skaters", "standings"])
+
+
+class ArtifactTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip_newest_first(self):
+        save_artifact(make_test_state("20210101000000"), self.tmp.name)
+        original = make_test_state("20210102000000")
+        original.input_fingerprints = {"standings": "abc", "historical": "def"}
+        save_artifact(original, self.tmp.name)
+
+        loaded = load_latest_artifact(self.tmp.name)
+
+        self.assertEqual(loaded.version, "20210102000000")
+        self.assertEqual(loaded.snapshots["norris"].body, original.snapshots["norris"].body)
+        self.assertEqual(loaded.models["norris"].predict(loaded.current_data["norris"]),
+                         original.models["norris"].predict(original.current_data["norris"]))
+        self.assertEqual(loaded.nhl_data.lookup("Player 21", "VGK")["id"], 1)
+        self.assertEqual(loaded.input_fingerprints, original.input_fingerprints)
+
+    def test_corrupt_artifact_is_skipped(self):
+        save_artifact(make_test_state("20210101000000"), self.tmp.name)
+        newest = save_artifact(make_test_state("20210102000000"), self.tmp.name)
+        with open(os.path.join(newest, "models.joblib"), "ab") as f:
+            f.write(b"garbage")
+
+        self.assertEqual(load_latest_artifact(self.tmp.name).version, "20210101000000")
+
+    def test_followers_load_newer_artifacts_memory_mapped(self):
+        save_artifact(make_test_state("20210101000000"), self.tmp.name)
+
+        self.assertIsNone(load_latest_artifact(self.tmp.name, newer_than="20210101000000"))
+
+        save_artifact(make_test_state("20210102000000"), self.tmp.name)
+        loaded = load_latest_artifact(self.tmp.name, newer_than="20210101000000")
+
+        self.assertEqual(loaded.version, "20210102000000")
+        self.assertIsInstance(loaded.current_data["norris"]["points"].values.base, np.memmap)
+
+    def test_pruning(self):
+        for day in range(1, 8):
+            save_artifact(make_test_state(f"202101{day:02d}000000"), self.tmp.name)
+
+        self.assertEqual(list_artifacts(self.tmp.name)[0], "20210107000000")
+        self.assertEqual(len(list_artifacts(self.tmp.name)), 5)
+
+
+
+# HTTP-layer tests against an injected serving state; the client is not used as a context manager, so the startup hook
+# (leader election, artifact loading, refreshes) never runs
+class APITest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.state = make_test_state("20210101000000")
+        history = PredictionHistory(os.path.join(self.tmp.name, "history.sqlite3"))
+        record_state(history, self.state)
+
+        patches = [unittest.mock.patch.object(main, "state", self.state),
+                   unittest.mock.patch.object(main, "history", history),
+                   unittest.mock.patch.object(main, "scheduler",
+                                              RefreshScheduler(trigger_path=os.path.join(self.tmp.name, "refresh"))),
+                   unittest.mock.patch.object(main, "refresh_authorized",
+                                              lambda authorization: refresh_authorized(authorization, "secret"))]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        self.client = TestClient(main.app)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_predict(self):
+        response = self.client.get("/predict")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, self.state.snapshots["norris"].body)
+
+        cached = self.client.get("/predict", headers={"If-None-Match": response.headers["ETag"]})
+        self.assertEqual(cached.status_code, 304)
+
+        self.assertEqual(self.client.get("/predict", params={"award": "hart"}).status_code, 404)
+        self.assertEqual(self.client.get("/predict", params={"fields": "players"}).status_code, 422)
+        self.assertEqual(self.client.get("/predict", params={"limit": 0}).status_code, 422)
+
+    def test_health(self):
+        health = self.client.get("/health")
+        self.assertEqual(health.status_code, 200)
+        self.assertEqual(health.json()["version"], "20210101000000")
+
+        with unittest.mock.patch.object(main, "state", None):
+            self.assertEqual(self.client.get("/health").status_code, 503)
+            self.assertEqual(self.client.get("/predict").status_code, 503)
+
+    def test_refresh(self):
+        self.assertEqual(self.client.post("/refresh").status_code, 401)
+        self.assertEqual(self.client.post("/refresh", headers={"Authorization": "Bearer wrong"}).status_code, 401)
+
+        response = self.client.post("/refresh", params={"force": "true"}, headers={"Authorization": "Bearer secret"})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(main.scheduler.take_request(), {"force": True, "retrain": False})
+
+    def test_whatif(self):
+        response = self.client.post("/whatif", json={"lines": [{"name": "Player 21", "stats": {"points": 2.0}}]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["season"], 20202021)
+        self.assertEqual(response.json()["results"][0]["name"], "Player 21")
+
+        self.assertEqual(self.client.post("/whatif", params={"award": "hart"}, json={"lines": []}).status_code, 404)
+        self.assertEqual(self.client.post("/whatif", json={"lines": [{"name": "Nobody"}]}).status_code, 422)
+
+    # handlers doing blocking work are plain functions, so FastAPI runs them off the event loop
+    def test_blocking_handlers_are_sync(self):
+        self.assertFalse(asyncio.iscoroutinefunction(main.score_what_if))
+        self.assertFalse(asyncio.iscoroutinefunction(main.get_history))
+
+    def test_history(self):
+        response = self.client.get("/history")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["history"]["2021-01-01"]), 10)
+
+        self.assertEqual(self.client.get("/history", params={"player": "Nobody"}).status_code, 404)
+        with unittest.mock.patch.object(main, "history", None):
+            self.assertEqual(self.client.get("/history").status_code, 503)
+
+    # Importing the app (as this file does) must not create the history store or any other file
+    def test_import_touches_no_files(self):
+        env = dict(os.environ, HISTORY_DB=os.path.join(self.tmp.name, "history", "predictions.sqlite3"),
+                   ARTIFACT_DIR=os.path.join(self.tmp.name, "artifacts"))
+        subprocess.run([sys.executable, "-c", "import main"], env=env, check=True, capture_output=True)
+
+        self.assertEqual(sorted(os.listdir(self.tmp.name)), ["history.sqlite3"])
+
+    def test_metrics(self):
+        self.client.get("/health")
+        response = self.client.get("/metrics")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('path="/health"', response.text)
+
 
 if __name__ == "__main__":
     unittest.main()